@@ -9,13 +9,23 @@ This version includes robust import handling to work across all deployment envir
 - Custom servers
 """
 import streamlit as st
-import pandas as pd
+import importlib
+import importlib.util
+import collections.abc
+import logging
 import os
 import sys
 import tempfile
+import shutil
+import hashlib
+import typing
+import weakref
 from io import BytesIO
 from functools import lru_cache
 
+# Library modules only create loggers; the entry point configures them
+logging.basicConfig(level=logging.INFO)
+
 # ============================================================================
 # PATH SETUP - Critical for Streamlit Cloud Deployment
 # ============================================================================
@@ -31,109 +41,73 @@ for path in [ROOT_DIR, APP_DIR]:
         sys.path.insert(0, path)
 
 # ============================================================================
-# ROBUST MODULE IMPORTS with Multiple Fallback Strategies
+# LAZY MODULE IMPORTS
 # ============================================================================
 
+# Public name -> (module, attribute). Modules are imported on first use so a
+# cold start only pays for Streamlit; pandas, the renderers, python-docx, pypdf
+# and the PDF engines load when a bill is first processed.
+MODULE_EXPORTS = {
+    'process_bill': ('core.computations.bill_processor', 'process_bill'),
+    'safe_float': ('core.computations.bill_processor', 'safe_float'),
+    'number_to_words': ('core.computations.bill_processor', 'number_to_words'),
+    'SheetData': ('core.computations.bill_processor', 'SheetData'),
+    'generate_pdf': ('exports.renderers', 'generate_pdf'),
+    'create_word_doc': ('exports.renderers', 'create_word_doc'),
+    'merge_pdfs': ('exports.renderers', 'merge_pdfs'),
+    'create_zip_archive': ('exports.renderers', 'create_zip_archive'),
+    'LazyArtifact': ('exports.renderers', 'LazyArtifact'),
+    'lazy_pdf': ('exports.renderers', 'lazy_pdf'),
+    'lazy_word_doc': ('exports.renderers', 'lazy_word_doc'),
+    'lazy_merged_pdf': ('exports.renderers', 'lazy_merged_pdf'),
+    'lazy_zip_archive': ('exports.renderers', 'lazy_zip_archive'),
+}
+
+
+class LazyModules(dict):
+    """Mapping of MODULE_EXPORTS names that imports each module on first access"""
+
+    def __missing__(self, name):
+        module_name, attribute = MODULE_EXPORTS[name]
+        value = getattr(importlib.import_module(module_name), attribute)
+        self[name] = value
+        return value
+
+
 def import_modules():
     """
-    Import required modules with comprehensive fallback handling.
-    Tries multiple import strategies to ensure compatibility across environments.
+    Locate the required modules without importing them.
+
+    Only the module files are resolved here (importlib.util.find_spec); the
+    modules themselves are imported by LazyModules on first use. When the
+    project root is not importable, the parent directory is tried as well.
     """
-    # Strategy 1: Direct imports (works in most environments)
-    try:
-        from core.computations.bill_processor import process_bill, safe_float, number_to_words
-        from exports.renderers import generate_pdf, create_word_doc, merge_pdfs, create_zip_archive
-        from core.streamlit_pdf_integration import StreamlitPDFManager
-        return {
-            'process_bill': process_bill,
-            'safe_float': safe_float,
-            'number_to_words': number_to_words,
-            'generate_pdf': generate_pdf,
-            'create_word_doc': create_word_doc,
-            'merge_pdfs': merge_pdfs,
-            'create_zip_archive': create_zip_archive,
-            'StreamlitPDFManager': StreamlitPDFManager
-        }
-    except (ImportError, ModuleNotFoundError) as e1:
-        st.warning(f"Standard import failed, trying fallback strategy 1: {e1}")
-        pass
-    
-    # Strategy 2: Adjust sys.path and retry (Streamlit Cloud common scenario)
-    try:
-        # Add additional paths
-        if ROOT_DIR not in sys.path:
-            sys.path.insert(0, ROOT_DIR)
-        
-        from core.computations.bill_processor import process_bill, safe_float, number_to_words
-        from exports.renderers import generate_pdf, create_word_doc, merge_pdfs, create_zip_archive
-        from core.streamlit_pdf_integration import StreamlitPDFManager
-        return {
-            'process_bill': process_bill,
-            'safe_float': safe_float,
-            'number_to_words': number_to_words,
-            'generate_pdf': generate_pdf,
-            'create_word_doc': create_word_doc,
-            'merge_pdfs': merge_pdfs,
-            'create_zip_archive': create_zip_archive,
-            'StreamlitPDFManager': StreamlitPDFManager
-        }
-    except (ImportError, ModuleNotFoundError) as e2:
-        st.warning(f"Fallback strategy 1 failed, trying strategy 2: {e2}")
-        pass
-    
-    # Strategy 3: Import entire modules and extract functions
-    try:
-        # Add parent of parent directory
-        parent_parent = os.path.dirname(ROOT_DIR)
-        if parent_parent not in sys.path:
-            sys.path.insert(0, parent_parent)
-        
-        import core.computations.bill_processor as bill_processor
-        import exports.renderers as renderers
-        import core.streamlit_pdf_integration as streamlit_pdf_integration
-        
-        return {
-            'process_bill': bill_processor.process_bill,
-            'safe_float': bill_processor.safe_float,
-            'number_to_words': bill_processor.number_to_words,
-            'generate_pdf': renderers.generate_pdf,
-            'create_word_doc': renderers.create_word_doc,
-            'merge_pdfs': renderers.merge_pdfs,
-            'create_zip_archive': renderers.create_zip_archive,
-            'StreamlitPDFManager': streamlit_pdf_integration.StreamlitPDFManager
-        }
-    except (ImportError, ModuleNotFoundError, AttributeError) as e3:
-        st.warning(f"Fallback strategy 2 failed, trying strategy 3: {e3}")
-        pass
-    
-    # Strategy 4: Relative imports from current location
-    try:
-        # Change to root directory temporarily
-        original_dir = os.getcwd()
-        os.chdir(ROOT_DIR)
-        
-        from core.computations.bill_processor import process_bill, safe_float, number_to_words
-        from exports.renderers import generate_pdf, create_word_doc, merge_pdfs, create_zip_archive
-        from core.streamlit_pdf_integration import StreamlitPDFManager
-        
-        os.chdir(original_dir)
-        
-        return {
-            'process_bill': process_bill,
-            'safe_float': safe_float,
-            'number_to_words': number_to_words,
-            'generate_pdf': generate_pdf,
-            'create_word_doc': create_word_doc,
-            'merge_pdfs': merge_pdfs,
-            'create_zip_archive': create_zip_archive,
-            'StreamlitPDFManager': StreamlitPDFManager
-        }
-    except Exception as e4:
-        st.warning(f"Fallback strategy 3 failed: {e4}")
-        os.chdir(original_dir)  # Ensure we restore directory
-        pass
+    module_names = sorted({module_name for module_name, _ in MODULE_EXPORTS.values()})
+
+    def missing_modules():
+        missing = []
+        for module_name in module_names:
+            try:
+                if importlib.util.find_spec(module_name) is None:
+                    missing.append(module_name)
+            except (ImportError, ValueError):
+                missing.append(module_name)
+        return missing
+
+    missing = missing_modules()
+    if missing:
+        # Streamlit Cloud may start from a different working directory
+        for path in [ROOT_DIR, os.path.dirname(ROOT_DIR)]:
+            if path not in sys.path:
+                sys.path.insert(0, path)
+        importlib.invalidate_caches()
+        missing = missing_modules()
+    if not missing:
+        return LazyModules()
+
+    st.warning(f"Unable to locate: {', '.join(missing)}")
     
-    # If all strategies fail, show detailed error
+    # Show detailed error
     st.error("❌ **Critical Error: Unable to import required modules**")
     st.error("""
     **Troubleshooting Steps:**
@@ -175,7 +149,7 @@ def import_modules():
     st.error("**Please check your repository structure and redeploy.**")
     st.stop()
 
-# Import modules at module level
+# Resolve modules at module level; they are imported on first use
 try:
     MODULES = import_modules()
 except Exception as e:
@@ -199,6 +173,8 @@ if not os.path.exists(TEMPLATE_DIR):
 @st.cache_data(show_spinner=False, ttl=1800)
 def _load_excel(file_bytes: bytes):
     """Load Excel once per unique content and return dataframes."""
+    import pandas as pd
+
     xl_file = pd.ExcelFile(BytesIO(file_bytes))
     ws_wo = pd.read_excel(xl_file, "Work Order", header=None)
     ws_bq = pd.read_excel(xl_file, "Bill Quantity", header=None)
@@ -207,10 +183,114 @@ def _load_excel(file_bytes: bytes):
 
 
 @st.cache_data(show_spinner=False, ttl=600)
-def _process_bill_cached(ws_wo, ws_bq, ws_extra, premium_percent: float, premium_type: str):
+def _process_bill_cached(workbook_digest: str, ws_wo, ws_bq, ws_extra, premium_percent: float, premium_type: str):
     # Import lazily to avoid Streamlit serialization issues at import time
     from core.computations.bill_processor import process_bill
-    return process_bill(ws_wo, ws_bq, ws_extra, premium_percent, premium_type)
+    from data.cache_utils import get_cache
+    from data.single_flight import get_single_flight
+
+    # The shared cache persists processed bills across restarts and workers
+    cache_key = f"bill:{workbook_digest}:{premium_percent}:{premium_type}"
+    cache = get_cache()
+
+    def compute():
+        bill = process_bill(ws_wo, ws_bq, ws_extra, premium_percent, premium_type)
+        cache.set(cache_key, bill)
+        return bill
+
+    bill = cache.get(cache_key)
+    if bill is None:
+        # Double clicks and identical uploads wait for one computation
+        bill = get_single_flight().do(cache_key, compute, lambda: cache.get(cache_key))
+    return bill
+
+
+def _build_bill_artifacts(bill, temp_dir):
+    """
+    Describe every output document of a processed bill as a lazy artifact.
+
+    Returns an ordered dict of name -> LazyArtifact. Sheet PDFs and Word files are
+    rendered only when downloaded directly or pulled in by the merged PDF / ZIP,
+    which build their inputs in dependency order (Word files concurrently,
+    sheet PDFs one at a time).
+    """
+    lazy_pdf = MODULES['lazy_pdf']
+    lazy_word_doc = MODULES['lazy_word_doc']
+    first_page_data, last_page_data, deviation_data, extra_items_data, note_sheet_data = bill
+    
+    # Prepare Last Page data to match template expectations
+    last_page_pdf_data = MODULES['SheetData']({
+        "header": first_page_data.get("header", []),
+        "items": first_page_data.get("items", []),
+        "totals": first_page_data.get("totals", {}),
+    }, getattr(first_page_data, "fingerprint", None))
+    
+    pdfs = [
+        lazy_pdf("First Page", first_page_data, "landscape", TEMPLATE_DIR, temp_dir),
+        lazy_pdf("Last Page", last_page_pdf_data, "portrait", TEMPLATE_DIR, temp_dir),
+        lazy_pdf("Deviation Statement", deviation_data, "landscape", TEMPLATE_DIR, temp_dir),
+        lazy_pdf("Extra Items", extra_items_data, "landscape", TEMPLATE_DIR, temp_dir),
+        lazy_pdf("Note Sheet", note_sheet_data, "portrait", TEMPLATE_DIR, temp_dir),
+    ]
+    docs = [
+        lazy_word_doc(doc_name, doc_data, os.path.join(temp_dir, filename))
+        for filename, doc_name, doc_data in [
+            ("first_page.docx", "First Page", first_page_data),
+            ("last_page.docx", "Last Page", last_page_data),
+            ("deviation_statement.docx", "Deviation Statement", deviation_data),
+            ("extra_items.docx", "Extra Items", extra_items_data),
+            ("note_sheet.docx", "Note Sheet", note_sheet_data)
+        ]
+    ]
+    merged = MODULES['lazy_merged_pdf'](pdfs, os.path.join(temp_dir, "complete_bill.pdf"))
+    archive = MODULES['lazy_zip_archive'](pdfs + docs + [merged], os.path.join(temp_dir, "bill_documents.zip"))
+    
+    artifacts = {artifact.file_name: artifact for artifact in pdfs + docs}
+    artifacts["complete_bill.pdf"] = merged
+    artifacts["bill_documents.zip"] = archive
+    return artifacts
+
+
+@lru_cache(maxsize=None)
+def _download_button_accepts_callable():
+    """Return True when the installed st.download_button takes a callable as data."""
+    # Releases with deferred downloads list a Callable in the data type; older ones
+    # accept only ready bytes and reject a bound method as invalid binary data
+    try:
+        data_type = typing.get_type_hints(st.download_button).get("data")
+    except Exception:
+        return False
+    return any(typing.get_origin(arg) is collections.abc.Callable for arg in typing.get_args(data_type))
+
+
+def _download_button(label, artifact, key, **kwargs):
+    """Offer an artifact for download, building it only when it is asked for."""
+    if _download_button_accepts_callable():
+        data = artifact.read_bytes
+    elif artifact.is_built or st.button(f"⚙️ Prepare {artifact.file_name}", key=f"prepare_{key}", **kwargs):
+        data = artifact.read_bytes()
+    else:
+        # Older releases need the bytes up front; build on an explicit click instead
+        return
+    st.download_button(label=label, data=data, file_name=artifact.file_name, mime=artifact.mime,
+                       key=key, **kwargs)
+
+
+class _SessionTempDir:
+    """Scratch directory for one browser session, removed when the session is discarded."""
+
+    def __init__(self):
+        self.path = tempfile.mkdtemp(prefix="bill_session_")
+        # Runs when Streamlit drops the session state, or at interpreter exit
+        self._finalizer = weakref.finalize(self, shutil.rmtree, self.path, ignore_errors=True)
+
+
+def _session_temp_dir():
+    """Return this session's scratch directory, creating it on first use."""
+    session_dir = st.session_state.get("bill_session_dir")
+    if session_dir is None or not os.path.isdir(session_dir.path):
+        session_dir = st.session_state["bill_session_dir"] = _SessionTempDir()
+    return session_dir.path
 
 
 def main():
@@ -308,177 +388,85 @@ def main():
                     use_container_width=True
                 )
             
+            # Artifacts are only valid for the exact workbook and premium settings
+            bill_key = (hashlib.sha256(file_bytes).hexdigest(), premium_percent, premium_type)
+            
             if generate_button:
-                with st.spinner("🔄 Processing bill and generating documents..."):
+                with st.spinner("🔄 Processing bill..."):
                     try:
-                        # Extract imported functions
-                        process_bill = MODULES['process_bill']
-                        generate_pdf = MODULES['generate_pdf']
-                        create_word_doc = MODULES['create_word_doc']
-                        merge_pdfs = MODULES['merge_pdfs']
-                        create_zip_archive = MODULES['create_zip_archive']
-                        StreamlitPDFManager = MODULES['StreamlitPDFManager']
-                        
                         # Process the bill
-                        first_page_data, last_page_data, deviation_data, extra_items_data, note_sheet_data = _process_bill_cached(
-                            ws_wo, ws_bq, ws_extra, premium_percent, premium_type
+                        bill = _process_bill_cached(
+                            bill_key[0], ws_wo, ws_bq, ws_extra, premium_percent, premium_type
                         )
                         
-                        # Create temporary directory for outputs
-                        with tempfile.TemporaryDirectory() as temp_dir:
-                            pdf_files = []
-                            word_files = []
-                            
-                            # Progress tracking
-                            progress_bar = st.progress(0)
-                            status_text = st.empty()
-                            
-                            # Initialize PDF manager
-                            status_text.text("Initializing PDF generator...")
-                            pdf_manager = StreamlitPDFManager()
-                            progress_bar.progress(10)
-                            
-                            # Generate First Page PDF
-                            status_text.text("Generating First Page PDF...")
-                            try:
-                                bill_data = {
-                                    'title': 'Contractor Bill - First Page',
-                                    'subtitle': 'Work Order vs Executed Work Comparison',
-                                    'items': first_page_data.get('items', []),
-                                    'summary': {
-                                        'subtotal': first_page_data['totals'].get('grand_total', 0),
-                                        'premium': first_page_data['totals']['premium'].get('amount', 0),
-                                        'grand_total': first_page_data['totals'].get('payable', 0)
-                                    },
-                                    'footer': 'This document is computer generated and does not require signature'
-                                }
-                                
-                                config = {
-                                    'orientation': 'landscape',
-                                    'margins': {'top': 12, 'right': 12, 'bottom': 12, 'left': 12}
-                                }
-                                
-                                first_page_pdf = pdf_manager.generate_bill_pdf(bill_data, config, "first_page.pdf")
-                                if not first_page_pdf:
-                                    # Fallback to standard generator
-                                    first_page_pdf = generate_pdf("First Page", first_page_data, "landscape", TEMPLATE_DIR, temp_dir)
-                                
-                                pdf_files.append(first_page_pdf)
-                            except Exception as e:
-                                st.warning(f"Using fallback PDF generator for First Page: {str(e)}")
-                                first_page_pdf = generate_pdf("First Page", first_page_data, "landscape", TEMPLATE_DIR, temp_dir)
-                                pdf_files.append(first_page_pdf)
-                            
-                            progress_bar.progress(25)
-                            
-                            # Generate remaining PDFs
-                            status_text.text("Generating Last Page PDF...")
-                            # Prepare Last Page data to match template expectations
-                            last_page_pdf_data = {
-                                "header": first_page_data.get("header", []),
-                                "items": first_page_data.get("items", []),
-                                "totals": first_page_data.get("totals", {}),
-                            }
-                            last_page_pdf = generate_pdf("Last Page", last_page_pdf_data, "portrait", TEMPLATE_DIR, temp_dir)
-                            pdf_files.append(last_page_pdf)
-                            progress_bar.progress(35)
-                            
-                            status_text.text("Generating Deviation Statement PDF...")
-                            deviation_pdf = generate_pdf("Deviation Statement", deviation_data, "landscape", TEMPLATE_DIR, temp_dir)
-                            pdf_files.append(deviation_pdf)
-                            progress_bar.progress(45)
-                            
-                            status_text.text("Generating Extra Items PDF...")
-                            extra_items_pdf = generate_pdf("Extra Items", extra_items_data, "landscape", TEMPLATE_DIR, temp_dir)
-                            pdf_files.append(extra_items_pdf)
-                            progress_bar.progress(55)
-                            
-                            status_text.text("Generating Note Sheet PDF...")
-                            note_sheet_pdf = generate_pdf("Note Sheet", note_sheet_data, "portrait", TEMPLATE_DIR, temp_dir)
-                            pdf_files.append(note_sheet_pdf)
-                            progress_bar.progress(65)
-                            
-                            # Generate Word documents
-                            status_text.text("Creating Word documents...")
-                            
-                            word_files_data = [
-                                ("first_page.docx", "First Page", first_page_data),
-                                ("last_page.docx", "Last Page", last_page_data),
-                                ("deviation_statement.docx", "Deviation Statement", deviation_data),
-                                ("extra_items.docx", "Extra Items", extra_items_data),
-                                ("note_sheet.docx", "Note Sheet", note_sheet_data)
-                            ]
-                            
-                            for i, (filename, doc_name, doc_data) in enumerate(word_files_data):
-                                doc_path = os.path.join(temp_dir, filename)
-                                create_word_doc(doc_name, doc_data, doc_path)
-                                word_files.append(doc_path)
-                                progress_bar.progress(65 + (i + 1) * 4)
-                            
-                            # Merge PDFs
-                            status_text.text("Merging all PDFs...")
-                            merged_pdf = os.path.join(temp_dir, "complete_bill.pdf")
-                            merge_pdfs(pdf_files, merged_pdf)
-                            progress_bar.progress(90)
-                            
-                            # Create ZIP archive
-                            status_text.text("Creating ZIP archive...")
-                            all_files = pdf_files + word_files + [merged_pdf]
-                            zip_path = os.path.join(temp_dir, "bill_documents.zip")
-                            create_zip_archive(all_files, zip_path)
-                            progress_bar.progress(100)
-                            
-                            status_text.text("✅ All documents generated successfully!")
-                            
-                            # Display success message
-                            st.success("🎉 **Documents generated successfully!**")
-                            
-                            # Download section
-                            st.markdown("---")
-                            st.subheader("📥 Download Generated Documents")
-                            
-                            col1, col2, col3 = st.columns(3)
-                            
-                            with col1:
-                                st.markdown("#### Complete Bill (PDF)")
-                                with open(merged_pdf, "rb") as f:
-                                    st.download_button(
-                                        label="📄 Download Complete PDF",
-                                        data=f,
-                                        file_name="complete_bill.pdf",
-                                        mime="application/pdf",
-                                        use_container_width=True
-                                    )
-                            
-                            with col2:
-                                st.markdown("#### All Documents (ZIP)")
-                                with open(zip_path, "rb") as f:
-                                    st.download_button(
-                                        label="📦 Download ZIP Archive",
-                                        data=f,
-                                        file_name="bill_documents.zip",
-                                        mime="application/zip",
-                                        use_container_width=True
-                                    )
-                            
-                            with col3:
-                                st.markdown("#### Bill Summary")
-                                grand_total = first_page_data['totals']['grand_total']
-                                premium_amount = first_page_data['totals']['premium']['amount']
-                                payable = first_page_data['totals']['payable']
-                                
-                                st.metric("Grand Total", f"₹{grand_total:,.2f}")
-                                st.metric("Premium", f"₹{premium_amount:,.2f}", 
-                                         delta=f"{premium_percent}% {premium_type}")
-                                st.metric("Total Payable", f"₹{payable:,.2f}")
-                            
-                            # Clear progress indicators
-                            progress_bar.empty()
-                            status_text.empty()
-                            
+                        # Describe every document lazily; nothing is rendered until requested
+                        previous = st.session_state.pop("bill_artifacts", None)
+                        if previous:
+                            shutil.rmtree(previous["temp_dir"], ignore_errors=True)
+                        temp_dir = tempfile.mkdtemp(prefix="bill_", dir=_session_temp_dir())
+                        st.session_state["bill_artifacts"] = {
+                            "key": bill_key,
+                            "temp_dir": temp_dir,
+                            "first_page_data": bill[0],
+                            "artifacts": _build_bill_artifacts(bill, temp_dir),
+                        }
                     except Exception as e:
                         st.error(f"❌ **Error processing bill:** {str(e)}")
                         st.exception(e)
+            
+            state = st.session_state.get("bill_artifacts")
+            if state and state["key"] == bill_key:
+                artifacts = state["artifacts"]
+                first_page_data = state["first_page_data"]
+                
+                # Display success message
+                st.success("🎉 **Bill processed!** Documents are generated when you download them.")
+                
+                # Download section
+                st.markdown("---")
+                st.subheader("📥 Download Generated Documents")
+                
+                col1, col2, col3 = st.columns(3)
+                
+                with col1:
+                    st.markdown("#### Complete Bill (PDF)")
+                    _download_button(
+                        "📄 Download Complete PDF",
+                        artifacts["complete_bill.pdf"],
+                        key="download_complete_bill.pdf",
+                        use_container_width=True
+                    )
+                
+                with col2:
+                    st.markdown("#### All Documents (ZIP)")
+                    _download_button(
+                        "📦 Download ZIP Archive",
+                        artifacts["bill_documents.zip"],
+                        key="download_bill_documents.zip",
+                        use_container_width=True
+                    )
+                
+                with col3:
+                    st.markdown("#### Bill Summary")
+                    grand_total = first_page_data['totals']['grand_total']
+                    premium_amount = first_page_data['totals']['premium']['amount']
+                    payable = first_page_data['totals']['payable']
+                    
+                    st.metric("Grand Total", f"₹{grand_total:,.2f}")
+                    st.metric("Premium", f"₹{premium_amount:,.2f}", 
+                             delta=f"{premium_percent}% {premium_type}")
+                    st.metric("Total Payable", f"₹{payable:,.2f}")
+                
+                with st.expander("📂 Individual Documents"):
+                    for name, artifact in artifacts.items():
+                        if name in ("complete_bill.pdf", "bill_documents.zip"):
+                            continue
+                        _download_button(
+                            f"⬇️ {artifact.file_name}",
+                            artifact,
+                            key=f"download_{name}",
+                            use_container_width=True
+                        )
                         
         except Exception as e:
             st.error(f"❌ **Error reading Excel file:** {str(e)}")
@@ -24,7 +24,18 @@ DEFAULT_SETTINGS = {
         "default_margin_bottom": "15mm",
         "default_margin_left": "10mm",
         "default_margin_right": "10mm",
-        "page_size": "A4"
+        "page_size": "A4",
+        "isolate_engines": True,
+        "stamp_certificates": False,
+        "engine_timeout": 60.0,
+        "hedge_after": 30.0,
+        "breaker_failures": 3,
+        "breaker_reset": 60.0,
+        "engine_health_path": "",
+        "job_memory_limit": 2 * 1024 * 1024 * 1024,
+        "job_cpu_limit": 45,
+        "worker_max_tasks": 200,
+        "worker_max_rss": 1024 * 1024 * 1024
     },
     "paths": {
         "template_dir": "templates",
@@ -33,7 +44,11 @@ DEFAULT_SETTINGS = {
     },
     "performance": {
         "cache_ttl": 3600,
-        "max_cache_size": 1024
+        "max_cache_size": 1024,
+        "max_cache_bytes": 256 * 1024 * 1024,
+        "disk_cache": True,
+        "disk_cache_dir": "",
+        "disk_cache_size": 512 * 1024 * 1024
     }
 }
 
@@ -0,0 +1,26 @@
+"""
+Shared pytest setup for the Stream Bill Generator
+Tests must not read or write the user's real cache directory, where the disk
+cache and the engine circuit breakers of the running app live.
+"""
+import os
+
+import pytest
+
+from config.settings import get_setting, set_setting
+
+
+@pytest.fixture(autouse=True, scope="session")
+def isolated_cache_dir(tmp_path_factory):
+    """Point the disk cache and the engine health database at a temporary directory"""
+    cache_dir = str(tmp_path_factory.mktemp("bill-cache"))
+    previous_dir = os.environ.get("BILL_CACHE_DIR")
+    previous_health_path = get_setting("pdf.engine_health_path")
+    os.environ["BILL_CACHE_DIR"] = cache_dir
+    set_setting("pdf.engine_health_path", os.path.join(cache_dir, "engine_health.sqlite3"))
+    yield cache_dir
+    set_setting("pdf.engine_health_path", previous_health_path)
+    if previous_dir is None:
+        os.environ.pop("BILL_CACHE_DIR", None)
+    else:
+        os.environ["BILL_CACHE_DIR"] = previous_dir
@@ -2,12 +2,17 @@
 Core computation logic for bill processing - extracted from streamlit_app.py
 This module contains the core business logic that should not be modified.
 """
+import hashlib
 import pandas as pd
 import numpy as np
 from datetime import datetime, date
 
 def safe_float(value, default=0.0):
     """Safely convert a value to float with proper error handling"""
+    # Fast path for the common case of values that are already numeric
+    value_type = type(value)
+    if value_type is float or value_type is int:
+        return float(value)
     try:
         if value is None:
             return default
@@ -25,6 +30,167 @@ def safe_float(value, default=0.0):
     except (ValueError, TypeError):
         return default
 
+def _coerce_cells(series):
+    """
+    Convert a Series cell by cell like safe_float, without a default
+
+    Returns:
+        tuple: (float Series, bool Series marking the cells that converted)
+    """
+    if isinstance(series.dtype, np.dtype) and series.dtype.kind in "biuf":
+        # Numeric columns hold plain numbers; NaN passes through as in safe_float
+        return series.astype(float), pd.Series(True, index=series.index)
+    if series.dtype != object:
+        # Nullable, complex, datetime etc.: judge the Python values they hold
+        series = pd.Series(series.tolist(), index=series.index, dtype=object)
+
+    result = pd.Series(np.nan, index=series.index, dtype=float)
+    converted = pd.Series(False, index=series.index)
+    if series.empty:
+        return result, converted
+
+    # int and float subclasses convert as-is (bool and np.float64 included,
+    # other numpy scalars, bytes and complex do not)
+    is_real = series.map(lambda value: isinstance(value, (int, float))).astype(bool)
+    if is_real.any():
+        result[is_real] = series[is_real].astype(float)
+        converted |= is_real
+
+    is_str = series.map(lambda value: isinstance(value, str)).astype(bool)
+    if is_str.any():
+        cleaned = series[is_str].str.strip().str.replace(',', '', regex=False).str.replace(' ', '', regex=False)
+        parsed = pd.to_numeric(cleaned.replace('', np.nan), errors='coerce').astype(float)
+        ok = parsed.notna()
+        # Spellings to_numeric rejects but float() may accept ("nan", "1_000")
+        misses = ~ok & (cleaned != '')
+        if misses.any():
+            retried = [safe_float(text, None) for text in cleaned[misses]]
+            parsed[misses] = [np.nan if value is None else value for value in retried]
+            ok[misses] = [value is not None for value in retried]
+        result[is_str] = parsed
+        converted[is_str] = ok
+    return result, converted
+
+def coerce_numeric(values, default=0.0):
+    """
+    Vectorized counterpart of safe_float for a whole column of cell values
+
+    Gives safe_float(cell, default) for every cell of ``values.tolist()``:
+    strings are stripped and have commas and spaces removed before parsing,
+    ints and floats are converted as-is (NaN included), and blanks, missing
+    cells, junk strings and any other cell types (dates, numpy integers in
+    object columns etc.) become ``default``.
+
+    Args:
+        values: pandas Series or any iterable of cell values
+        default: Value used for cells that cannot be converted
+
+    Returns:
+        pd.Series: float Series aligned with the input
+    """
+    if isinstance(values, pd.Series):
+        series = values
+    else:
+        series = pd.Series(list(values), dtype=object)
+    result, converted = _coerce_cells(series)
+    return result.where(converted, default)
+
+def _numeric_column(ws, col, start, stop):
+    """Coerce rows [start, stop) of a sheet column, padding short sheets with zeros"""
+    if stop <= start:
+        return []
+    if ws.shape[0] <= start:
+        return [0] * (stop - start)
+    cells = ws.iloc[start:stop, col]
+    result, converted = _coerce_cells(cells)
+    # Missing and unconvertible cells keep the historical integer 0
+    values = result.astype(object).where(converted & cells.notna().to_numpy(), 0).tolist()
+    return values + [0] * (stop - start - len(values))
+
+def _text_column(ws, col, start, stop):
+    """Stringify rows [start, stop) of a sheet column, blank for empty cells"""
+    if stop <= start:
+        return []
+    return [str(val) if pd.notnull(val) else "" for val in ws.iloc[start:stop, col].tolist()]
+
+def normalize_header(header_block):
+    """
+    Turn the raw header block into render-ready display strings
+
+    Every cell becomes a trimmed string ("" for blanks). Date cells are
+    formatted as dd-mm-yyyy and ISO-looking text ("yyyy-mm-dd...") as
+    dd/mm/yyyy, so templates can print the header without any per-cell logic.
+
+    Args:
+        header_block: DataFrame slice holding the header cells
+
+    Returns:
+        list: Header rows as lists of strings
+    """
+    if header_block.empty:
+        return [[] for _ in range(header_block.shape[0])]
+
+    cells = pd.Series(header_block.to_numpy(dtype=object).ravel(), dtype=object)
+    present = cells.notna()
+    is_date = present & cells.map(lambda val: isinstance(val, (pd.Timestamp, datetime, date)))
+
+    text = cells.where(present, "")
+    if is_date.any():
+        text[is_date] = cells[is_date].map(lambda val: val.strftime("%d-%m-%Y"))
+    text = text.astype(str).str.strip()
+
+    # Text cells holding ISO dates are shown day first
+    parts = text.str.extract(r"^(\d{4})-(\d{2})-(\d{2})")
+    is_iso = parts.notna().all(axis=1)
+    if is_iso.any():
+        fields = parts[is_iso].astype(int)
+        is_iso[is_iso] = (fields > 0).all(axis=1)
+        iso = parts[is_iso]
+        text[is_iso] = iso[2] + "/" + iso[1] + "/" + iso[0]
+
+    return text.to_numpy(dtype=object).reshape(header_block.shape).tolist()
+
+def bill_fingerprint(header, text_columns, numeric_columns, totals):
+    """
+    Hash the typed inputs of a bill into a short cache key
+
+    Text columns are fed to the hash joined with unit separators and numeric
+    columns as packed float64 arrays, so the cost is one pass over the raw
+    cells rather than a JSON encoding of every derived item dict.
+
+    Args:
+        header: Normalized header rows
+        text_columns: Lists of cell strings
+        numeric_columns: Lists of numbers
+        totals: Scalars that select the computation (premium, totals)
+
+    Returns:
+        str: Hex digest identifying the bill
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update("\x1e".join("\x1f".join(row) for row in header).encode("utf-8"))
+    for column in text_columns:
+        digest.update(len(column).to_bytes(8, "little"))
+        digest.update("\x1f".join(column).encode("utf-8"))
+    for column in numeric_columns:
+        digest.update(len(column).to_bytes(8, "little"))
+        digest.update(np.asarray(column, dtype=np.float64).tobytes())
+    digest.update(repr(tuple(totals)).encode("utf-8"))
+    return digest.hexdigest()
+
+class SheetData(dict):
+    """
+    Sheet data returned by process_bill
+
+    A plain dict of the sheet's values with a ``fingerprint`` attribute that
+    identifies its content. The fingerprint is not an item, so the JSON, XML
+    and CSV exports never serialize it; copies made with dict() drop it.
+    """
+
+    def __init__(self, data=(), fingerprint=None):
+        super().__init__(data)
+        self.fingerprint = fingerprint
+
 def number_to_words(number):
     """Convert number to words using num2words"""
     try:
@@ -46,6 +212,8 @@ def process_bill(ws_wo, ws_bq, ws_extra, premium_percent, premium_type):
     
     Returns:
         tuple: (first_page_data, last_page_data, deviation_data, extra_items_data, note_sheet_data)
+        Each is a SheetData whose fingerprint attribute identifies its content;
+        callers that edit the data afterwards should copy it into a plain dict.
     """
     first_page_data = {"header": [], "items": [], "totals": {}}
     last_page_data = {"payable_amount": 0, "amount_words": ""}
@@ -53,77 +221,48 @@ def process_bill(ws_wo, ws_bq, ws_extra, premium_percent, premium_type):
     extra_items_data = {"items": []}
     note_sheet_data = {"notes": []}
 
-    # Header (A1:G19) only — matching actual data range
-    header_data = ws_wo.iloc[:19, :7].replace(np.nan, "").values.tolist()
-
-    # Ensure all dates are formatted as date-only strings
-    for i in range(len(header_data)):
-        for j in range(len(header_data[i])):
-            val = header_data[i][j]
-            if isinstance(val, (pd.Timestamp, datetime, date)):
-                header_data[i][j] = val.strftime("%d-%m-%Y")
-
-    first_page_data["header"] = header_data
+    # Header (A1:G19) only — matching actual data range, normalized once for rendering
+    first_page_data["header"] = normalize_header(ws_wo.iloc[:19, :7])
 
     # Work Order items
     last_row_wo = ws_wo.shape[0]
-    for i in range(21, last_row_wo):
-        qty_raw = ws_bq.iloc[i, 3] if i < ws_bq.shape[0] and pd.notnull(ws_bq.iloc[i, 3]) else None
-        rate_raw = ws_wo.iloc[i, 4] if pd.notnull(ws_wo.iloc[i, 4]) else None
-
-        qty = 0
-        if isinstance(qty_raw, (int, float)):
-            qty = float(qty_raw)
-        elif isinstance(qty_raw, str):
-            cleaned_qty = qty_raw.strip().replace(',', '').replace(' ', '')
-            # Handle empty string case
-            if cleaned_qty == '':
-                qty = 0
-            else:
-                try:
-                    qty = float(cleaned_qty)
-                except ValueError:
-                    qty = 0
-
-        rate = 0
-        if isinstance(rate_raw, (int, float)):
-            rate = float(rate_raw)
-        elif isinstance(rate_raw, str):
-            cleaned_rate = rate_raw.strip().replace(',', '').replace(' ', '')
-            # Handle empty string case
-            if cleaned_rate == '':
-                rate = 0
-            else:
-                try:
-                    rate = float(cleaned_rate)
-                except ValueError:
-                    rate = 0
+    wo_serial = _text_column(ws_wo, 0, 21, last_row_wo)
+    wo_description = _text_column(ws_wo, 1, 21, last_row_wo)
+    wo_unit = _text_column(ws_wo, 2, 21, last_row_wo)
+    wo_remark = _text_column(ws_wo, 6, 21, last_row_wo)
+    wo_qty = _numeric_column(ws_wo, 3, 21, last_row_wo)
+    wo_rate = _numeric_column(ws_wo, 4, 21, last_row_wo)
+    bq_qty = _numeric_column(ws_bq, 3, 21, last_row_wo)
+
+    for k in range(len(wo_rate)):
+        qty = bq_qty[k]
+        rate = wo_rate[k]
 
         # Check if rate is blank or zero - if so, only populate S.No., Item of *, and Remarks
         if rate is None or rate == 0:
             item = {
-                "serial_no": str(ws_wo.iloc[i, 0]) if pd.notnull(ws_wo.iloc[i, 0]) else "",
-                "description": str(ws_wo.iloc[i, 1]) if pd.notnull(ws_wo.iloc[i, 1]) else "",
+                "serial_no": wo_serial[k],
+                "description": wo_description[k],
                 "unit": "",  # Leave blank
                 "quantity": "",  # Leave blank
                 "quantity_since_last": "",  # Leave blank
                 "quantity_upto_date": "",  # Leave blank
                 "rate": "",  # Leave blank
-                "remark": str(ws_wo.iloc[i, 6]) if pd.notnull(ws_wo.iloc[i, 6]) else "",
+                "remark": wo_remark[k],
                 "amount": "",  # Leave blank
                 "amount_previous": "",  # Leave blank
                 "is_divider": False
             }
         else:
             item = {
-                "serial_no": str(ws_wo.iloc[i, 0]) if pd.notnull(ws_wo.iloc[i, 0]) else "",
-                "description": str(ws_wo.iloc[i, 1]) if pd.notnull(ws_wo.iloc[i, 1]) else "",
-                "unit": str(ws_wo.iloc[i, 2]) if pd.notnull(ws_wo.iloc[i, 2]) else "",
+                "serial_no": wo_serial[k],
+                "description": wo_description[k],
+                "unit": wo_unit[k],
                 "quantity": qty,
                 "quantity_since_last": qty,  # For template compatibility
                 "quantity_upto_date": qty,   # For template compatibility
                 "rate": rate,
-                "remark": str(ws_wo.iloc[i, 6]) if pd.notnull(ws_wo.iloc[i, 6]) else "",
+                "remark": wo_remark[k],
                 "amount": round(qty * rate) if qty and rate else 0,
                 "amount_previous": round(qty * rate) if qty and rate else 0,  # For template compatibility
                 "is_divider": False
@@ -149,63 +288,42 @@ def process_bill(ws_wo, ws_bq, ws_extra, premium_percent, premium_type):
 
     # Extra Items
     last_row_extra = ws_extra.shape[0]
-    for j in range(6, last_row_extra):
-        qty_raw = ws_extra.iloc[j, 3] if pd.notnull(ws_extra.iloc[j, 3]) else None
-        rate_raw = ws_extra.iloc[j, 5] if pd.notnull(ws_extra.iloc[j, 5]) else None
-
-        qty = 0
-        if isinstance(qty_raw, (int, float)):
-            qty = float(qty_raw)
-        elif isinstance(qty_raw, str):
-            cleaned_qty = qty_raw.strip().replace(',', '').replace(' ', '')
-            # Handle empty string case
-            if cleaned_qty == '':
-                qty = 0
-            else:
-                try:
-                    qty = float(cleaned_qty)
-                except ValueError:
-                    qty = 0
-
-        rate = 0
-        if isinstance(rate_raw, (int, float)):
-            rate = float(rate_raw)
-        elif isinstance(rate_raw, str):
-            cleaned_rate = rate_raw.strip().replace(',', '').replace(' ', '')
-            # Handle empty string case
-            if cleaned_rate == '':
-                rate = 0
-            else:
-                try:
-                    rate = float(cleaned_rate)
-                except ValueError:
-                    rate = 0
+    extra_serial = _text_column(ws_extra, 0, 6, last_row_extra)
+    extra_remark = _text_column(ws_extra, 1, 6, last_row_extra)
+    extra_description = _text_column(ws_extra, 2, 6, last_row_extra)
+    extra_unit = _text_column(ws_extra, 4, 6, last_row_extra)
+    extra_qty = _numeric_column(ws_extra, 3, 6, last_row_extra)
+    extra_rate = _numeric_column(ws_extra, 5, 6, last_row_extra)
+
+    for k in range(len(extra_rate)):
+        qty = extra_qty[k]
+        rate = extra_rate[k]
 
         # Check if rate is blank or zero - if so, only populate S.No., Item of *, and Remarks
         if rate is None or rate == 0:
             item = {
-                "serial_no": str(ws_extra.iloc[j, 0]) if pd.notnull(ws_extra.iloc[j, 0]) else "",
-                "description": str(ws_extra.iloc[j, 2]) if pd.notnull(ws_extra.iloc[j, 2]) else "",
+                "serial_no": extra_serial[k],
+                "description": extra_description[k],
                 "unit": "",  # Leave blank
                 "quantity": "",  # Leave blank
                 "quantity_since_last": "",  # Leave blank
                 "quantity_upto_date": "",  # Leave blank
                 "rate": "",  # Leave blank
-                "remark": str(ws_extra.iloc[j, 1]) if pd.notnull(ws_extra.iloc[j, 1]) else "",
+                "remark": extra_remark[k],
                 "amount": "",  # Leave blank
                 "amount_previous": "",  # Leave blank
                 "is_divider": False
             }
         else:
             item = {
-                "serial_no": str(ws_extra.iloc[j, 0]) if pd.notnull(ws_extra.iloc[j, 0]) else "",
-                "description": str(ws_extra.iloc[j, 2]) if pd.notnull(ws_extra.iloc[j, 2]) else "",
-                "unit": str(ws_extra.iloc[j, 4]) if pd.notnull(ws_extra.iloc[j, 4]) else "",
+                "serial_no": extra_serial[k],
+                "description": extra_description[k],
+                "unit": extra_unit[k],
                 "quantity": qty,
                 "quantity_since_last": qty,  # For template compatibility
                 "quantity_upto_date": qty,   # For template compatibility
                 "rate": rate,
-                "remark": str(ws_extra.iloc[j, 1]) if pd.notnull(ws_extra.iloc[j, 1]) else "",
+                "remark": extra_remark[k],
                 "amount": round(qty * rate) if qty and rate else 0,
                 "amount_previous": round(qty * rate) if qty and rate else 0,  # For template compatibility
                 "is_divider": False
@@ -215,9 +333,9 @@ def process_bill(ws_wo, ws_bq, ws_extra, premium_percent, premium_type):
 
     # Totals
     data_items = [item for item in first_page_data["items"] if not item.get("is_divider", False)]
-    total_amount = round(sum(safe_float(item.get("amount", 0)) for item in data_items))
+    total_amount = round(coerce_numeric([item.get("amount", 0) for item in data_items]).sum(skipna=False))
     premium_amount = round(total_amount * (premium_percent / 100) if premium_type == "above" else -total_amount * (premium_percent / 100))
-    payable_amount = round(safe_float(total_amount) + safe_float(premium_amount))
+    payable_amount = round(total_amount + premium_amount)
 
     first_page_data["totals"] = {
         "grand_total": total_amount,
@@ -228,7 +346,7 @@ def process_bill(ws_wo, ws_bq, ws_extra, premium_percent, premium_type):
     try:
         extra_items_start = next(i for i, item in enumerate(first_page_data["items"]) if item.get("description") == "Extra Items (With Premium)")
         extra_items = [item for item in first_page_data["items"][extra_items_start + 1:] if not item.get("is_divider", False)]
-        extra_items_sum = round(sum(safe_float(item.get("amount", 0)) for item in extra_items))
+        extra_items_sum = round(coerce_numeric([item.get("amount", 0) for item in extra_items]).sum(skipna=False))
         extra_items_premium = round(extra_items_sum * (premium_percent / 100) if premium_type == "above" else -extra_items_sum * (premium_percent / 100))
         first_page_data["totals"]["extra_items_sum"] = extra_items_sum + extra_items_premium
     except StopIteration:
@@ -242,52 +360,10 @@ def process_bill(ws_wo, ws_bq, ws_extra, premium_percent, premium_type):
     executed_total = 0
     overall_excess = 0
     overall_saving = 0
-    for i in range(21, last_row_wo):
-        qty_wo_raw = ws_wo.iloc[i, 3] if pd.notnull(ws_wo.iloc[i, 3]) else None
-        rate_raw = ws_wo.iloc[i, 4] if pd.notnull(ws_wo.iloc[i, 4]) else None
-        qty_bill_raw = ws_bq.iloc[i, 3] if i < ws_bq.shape[0] and pd.notnull(ws_bq.iloc[i, 3]) else None
-
-        qty_wo = 0
-        if isinstance(qty_wo_raw, (int, float)):
-            qty_wo = float(qty_wo_raw)
-        elif isinstance(qty_wo_raw, str):
-            cleaned_qty_wo = qty_wo_raw.strip().replace(',', '').replace(' ', '')
-            # Handle empty string case
-            if cleaned_qty_wo == '':
-                qty_wo = 0
-            else:
-                try:
-                    qty_wo = float(cleaned_qty_wo)
-                except ValueError:
-                    qty_wo = 0
-
-        rate = 0
-        if isinstance(rate_raw, (int, float)):
-            rate = float(rate_raw)
-        elif isinstance(rate_raw, str):
-            cleaned_rate = rate_raw.strip().replace(',', '').replace(' ', '')
-            # Handle empty string case
-            if cleaned_rate == '':
-                rate = 0
-            else:
-                try:
-                    rate = float(cleaned_rate)
-                except ValueError:
-                    rate = 0
-
-        qty_bill = 0
-        if isinstance(qty_bill_raw, (int, float)):
-            qty_bill = float(qty_bill_raw)
-        elif isinstance(qty_bill_raw, str):
-            cleaned_qty_bill = qty_bill_raw.strip().replace(',', '').replace(' ', '')
-            # Handle empty string case
-            if cleaned_qty_bill == '':
-                qty_bill = 0
-            else:
-                try:
-                    qty_bill = float(cleaned_qty_bill)
-                except ValueError:
-                    qty_bill = 0
+    for k in range(len(wo_rate)):
+        qty_wo = wo_qty[k]
+        rate = wo_rate[k]
+        qty_bill = bq_qty[k]
 
         amt_wo = round(qty_wo * rate)
         amt_bill = round(qty_bill * rate)
@@ -299,8 +375,8 @@ def process_bill(ws_wo, ws_bq, ws_extra, premium_percent, premium_type):
         # Check if rate is blank or zero - if so, only populate Item No.
         if rate is None or rate == 0:
             item = {
-                "serial_no": str(ws_wo.iloc[i, 0]) if pd.notnull(ws_wo.iloc[i, 0]) else "",
-                "description": str(ws_wo.iloc[i, 1]) if pd.notnull(ws_wo.iloc[i, 1]) else "",  # Populate Description* for zero rate
+                "serial_no": wo_serial[k],
+                "description": wo_description[k],  # Populate Description* for zero rate
                 "unit": "",  # Leave blank as per specification
                 "qty_wo": "",  # Leave blank as per specification
                 "rate": "",  # Leave blank as per specification
@@ -311,7 +387,7 @@ def process_bill(ws_wo, ws_bq, ws_extra, premium_percent, premium_type):
                 "excess_amt": "",  # Leave blank as per specification
                 "saving_qty": "",  # Leave blank as per specification
                 "saving_amt": "",  # Leave blank as per specification
-                "remark": str(ws_wo.iloc[i, 6]) if pd.notnull(ws_wo.iloc[i, 6]) else ""  # Populate Remark for zero rate
+                "remark": wo_remark[k]  # Populate Remark for zero rate
             }
             # Don't add to totals when rate is zero
             deviation_item_amt_wo = 0
@@ -320,12 +396,12 @@ def process_bill(ws_wo, ws_bq, ws_extra, premium_percent, premium_type):
             deviation_item_saving_amt = 0
         else:
             # For non-zero rate items, use just the main description like the original
-            full_description = str(ws_wo.iloc[i, 1]) if pd.notnull(ws_wo.iloc[i, 1]) else ""
+            full_description = wo_description[k]
             
             item = {
-                "serial_no": str(ws_wo.iloc[i, 0]) if pd.notnull(ws_wo.iloc[i, 0]) else "",
+                "serial_no": wo_serial[k],
                 "description": full_description,
-                "unit": str(ws_wo.iloc[i, 2]) if pd.notnull(ws_wo.iloc[i, 2]) else "",
+                "unit": wo_unit[k],
                 "qty_wo": qty_wo,
                 "rate": rate,
                 "amt_wo": amt_wo,
@@ -335,7 +411,7 @@ def process_bill(ws_wo, ws_bq, ws_extra, premium_percent, premium_type):
                 "excess_amt": excess_amt,
                 "saving_qty": saving_qty,
                 "saving_amt": saving_amt,
-                "remark": str(ws_wo.iloc[i, 6]) if pd.notnull(ws_wo.iloc[i, 6]) else ""
+                "remark": wo_remark[k]
             }
             # Add to totals when rate is valid
             deviation_item_amt_wo = amt_wo
@@ -350,15 +426,17 @@ def process_bill(ws_wo, ws_bq, ws_extra, premium_percent, premium_type):
         overall_saving += deviation_item_saving_amt
 
     # Deviation Summary
-    tender_premium_f = round(safe_float(work_order_total) * (premium_percent / 100) if premium_type == "above" else -safe_float(work_order_total) * (premium_percent / 100))
-    tender_premium_h = round(safe_float(executed_total) * (premium_percent / 100) if premium_type == "above" else -safe_float(executed_total) * (premium_percent / 100))
-    tender_premium_j = round(safe_float(overall_excess) * (premium_percent / 100) if premium_type == "above" else -safe_float(overall_excess) * (premium_percent / 100))
-    tender_premium_l = round(safe_float(overall_saving) * (premium_percent / 100) if premium_type == "above" else -safe_float(overall_saving) * (premium_percent / 100))
-    grand_total_f = round(safe_float(work_order_total) + safe_float(tender_premium_f))
-    grand_total_h = round(safe_float(executed_total) + safe_float(tender_premium_h))
-    grand_total_j = round(safe_float(overall_excess) + safe_float(tender_premium_j))
-    grand_total_l = round(safe_float(overall_saving) + safe_float(tender_premium_l))
-    net_difference = round(safe_float(grand_total_h) - safe_float(grand_total_f))
+    premium_sign = 1 if premium_type == "above" else -1
+    premium_rate = premium_sign * (premium_percent / 100)
+    tender_premium_f = round(work_order_total * premium_rate)
+    tender_premium_h = round(executed_total * premium_rate)
+    tender_premium_j = round(overall_excess * premium_rate)
+    tender_premium_l = round(overall_saving * premium_rate)
+    grand_total_f = round(work_order_total + tender_premium_f)
+    grand_total_h = round(executed_total + tender_premium_h)
+    grand_total_j = round(overall_excess + tender_premium_j)
+    grand_total_l = round(overall_saving + tender_premium_l)
+    net_difference = round(grand_total_h - grand_total_f)
 
     deviation_data["summary"] = {
         "work_order_total": round(work_order_total),
@@ -377,4 +455,19 @@ def process_bill(ws_wo, ws_bq, ws_extra, premium_percent, premium_type):
         "net_difference": net_difference
     }
 
-    return first_page_data, last_page_data, deviation_data, extra_items_data, note_sheet_data
\ No newline at end of file
+    # One structural key for the whole bill, tagged per sheet, so renderers and
+    # caches need not hash the sheet data again
+    fingerprint = bill_fingerprint(
+        first_page_data["header"],
+        [wo_serial, wo_description, wo_unit, wo_remark,
+         extra_serial, extra_remark, extra_description, extra_unit],
+        [wo_qty, wo_rate, bq_qty, extra_qty, extra_rate],
+        [premium_percent, premium_type, payable_amount, net_difference],
+    )
+    return (
+        SheetData(first_page_data, f"{fingerprint}:first_page"),
+        SheetData(last_page_data, f"{fingerprint}:last_page"),
+        SheetData(deviation_data, f"{fingerprint}:deviation_statement"),
+        SheetData(extra_items_data, f"{fingerprint}:extra_items"),
+        SheetData(note_sheet_data, f"{fingerprint}:note_sheet"),
+    )
\ No newline at end of file
@@ -0,0 +1,245 @@
+"""
+PDF engine health tracking for the Stream Bill Generator
+This module keeps a circuit breaker per PDF engine so an engine that keeps
+failing (e.g. pdfkit without the wkhtmltopdf binary) is skipped instead of
+being retried, and logged, on every sheet of every bill.
+
+- closed: the engine is used normally; consecutive failures are counted
+- open: after failure_threshold failures in a row the engine is skipped for
+  reset_timeout seconds
+- half-open: after the cool-down one caller probes the engine; success closes
+  the breaker, failure opens it again
+
+State lives in a small SQLite database next to the disk cache, so every
+worker process and every restart shares what the others have learned.
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+import weakref
+from typing import Any, Dict, List, Optional
+
+from config.settings import get_setting
+from data.disk_cache import default_cache_dir
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS engines (
+    engine TEXT PRIMARY KEY,
+    failures INTEGER NOT NULL,
+    opened_at REAL,
+    probe_at REAL,
+    probe_token TEXT
+);
+"""
+
+# SQLite connections must not cross fork(); children reopen the database
+_HEALTH_TRACKERS = weakref.WeakSet()
+
+def _reset_connections_after_fork() -> None:
+    for health in list(_HEALTH_TRACKERS):
+        health._local = threading.local()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_connections_after_fork)
+
+class EngineHealth:
+    """Circuit breakers for PDF engines, shared across processes"""
+
+    def __init__(self, path: Optional[str] = None, failure_threshold: Optional[int] = None,
+                 reset_timeout: Optional[float] = None):
+        """
+        Initialize the EngineHealth tracker
+
+        Args:
+            path (Optional[str]): SQLite file (default: engine_health.sqlite3 in the cache directory)
+            failure_threshold (Optional[int]): Consecutive failures that open a breaker
+                (default: pdf.breaker_failures)
+            reset_timeout (Optional[float]): Seconds an open breaker waits before a probe
+                (default: pdf.breaker_reset)
+        """
+        self.path = path or get_setting("pdf.engine_health_path") or os.path.join(
+            default_cache_dir(), "engine_health.sqlite3")
+        self.failure_threshold = failure_threshold or get_setting("pdf.breaker_failures", 3)
+        self.reset_timeout = get_setting("pdf.breaker_reset", 60.0) if reset_timeout is None else reset_timeout
+        self._local = threading.local()
+        _HEALTH_TRACKERS.add(self)
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(engines)")]
+            if "probe_token" not in columns:
+                conn.execute("ALTER TABLE engines ADD COLUMN probe_token TEXT")
+            self._local.conn = conn
+        return conn
+
+    def allow(self, engine: str) -> Optional[str]:
+        """
+        Check whether engine may be used now
+
+        When an open breaker has cooled down, exactly one caller (in any
+        process) is allowed through as the half-open probe.
+
+        Args:
+            engine (str): Engine name
+
+        Returns:
+            Optional[str]: None while the breaker is open, otherwise a claim
+                token to pass to release()
+        """
+        token = uuid.uuid4().hex
+        try:
+            conn = self._connection()
+            row = conn.execute("SELECT opened_at FROM engines WHERE engine = ?", (engine,)).fetchone()
+            if row is None or row[0] is None:
+                return token
+            now = time.time()
+            if now < row[0] + self.reset_timeout:
+                return None
+            # A probe claim expires in case the prober died
+            claimed = conn.execute(
+                "UPDATE engines SET probe_at = ?, probe_token = ? WHERE engine = ? AND opened_at IS NOT NULL "
+                "AND (probe_at IS NULL OR probe_at < ?)",
+                (now, token, engine, now - self.reset_timeout),
+            )
+            return token if claimed.rowcount == 1 else None
+        except (sqlite3.Error, OSError) as e:
+            # Health tracking must never stop rendering
+            logger.debug(f"Engine health unavailable: {e}")
+            return token
+
+    def usable(self, engines: List[str]) -> List[str]:
+        """
+        Filter out engines whose breaker is open, keeping their order
+
+        Cooled-down engines are kept without claiming their half-open probe;
+        call allow() right before an engine is actually tried.
+
+        Args:
+            engines (List[str]): Engines in order of preference
+
+        Returns:
+            List[str]: Engines that may be tried now
+        """
+        try:
+            opened = dict(self._connection().execute(
+                "SELECT engine, opened_at FROM engines WHERE opened_at IS NOT NULL"))
+        except (sqlite3.Error, OSError) as e:
+            logger.debug(f"Engine health unavailable: {e}")
+            return list(engines)
+        now = time.time()
+        return [engine for engine in engines
+                if engine not in opened or now >= opened[engine] + self.reset_timeout]
+
+    def release(self, engine: str, token: Optional[str]) -> None:
+        """
+        Give up a half-open probe claim when the attempt ended without a verdict
+
+        Only the claim that allow() returned token for is released; a claim
+        that expired and was taken over by another caller stays in place.
+
+        Args:
+            engine (str): Engine name
+            token (Optional[str]): Token returned by allow()
+        """
+        if token is None:
+            return
+        try:
+            self._connection().execute(
+                "UPDATE engines SET probe_at = NULL, probe_token = NULL WHERE engine = ? AND probe_token = ?",
+                (engine, token))
+        except (sqlite3.Error, OSError) as e:
+            logger.debug(f"Engine health unavailable: {e}")
+
+    def record_success(self, engine: str) -> None:
+        """Close the engine's breaker"""
+        try:
+            conn = self._connection()
+            row = conn.execute("SELECT opened_at FROM engines WHERE engine = ?", (engine,)).fetchone()
+            if row is not None:
+                conn.execute("DELETE FROM engines WHERE engine = ?", (engine,))
+        except (sqlite3.Error, OSError) as e:
+            logger.debug(f"Engine health unavailable: {e}")
+            return
+        if row is not None and row[0] is not None:
+            logger.info(f"PDF engine {engine} recovered; breaker closed")
+
+    def record_failure(self, engine: str) -> None:
+        """Count a failure; open the breaker at the threshold or when a probe fails"""
+        now = time.time()
+        try:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute("SELECT failures, opened_at FROM engines WHERE engine = ?", (engine,)).fetchone()
+                failures = (row[0] if row else 0) + 1
+                was_open = row is not None and row[1] is not None
+                opened_at = now if was_open or failures >= self.failure_threshold else None
+                conn.execute(
+                    "INSERT OR REPLACE INTO engines (engine, failures, opened_at, probe_at, probe_token) "
+                    "VALUES (?, ?, ?, NULL, NULL)",
+                    (engine, failures, opened_at),
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        except (sqlite3.Error, OSError) as e:
+            logger.debug(f"Engine health unavailable: {e}")
+            return
+        if opened_at is not None:
+            logger.warning(f"PDF engine {engine} failed {failures} times; skipping it for {self.reset_timeout:.0f}s")
+
+    def state(self, engine: str) -> str:
+        """Return "closed", "open" or "half_open" for engine"""
+        return self.snapshot().get(engine, {}).get("state", "closed")
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Get the state of every engine with recorded failures
+
+        Returns:
+            Dict[str, Dict[str, Any]]: state, failures and opened_at by engine
+        """
+        now = time.time()
+        result = {}
+        for engine, failures, opened_at in self._connection().execute(
+                "SELECT engine, failures, opened_at FROM engines"):
+            if opened_at is None:
+                state = "closed"
+            elif now < opened_at + self.reset_timeout:
+                state = "open"
+            else:
+                state = "half_open"
+            result[engine] = {"state": state, "failures": failures, "opened_at": opened_at}
+        return result
+
+    def reset(self, engine: Optional[str] = None) -> None:
+        """Forget the health of one engine, or of all engines"""
+        conn = self._connection()
+        if engine is None:
+            conn.execute("DELETE FROM engines")
+        else:
+            conn.execute("DELETE FROM engines WHERE engine = ?", (engine,))
+
+# Global engine health tracker, created on first use
+_engine_health = None
+_engine_health_lock = threading.Lock()
+
+def get_engine_health() -> EngineHealth:
+    """Get the process-wide engine health tracker"""
+    global _engine_health
+    if _engine_health is None:
+        with _engine_health_lock:
+            if _engine_health is None:
+                _engine_health = EngineHealth()
+    return _engine_health
@@ -0,0 +1,162 @@
+"""
+Font registry for WeasyPrint rendering in the Stream Bill Generator
+WeasyPrint normally gets a new FontConfiguration and page stylesheet for every
+PDF, so fontconfig is queried again for each sheet of each bill. This module
+keeps them per process instead:
+
+- one FontConfiguration, warmed with every font family named in the templates
+  and the base CSS
+- compiled page stylesheets, keyed by their CSS text
+
+Both are filled in the parent (prefork warm-up, or before hedged attempts are
+forked), so forked render processes inherit them instead of building their own
+and throwing them away on exit.
+"""
+import glob
+import importlib.util
+import logging
+import os
+import re
+import threading
+import weakref
+from typing import Any, Dict, Iterable, List
+
+logger = logging.getLogger(__name__)
+
+# WeasyPrint is imported on first use; its system libraries are slow to load
+WEASYPRINT_AVAILABLE = importlib.util.find_spec("weasyprint") is not None
+
+DEFAULT_TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "templates")
+
+_FONT_FAMILY = re.compile(r"font-family\s*:\s*([^;}\"]+)", re.IGNORECASE)
+
+# Text that covers the glyphs bills use, laid out once per family during preload
+_PRELOAD_TEXT = "Bill No. 0123456789 ABCDEFGHIJKLMNOPQRSTUVWXYZ abcdefghijklmnopqrstuvwxyz Rs. ,.-/:()%&"
+
+
+# Live registries, so a child forked while another thread held a lock can reset it
+_REGISTRIES = weakref.WeakSet()
+
+def _reset_locks_after_fork() -> None:
+    for registry in list(_REGISTRIES):
+        registry._lock = threading.RLock()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_locks_after_fork)
+
+
+def font_families(css_sources: Iterable[str]) -> List[str]:
+    """
+    Collect font family names from CSS or HTML, in order of first use
+
+    Args:
+        css_sources (Iterable[str]): CSS or HTML text
+
+    Returns:
+        List[str]: Family names without quotes, generic families included
+    """
+    families = []
+    for source in css_sources:
+        for declaration in _FONT_FAMILY.findall(source):
+            for family in declaration.split(","):
+                family = family.strip().strip("'\"").strip()
+                if family and family not in families:
+                    families.append(family)
+    return families
+
+
+class FontRegistry:
+    """Process-wide WeasyPrint font configuration and page stylesheets"""
+
+    def __init__(self):
+        """Initialize the FontRegistry"""
+        self.families: List[str] = []
+        self._font_config = None
+        self._stylesheets: Dict[str, Any] = {}
+        self._preloaded = set()
+        self._lock = threading.RLock()
+        _REGISTRIES.add(self)
+
+    @property
+    def font_config(self) -> Any:
+        """The shared weasyprint FontConfiguration (created on first use)"""
+        with self._lock:
+            if self._font_config is None:
+                from weasyprint.text.fonts import FontConfiguration
+                self._font_config = FontConfiguration()
+            return self._font_config
+
+    def stylesheet(self, css: str) -> Any:
+        """
+        Get a compiled weasyprint CSS object for css, parsing it once
+
+        Args:
+            css (str): Stylesheet text (e.g. the @page rule for one orientation)
+
+        Returns:
+            weasyprint.CSS: Stylesheet bound to the shared font configuration
+        """
+        with self._lock:
+            stylesheet = self._stylesheets.get(css)
+            if stylesheet is None:
+                from weasyprint import CSS
+                stylesheet = self._stylesheets[css] = CSS(string=css, font_config=self.font_config)
+            return stylesheet
+
+    def preload(self, template_dir: str = DEFAULT_TEMPLATE_DIR, extra_css: Iterable[str] = (),
+                page_css: Iterable[str] = ()) -> List[str]:
+        """
+        Load every font family used by the templates and extra_css
+
+        Lays out one line of text per family with the shared configuration,
+        so fontconfig matching and font loading happen now rather than during
+        the first sheet. Runs once per template directory. The page_css
+        stylesheets are compiled as well, so forked renders find them ready.
+
+        Args:
+            template_dir (str): Directory containing the Jinja templates
+            extra_css (Iterable[str]): Further CSS, e.g. PDFGenerator.get_base_css()
+            page_css (Iterable[str]): Page stylesheets to compile, e.g. PDFGenerator.get_page_css()
+
+        Returns:
+            List[str]: Families preloaded by this call
+        """
+        with self._lock:
+            for css in page_css:
+                self.stylesheet(css)
+            if template_dir in self._preloaded:
+                return []
+            sources = list(extra_css)
+            for path in sorted(glob.glob(os.path.join(template_dir, "*.html"))):
+                with open(path, encoding="utf-8") as f:
+                    sources.append(f.read())
+            families = [family for family in font_families(sources) if family not in self.families]
+
+            if families:
+                from weasyprint import HTML
+                html = "".join(f"<p style=\"font-family: '{family}'\">{_PRELOAD_TEXT}</p>" for family in families)
+                HTML(string=f"<html><body>{html}</body></html>").render(font_config=self.font_config)
+                self.families.extend(families)
+                logger.info(f"Preloaded fonts: {', '.join(families)}")
+            self._preloaded.add(template_dir)
+            return families
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get registry counters
+
+        Returns:
+            Dict[str, Any]: families and stylesheets
+        """
+        return {
+            "families": list(self.families),
+            "stylesheets": len(self._stylesheets),
+        }
+
+
+# Global font registry
+_font_registry = FontRegistry()
+
+def get_font_registry() -> FontRegistry:
+    """Get the process-wide font registry"""
+    return _font_registry
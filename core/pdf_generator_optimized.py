@@ -6,15 +6,257 @@ Elegant HTML to PDF conversion with statutory compliance
 
 import os
 import io
+import sys
 import base64
-from typing import Optional, Dict, Any, Literal
+import copy
+import importlib
+import multiprocessing
+import signal
+import threading
+import time
+from functools import lru_cache
+from multiprocessing import connection
+from typing import Optional, Dict, Any, List, Literal
 from pathlib import Path
 import logging
 
-# Setup logging
-logging.basicConfig(level=logging.INFO)
+from config.settings import get_setting
+from core.engine_health import EngineHealth, get_engine_health
+# Imported before any fork: an import in a child forked from a thread can
+# block on a lock another thread held at the time
+from core.prefork import job_limits
+
+# Logging is configured by the application entry point, not at import time
 logger = logging.getLogger(__name__)
 
+# Engine attempts run in forked children so a hung engine can be killed
+ISOLATION_AVAILABLE = "fork" in multiprocessing.get_all_start_methods()
+
+# At most this many engines render the same document at once (primary + backup)
+MAX_PARALLEL_ENGINES = 2
+
+# Modules each engine imports while rendering, loaded by detect_engines() so a
+# forked attempt never imports: a child importing a module that another thread
+# was importing at fork time waits on that module's lock forever
+_ENGINE_MODULES = {
+    "weasyprint": ("weasyprint", "core.font_registry"),
+    "reportlab": ("reportlab.lib.pagesizes", "reportlab.lib.units", "reportlab.platypus",
+                  "reportlab.lib.styles", "reportlab.lib.colors", "bs4"),
+    "xhtml2pdf": ("xhtml2pdf.pisa",),
+    "pdfkit": ("pdfkit", "platform"),
+}
+
+
+class RenderMetrics:
+    """Per-engine counters for generate_with_fallback"""
+
+    OUTCOMES = ("wins", "failures", "timeouts", "errors", "cancelled")
+
+    def _counters(self, engine: str) -> Dict[str, float]:
+        return self._engines.setdefault(
+            engine, dict({"attempts": 0, "skipped": 0, "seconds": 0.0}, **{name: 0 for name in self.OUTCOMES}))
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        """Zero every counter"""
+        with self._lock:
+            self._engines: Dict[str, Dict[str, float]] = {}
+            self._totals = {"renders": 0, "hedged": 0, "failed": 0, "seconds": 0.0}
+
+    def record_attempt(self, engine: str, outcome: str, duration: float) -> None:
+        """Count one engine attempt ending in outcome (one of OUTCOMES)"""
+        with self._lock:
+            counters = self._counters(engine)
+            counters["attempts"] += 1
+            counters[outcome] += 1
+            counters["seconds"] += duration
+
+    def record_skip(self, engine: str) -> None:
+        """Count an engine skipped because its circuit breaker is open or another caller holds its probe"""
+        with self._lock:
+            self._counters(engine)["skipped"] += 1
+
+    def record_render(self, duration: float, hedged: bool, failed: bool) -> None:
+        """Count one generate_with_fallback call"""
+        with self._lock:
+            self._totals["renders"] += 1
+            self._totals["hedged"] += int(hedged)
+            self._totals["failed"] += int(failed)
+            self._totals["seconds"] += duration
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get a snapshot of the counters
+
+        Returns:
+            Dict[str, Any]: Totals plus an "engines" dict of per-engine counters
+        """
+        with self._lock:
+            return dict(copy.deepcopy(self._totals), engines=copy.deepcopy(self._engines))
+
+
+_render_metrics = RenderMetrics()
+
+def get_render_metrics() -> RenderMetrics:
+    """Get the process-wide render metrics"""
+    return _render_metrics
+
+
+def is_valid_pdf(path: str) -> bool:
+    """Check that path holds a complete PDF (header and end-of-file marker)"""
+    try:
+        with open(path, "rb") as f:
+            if not f.read(5) == b"%PDF-":
+                return False
+            f.seek(0, os.SEEK_END)
+            f.seek(max(0, f.tell() - 1024))
+            return b"%%EOF" in f.read()
+    except OSError:
+        return False
+
+
+def _run_engine(generator: "PDFGenerator", engine: str, html_content: str, output_path: str) -> bool:
+    """Forked child: render with one engine under the per-job limits"""
+    with job_limits(get_setting("pdf.job_memory_limit"), get_setting("pdf.job_cpu_limit")):
+        return generator.generate_pdf(html_content, output_path, engine)
+
+
+class _Attempt:
+    """
+    One engine rendering to its own part file in a forked child
+
+    The child reports one status byte over a pipe and leaves with os._exit(),
+    so it never runs the interpreter shutdown it inherited. Forked from a
+    thread pool worker, that shutdown would try to join the worker's own
+    thread and fail every render.
+
+    Other threads of the parent may hold locks at the moment of the fork.
+    Every module-level lock the child takes (font registry, caches, disk
+    index connections) is replaced in the child by an os.register_at_fork
+    hook, and detect_engines() has already imported what the engines need.
+    """
+
+    def __init__(self, generator: "PDFGenerator", engine: str, html_content: str, output_path: str):
+        self.engine = engine
+        self.path = f"{output_path}.{engine}.part"
+        self.started = time.monotonic()
+        self.exitcode: Optional[int] = None
+        read_fd, write_fd = os.pipe()
+        try:
+            self.pid = os.fork()
+        except OSError:
+            os.close(read_fd)
+            os.close(write_fd)
+            raise
+        if self.pid == 0:
+            status = b"1"
+            try:
+                os.close(read_fd)
+                if _run_engine(generator, engine, html_content, self.path):
+                    status = b"0"
+            except BaseException as e:
+                logger.warning(f"PDF engine {engine} raised {type(e).__name__}: {e}")
+            finally:
+                try:
+                    os.write(write_fd, status)
+                finally:
+                    os._exit(0 if status == b"0" else 1)
+        os.close(write_fd)
+        # Readable once the child reports or dies
+        self.sentinel = read_fd
+
+    def finish(self) -> Optional[bool]:
+        """
+        Reap the child after its sentinel became readable
+
+        Returns:
+            Optional[bool]: The engine's own result, or None when the child
+            died without reporting one (killed by a signal or a resource limit)
+        """
+        try:
+            status = os.read(self.sentinel, 1)
+        finally:
+            os.close(self.sentinel)
+            self.sentinel = None
+        self._reap()
+        return {b"0": True, b"1": False}.get(status)
+
+    def stop(self) -> None:
+        """Kill the child if it is still running and remove its part file"""
+        if self.exitcode is None:
+            try:
+                os.kill(self.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+            self._reap()
+        if self.sentinel is not None:
+            os.close(self.sentinel)
+            self.sentinel = None
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+    def _reap(self) -> None:
+        if self.exitcode is None:
+            _, status = os.waitpid(self.pid, 0)
+            self.exitcode = os.waitstatus_to_exitcode(status)
+
+
+@lru_cache(maxsize=1)
+def detect_engines() -> tuple:
+    """
+    Detect available PDF generation engines once per process
+
+    Engines, and the modules they import while rendering, are imported here,
+    on the first PDFGenerator, rather than when this module is imported.
+
+    Returns:
+        tuple: Engine names in order of preference
+    """
+    engines = []
+
+    # Check for WeasyPrint (also fails with OSError when its system libraries are missing)
+    try:
+        import weasyprint
+        engines.append('weasyprint')
+    except Exception:
+        pass
+
+    # Check for ReportLab
+    try:
+        from reportlab.pdfgen import canvas
+        engines.append('reportlab')
+    except Exception:
+        pass
+
+    # Check for xhtml2pdf
+    try:
+        from xhtml2pdf import pisa
+        engines.append('xhtml2pdf')
+    except Exception:
+        pass
+
+    # Check for pdfkit
+    try:
+        import pdfkit
+        engines.append('pdfkit')
+    except Exception:
+        pass
+
+    for engine in engines:
+        for module in _ENGINE_MODULES[engine]:
+            try:
+                importlib.import_module(module)
+            except Exception:
+                pass  # the engine reports it when it renders
+
+    logger.info(f"Available PDF engines: {engines}")
+    return tuple(engines)
+
 
 class PDFGenerator:
     """
@@ -75,41 +317,13 @@ class PDFGenerator:
         
         # Detect available PDF engines
         self.available_engines = self._detect_engines()
-        logger.info(f"Available PDF engines: {self.available_engines}")
+        
+        # Circuit breakers shared with other processes (default: get_engine_health())
+        self.health: Optional[EngineHealth] = None
     
     def _detect_engines(self) -> list:
         """Detect available PDF generation engines"""
-        engines = []
-        
-        # Check for WeasyPrint
-        try:
-            import weasyprint
-            engines.append('weasyprint')
-        except ImportError:
-            pass
-        
-        # Check for ReportLab
-        try:
-            from reportlab.pdfgen import canvas
-            engines.append('reportlab')
-        except ImportError:
-            pass
-        
-        # Check for xhtml2pdf
-        try:
-            from xhtml2pdf import pisa
-            engines.append('xhtml2pdf')
-        except ImportError:
-            pass
-        
-        # Check for pdfkit
-        try:
-            import pdfkit
-            engines.append('pdfkit')
-        except ImportError:
-            pass
-        
-        return engines
+        return list(detect_engines())
     
     def get_base_css(self) -> str:
         """
@@ -348,16 +562,12 @@ class PDFGenerator:
 </html>"""
         return html
     
-    def html_to_pdf_weasyprint(self, html_content: str, output_path: str) -> bool:
-        """Generate PDF using WeasyPrint (best quality)"""
-        try:
-            from weasyprint import HTML, CSS
-            from weasyprint.text.fonts import FontConfiguration
-            
-            font_config = FontConfiguration()
-            
-            # Create CSS with proper page setup
-            css_string = f"""
+    def get_page_css(self) -> str:
+        """
+        Generate the @page rule WeasyPrint renders with
+        Page size, orientation and margins only; compiled once per process
+        """
+        return f"""
             @page {{
                 size: A4 {self.orientation};
                 margin-top: {self.margin_top}mm;
@@ -366,9 +576,19 @@ class PDFGenerator:
                 margin-left: {self.margin_left}mm;
             }}
             """
+    
+    def html_to_pdf_weasyprint(self, html_content: str, output_path: str) -> bool:
+        """Generate PDF using WeasyPrint (best quality)"""
+        try:
+            from weasyprint import HTML
+            from core.font_registry import get_font_registry
+            
+            # Fonts and page stylesheets are shared across PDFs
+            fonts = get_font_registry()
+            font_config = fonts.font_config
             
             html_doc = HTML(string=html_content)
-            css_doc = CSS(string=css_string, font_config=font_config)
+            css_doc = fonts.stylesheet(self.get_page_css())
             
             html_doc.write_pdf(
                 output_path,
@@ -560,28 +780,186 @@ class PDFGenerator:
         else:
             raise Exception(f"Unsupported PDF engine: {engine}")
     
-    def generate_with_fallback(self, html_content: str, output_path: str) -> str:
+    def generate_with_fallback(self, html_content: str, output_path: str,
+                               engine_timeout: Optional[float] = None,
+                               hedge_after: Optional[float] = None) -> str:
         """
         Generate PDF using the best available engine with fallbacks
         
+        Engines whose circuit breaker is open are skipped without being tried.
+        Each engine runs in a child process that is killed after engine_timeout
+        and limited by pdf.job_memory_limit and pdf.job_cpu_limit, so engine
+        caches and runaway documents never stay in this process. The CPU limit
+        sits below engine_timeout so a render spinning on the CPU is stopped by
+        it first; the wall-clock timeout still catches one that is blocked.
+        When an attempt takes longer than hedge_after, the next engine starts
+        alongside it and the first valid PDF wins. A failed attempt starts the
+        next engine at once. Without fork, engines run in turn in-process.
+        
         Args:
             html_content: HTML content to convert to PDF
             output_path: Path where PDF should be saved
+            engine_timeout: Seconds before an attempt is killed (default: pdf.engine_timeout)
+            hedge_after: Seconds before a backup engine starts (default: pdf.hedge_after)
         
         Returns:
             str: Engine used to generate PDF
         """
+        if engine_timeout is None:
+            engine_timeout = get_setting("pdf.engine_timeout", 60.0)
+        if hedge_after is None:
+            hedge_after = get_setting("pdf.hedge_after", 30.0)
+        
+        start = time.monotonic()
+        attempts: List[Dict[str, Any]] = []
+        engine = None
+        engines = self._engine_health().usable(self.available_engines)
+        for skipped in set(self.available_engines) - set(engines):
+            _render_metrics.record_skip(skipped)
+        try:
+            if ISOLATION_AVAILABLE and get_setting("pdf.isolate_engines", True):
+                engine = self._generate_hedged(html_content, output_path, engines, engine_timeout,
+                                               hedge_after, attempts)
+            else:
+                engine = self._generate_sequential(html_content, output_path, engines, attempts)
+        finally:
+            duration = time.monotonic() - start
+            _render_metrics.record_render(duration, any(a["hedge"] for a in attempts), engine is None)
+            self._report(duration, engine, attempts)
+        
+        if engine is None:
+            if not engines:
+                raise Exception("No healthy PDF engine available; all circuit breakers are open")
+            raise Exception("Failed to generate PDF with any available engine")
+        return engine
+    
+    def _engine_health(self) -> EngineHealth:
+        return self.health or get_engine_health()
+    
+    def _record(self, attempts: List[Dict[str, Any]], engine: str, outcome: str, started: float,
+                claim: Optional[str], hedge: bool = False) -> None:
+        duration = time.monotonic() - started
+        attempts.append({"engine": engine, "outcome": outcome, "duration": round(duration, 4), "hedge": hedge})
+        _render_metrics.record_attempt(engine, outcome, duration)
+        # Only the engine's own verdict counts: timeouts (large documents),
+        # fork or child errors and lost hedge races say nothing about its health
+        if outcome == "wins":
+            self._engine_health().record_success(engine)
+        elif outcome == "failures":
+            self._engine_health().record_failure(engine)
+        else:
+            self._engine_health().release(engine, claim)
+    
+    def _claim(self, engine: str) -> Optional[str]:
+        """Pass the engine's breaker right before trying it (claims a half-open probe)"""
+        claim = self._engine_health().allow(engine)
+        if claim is None:
+            _render_metrics.record_skip(engine)
+        return claim
+    
+    def _generate_sequential(self, html_content: str, output_path: str, engines: List[str],
+                             attempts: List[Dict[str, Any]]) -> Optional[str]:
         # Try engines in order of preference
-        for engine in self.available_engines:
+        for engine in engines:
+            claim = self._claim(engine)
+            if claim is None:
+                continue
+            started = time.monotonic()
             try:
-                success = self.generate_pdf(html_content, output_path, engine)
-                if success:
+                if self.generate_pdf(html_content, output_path, engine):
+                    self._record(attempts, engine, "wins", started, claim)
                     return engine
             except Exception as e:
                 logger.warning(f"Failed to generate PDF with {engine}: {e}")
-                continue
-        
-        raise Exception("Failed to generate PDF with any available engine")
+            self._record(attempts, engine, "failures", started, claim)
+        return None
+    
+    def _generate_hedged(self, html_content: str, output_path: str, engines: List[str], engine_timeout: float,
+                         hedge_after: float, attempts: List[Dict[str, Any]]) -> Optional[str]:
+        pending = list(engines)
+        if "weasyprint" in pending:
+            self._preload_fonts()
+        running: Dict[int, _Attempt] = {}  # status pipe -> attempt
+        claims: Dict[str, Optional[str]] = {}  # engine -> breaker claim token
+        hedges = set()
+        try:
+            while pending or running:
+                now = time.monotonic()
+                newest = max((a.started for a in running.values()), default=None)
+                
+                # Start the first engine, the next one after a failure, or a
+                # backup once the newest attempt has run past the threshold
+                if pending and (newest is None or (len(running) < MAX_PARALLEL_ENGINES
+                                                   and now - newest >= hedge_after)):
+                    engine = pending.pop(0)
+                    claims[engine] = self._claim(engine)
+                    if claims[engine] is None:
+                        continue
+                    if newest is not None:
+                        hedges.add(engine)
+                        logger.info(f"PDF render slow after {now - newest:.1f}s; hedging with {engine}")
+                    try:
+                        attempt = _Attempt(self, engine, html_content, output_path)
+                    except OSError as e:
+                        logger.warning(f"Could not start PDF engine {engine}: {e}")
+                        self._record(attempts, engine, "errors", now, claims[engine], engine in hedges)
+                        continue
+                    running[attempt.sentinel] = attempt
+                    continue
+                
+                wake_at = [a.started + engine_timeout for a in running.values()]
+                if pending and len(running) < MAX_PARALLEL_ENGINES:
+                    wake_at.append(newest + hedge_after)
+                ready = connection.wait(list(running), timeout=max(0.0, min(wake_at) - now))
+                
+                for sentinel in ready:
+                    attempt = running.pop(sentinel)
+                    succeeded = attempt.finish()
+                    hedge = attempt.engine in hedges
+                    if succeeded and is_valid_pdf(attempt.path):
+                        os.replace(attempt.path, output_path)
+                        self._record(attempts, attempt.engine, "wins", attempt.started, claims[attempt.engine], hedge)
+                        return attempt.engine
+                    attempt.stop()
+                    if succeeded is None:
+                        # Killed by a signal or a resource limit before reporting
+                        logger.warning(f"PDF engine {attempt.engine} child died (exit code {attempt.exitcode})")
+                        self._record(attempts, attempt.engine, "errors", attempt.started, claims[attempt.engine], hedge)
+                    else:
+                        logger.warning(f"Failed to generate PDF with {attempt.engine}")
+                        self._record(attempts, attempt.engine, "failures", attempt.started, claims[attempt.engine], hedge)
+                
+                now = time.monotonic()
+                for sentinel, attempt in list(running.items()):
+                    if now - attempt.started >= engine_timeout:
+                        logger.warning(f"PDF engine {attempt.engine} exceeded {engine_timeout}s; killing it")
+                        del running[sentinel]
+                        attempt.stop()
+                        self._record(attempts, attempt.engine, "timeouts", attempt.started,
+                                     claims[attempt.engine], attempt.engine in hedges)
+            return None
+        finally:
+            # Losers of the race are no longer needed
+            for attempt in running.values():
+                attempt.stop()
+                self._record(attempts, attempt.engine, "cancelled", attempt.started, claims[attempt.engine],
+                             attempt.engine in hedges)
+    
+    def _preload_fonts(self) -> None:
+        """Load template fonts and the page stylesheet here, so every forked attempt starts with them"""
+        try:
+            from core.font_registry import get_font_registry
+            get_font_registry().preload(extra_css=[self.get_base_css()], page_css=[self.get_page_css()])
+        except Exception as e:
+            logger.warning(f"Font preload failed: {e}")
+    
+    def _report(self, duration: float, engine: Optional[str], attempts: List[Dict[str, Any]]) -> None:
+        """Send one render's outcome to the usage monitor"""
+        try:
+            from scripts.monitoring import log_performance
+            log_performance("pdf_render", duration, {"engine": engine, "attempts": attempts})
+        except Exception:
+            pass
 
 
 # Example usage
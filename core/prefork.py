@@ -0,0 +1,472 @@
+"""
+Pre-fork render worker pool for the Stream Bill Generator
+Workers are forked from a parent that has already imported the renderers and
+PDF engines, compiled the templates, built the certificate skeletons (and
+stamping pages, when enabled) and rendered one throwaway PDF (which loads
+fonts). The warmed
+heap is moved to the permanent generation with gc.freeze(), so the garbage
+collector in the children never touches those pages and they stay shared
+copy-on-write.
+
+Starting a worker is then a fork, not a fresh interpreter: no imports, no
+template compilation and little private memory per worker.
+
+Long-lived renderers grow through font caches and fragmentation, so workers
+are recycled after a number of jobs or once their RSS passes a threshold, and
+each job runs under address-space and CPU-time limits. A job that exceeds
+them takes down only its worker, which is replaced.
+
+Fork is POSIX only; on other platforms use a ThreadPoolExecutor instead.
+"""
+import gc
+import logging
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+from contextlib import contextmanager
+import time
+import traceback
+from collections import deque
+from concurrent.futures import Future
+from multiprocessing import connection, resource_tracker
+from typing import Any, Callable, Deque, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from config.settings import get_setting
+
+try:
+    import resource
+    RESOURCE_AVAILABLE = True
+except ImportError:  # Windows
+    resource = None
+    RESOURCE_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+FORK_AVAILABLE = "fork" in multiprocessing.get_all_start_methods()
+
+DEFAULT_TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "templates")
+
+_warmed = set()
+
+
+def warm_up(template_dir: str = DEFAULT_TEMPLATE_DIR) -> Dict[str, float]:
+    """
+    Load everything a render needs into this process, once per template directory
+
+    Args:
+        template_dir (str): Directory containing the Jinja templates
+
+    Returns:
+        Dict[str, float]: Seconds spent per warm-up stage (empty if already warm)
+    """
+    if template_dir in _warmed:
+        return {}
+    timings = {}
+
+    start = time.perf_counter()
+    import exports.advanced_formats  # noqa: F401  (pandas, XML and Parquet writers)
+    from core.pdf_generator_optimized import PDFGenerator, detect_engines
+    from exports import renderers
+    from exports.docx_skeletons import get_skeleton_bytes
+    from exports.pdf_stamps import get_static_layer
+    import docx  # noqa: F401
+    import pypdf  # noqa: F401
+    from data.cache_utils import get_cache
+    engines = detect_engines()
+    get_cache()  # workers share the cache and its code-version namespace
+    timings["imports"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    env = renderers.setup_jinja_environment(template_dir)
+    for name in env.list_templates(filter_func=lambda name: name.endswith(".html")):
+        env.get_template(name)
+    timings["templates"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    get_skeleton_bytes("Certificate II")
+    get_skeleton_bytes("Certificate III")
+    if get_setting("pdf.stamp_certificates", False):
+        get_static_layer("Certificate II")
+        get_static_layer("Certificate III")
+    timings["skeletons"] = time.perf_counter() - start
+
+    # One tiny render loads the engine's lazily imported modules and fonts
+    start = time.perf_counter()
+    if "weasyprint" in engines:
+        from core.font_registry import get_font_registry
+        try:
+            get_font_registry().preload(
+                template_dir, extra_css=[PDFGenerator().get_base_css()],
+                page_css=[PDFGenerator(orientation).get_page_css() for orientation in ("portrait", "landscape")])
+        except Exception as e:
+            logger.warning(f"Font preload failed: {e}")
+    if engines:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            try:
+                PDFGenerator().generate_pdf("<html><body><p>warm-up</p></body></html>",
+                                            os.path.join(temp_dir, "warm_up.pdf"))
+            except Exception as e:
+                logger.warning(f"PDF warm-up render failed: {e}")
+    timings["fonts"] = time.perf_counter() - start
+
+    _warmed.add(template_dir)
+    return timings
+
+
+def _statm() -> Tuple[int, int]:
+    """Return (virtual size, resident size) of this process in bytes, (0, 0) if unknown"""
+    try:
+        with open("/proc/self/statm") as f:
+            size, resident = f.read().split()[:2]
+        page = os.sysconf("SC_PAGE_SIZE")
+        return int(size) * page, int(resident) * page
+    except (OSError, ValueError):
+        return 0, 0
+
+
+def current_rss() -> int:
+    """
+    Resident set size of this process in bytes
+
+    Falls back to the peak RSS where /proc is not available.
+    """
+    rss = _statm()[1]
+    if rss or not RESOURCE_AVAILABLE:
+        return rss
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+@contextmanager
+def job_limits(memory_limit: Optional[int] = None, cpu_limit: Optional[float] = None) -> Iterator[None]:
+    """
+    Run a block under RLIMIT_AS and RLIMIT_CPU soft limits, then restore them
+
+    Both limits are relative to what the process already uses: memory_limit
+    bytes of address space on top of the current virtual size (so allocator
+    reservations made during warm-up do not count) and cpu_limit seconds on top
+    of the CPU time used so far. Exceeding the memory limit raises MemoryError;
+    exceeding the CPU limit kills the process with SIGXCPU.
+
+    Args:
+        memory_limit (Optional[int]): Extra address space in bytes, None for no limit
+        cpu_limit (Optional[float]): CPU seconds, None for no limit
+    """
+    if not RESOURCE_AVAILABLE:
+        yield
+        return
+    previous = []
+    try:
+        virtual_size = _statm()[0]
+        if memory_limit and virtual_size and hasattr(resource, "RLIMIT_AS"):
+            previous.append(_lower_limit(resource.RLIMIT_AS, virtual_size + memory_limit))
+        if cpu_limit:
+            usage = resource.getrusage(resource.RUSAGE_SELF)
+            used = int(usage.ru_utime + usage.ru_stime) + 1
+            previous.append(_lower_limit(resource.RLIMIT_CPU, used + int(cpu_limit)))
+        yield
+    finally:
+        for limit, soft, hard in reversed([p for p in previous if p]):
+            resource.setrlimit(limit, (soft, hard))
+
+
+def _lower_limit(limit: int, value: int) -> Optional[Tuple[int, int, int]]:
+    """Lower a soft limit to value (never above the hard limit); return what to restore"""
+    soft, hard = resource.getrlimit(limit)
+    if hard != resource.RLIM_INFINITY:
+        value = min(value, hard)
+    if soft != resource.RLIM_INFINITY and soft <= value:
+        return None
+    resource.setrlimit(limit, (value, hard))
+    return limit, soft, hard
+
+
+def _worker_loop(conn, limits: Dict[str, Any]) -> None:
+    """Run tasks sent over conn until a None sentinel, EOF or a reason to retire"""
+    gc.enable()
+    tasks_done = 0
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            break
+        if task is None:
+            break
+        task_id, fn, args, kwargs = task
+        with job_limits(limits["memory_limit"], limits["cpu_limit"]):
+            try:
+                message = ("done", task_id, fn(*args, **kwargs))
+            except BaseException as e:
+                message = ("error", task_id, e)
+        tasks_done += 1
+
+        # Retire before the next job when worn out; MemoryError may leave
+        # an engine's state half-built
+        rss = current_rss()
+        retiring = bool(
+            (limits["max_tasks"] and tasks_done >= limits["max_tasks"])
+            or (limits["max_rss"] and rss > limits["max_rss"])
+            or isinstance(message[2], MemoryError)
+        )
+        usage = {"tasks": tasks_done, "rss": rss, "retiring": retiring}
+        try:
+            conn.send(message + (usage,))
+        except Exception:
+            # Unpicklable result or exception; send its text instead
+            error = message[2] if message[0] == "error" else None
+            text = "".join(traceback.format_exception(error)) if error else "result could not be pickled"
+            conn.send(("error", task_id, RuntimeError(text), usage))
+        if retiring:
+            break
+
+
+class WorkerCrashed(RuntimeError):
+    """A worker process died while running a task"""
+
+
+class _Worker:
+    """Parent-side handle for one forked worker"""
+
+    def __init__(self, context, limits: Dict[str, Any]):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_loop, args=(child_conn, limits), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.task_id: Optional[int] = None
+        self.tasks = 0
+        self.rss = 0
+        self.peak_rss = 0
+
+
+class PreforkPool:
+    """
+    Fixed-size pool of forked, pre-warmed worker processes
+
+    The interface follows concurrent.futures: submit() returns a Future and
+    map() yields results in order. Each worker has its own pipe and gets one
+    task at a time from a dispatcher thread, so functions and arguments must
+    be picklable (module-level functions). A worker that dies is replaced and
+    its task fails with WorkerCrashed; a worker that retires (job count, RSS or
+    MemoryError) is replaced after returning its result.
+    """
+
+    def __init__(self, workers: Optional[int] = None, template_dir: str = DEFAULT_TEMPLATE_DIR,
+                 warm: Optional[Callable[[str], Any]] = warm_up,
+                 max_tasks_per_worker: Optional[int] = None, max_rss_bytes: Optional[int] = None,
+                 job_memory_limit: Optional[int] = None, job_cpu_limit: Optional[float] = None):
+        """
+        Warm this process, freeze the heap and fork the workers
+
+        Limits default to the pdf.worker_* and pdf.job_* settings; pass 0 to
+        disable one.
+
+        Args:
+            workers (Optional[int]): Number of worker processes (default: CPU count)
+            template_dir (str): Template directory to warm
+            warm (Optional[Callable[[str], Any]]): Warm-up function, None to skip
+            max_tasks_per_worker (Optional[int]): Jobs after which a worker is recycled
+            max_rss_bytes (Optional[int]): RSS after which a worker is recycled
+            job_memory_limit (Optional[int]): Extra address space allowed per job (RLIMIT_AS)
+            job_cpu_limit (Optional[float]): CPU seconds allowed per job (RLIMIT_CPU)
+        """
+        if not FORK_AVAILABLE:
+            raise RuntimeError("PreforkPool needs the fork start method")
+        self.workers = workers or os.cpu_count() or 1
+        self.warm_up_timings = warm(template_dir) if warm is not None else {}
+
+        self._context = multiprocessing.get_context("fork")
+        self._pending: Deque[Tuple[int, Callable, tuple, dict]] = deque()
+        self._futures: Dict[int, Future] = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self._closed = False
+        self._wake_reader, self._wake_writer = self._context.Pipe(duplex=False)
+        self._limits = {
+            "max_tasks": get_setting("pdf.worker_max_tasks", 200) if max_tasks_per_worker is None else max_tasks_per_worker,
+            "max_rss": get_setting("pdf.worker_max_rss", 1024 ** 3) if max_rss_bytes is None else max_rss_bytes,
+            "memory_limit": get_setting("pdf.job_memory_limit", 2 * 1024 ** 3) if job_memory_limit is None else job_memory_limit,
+            "cpu_limit": get_setting("pdf.job_cpu_limit", 45) if job_cpu_limit is None else job_cpu_limit,
+        }
+        self.recycled = 0
+        self.crashed = 0
+
+        # Workers register shared memory with the parent's resource tracker,
+        # so segments handed to the parent are not reported as leaked
+        resource_tracker.ensure_running()
+
+        # Collect first so the warmed objects are compacted, then keep the
+        # collector away from them in every child
+        gc.collect()
+        gc.freeze()
+        self._workers: List[_Worker] = [_Worker(self._context, self._limits) for _ in range(self.workers)]
+
+        self._dispatcher = threading.Thread(target=self._dispatch, name="prefork-dispatcher", daemon=True)
+        self._dispatcher.start()
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        """
+        Schedule fn(*args, **kwargs) on a worker
+
+        Returns:
+            Future: Resolves to the return value of the call
+        """
+        future = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("cannot submit to a closed PreforkPool")
+            task_id = self._next_id
+            self._next_id += 1
+            self._futures[task_id] = future
+            self._pending.append((task_id, fn, args, kwargs))
+        self._wake()
+        return future
+
+    def map(self, fn: Callable, *iterables: Iterable) -> Iterable:
+        """Like Executor.map: submit every call, then yield results in order"""
+        futures = [self.submit(fn, *args) for args in zip(*iterables)]
+        for future in futures:
+            yield future.result()
+
+    def _wake(self) -> None:
+        self._wake_writer.send_bytes(b"")
+
+    def _assign(self) -> None:
+        """Hand pending tasks to idle workers"""
+        for worker in self._workers:
+            if worker.task_id is not None:
+                continue
+            with self._lock:
+                if not self._pending:
+                    return
+                task = self._pending.popleft()
+                future = self._futures[task[0]]
+            if not future.set_running_or_notify_cancel():
+                with self._lock:
+                    self._futures.pop(task[0], None)
+                continue
+            try:
+                worker.conn.send(task)
+            except (BrokenPipeError, ConnectionResetError, EOFError):
+                # Died while idle; the task never started, so retry it elsewhere
+                with self._lock:
+                    self._pending.appendleft(task)
+                self._replace(worker)
+                continue
+            except Exception as e:  # the task itself could not be pickled
+                self._resolve(task[0], "error", e)
+                continue
+            worker.task_id = task[0]
+
+    def _resolve(self, task_id: int, kind: str, payload: Any) -> None:
+        with self._lock:
+            future = self._futures.pop(task_id, None)
+        if future is None:
+            return
+        if kind == "done":
+            future.set_result(payload)
+        else:
+            future.set_exception(payload)
+
+    def _replace(self, worker: _Worker, retired: bool = False) -> None:
+        """Reap a retired or dead worker, fail its task and fork a fresh one in its place"""
+        worker.process.join()
+        worker.conn.close()
+        if retired:
+            self.recycled += 1
+            logger.info(f"Recycling render worker {worker.process.pid} after {worker.tasks} jobs "
+                        f"({worker.rss / 1024 ** 2:.0f} MB RSS)")
+        else:
+            self.crashed += 1
+            if worker.task_id is not None:
+                self._resolve(worker.task_id, "error", WorkerCrashed(
+                    f"worker {worker.process.pid} exited with code {worker.process.exitcode}"))
+            logger.warning(f"Render worker {worker.process.pid} exited ({worker.process.exitcode}); replacing it")
+        index = self._workers.index(worker)
+        self._workers[index] = _Worker(self._context, self._limits)
+
+    def _dispatch(self) -> None:
+        while True:
+            self._assign()
+            with self._lock:
+                idle = not self._pending and all(w.task_id is None for w in self._workers)
+                if self._closed and idle:
+                    break
+            ready = connection.wait([w.conn for w in self._workers] + [self._wake_reader])
+            for conn in ready:
+                if conn is self._wake_reader:
+                    while self._wake_reader.poll():
+                        self._wake_reader.recv_bytes()
+                    continue
+                worker = next(w for w in self._workers if w.conn is conn)
+                try:
+                    kind, task_id, payload, usage = conn.recv()
+                except (EOFError, ConnectionResetError):
+                    self._replace(worker)
+                    continue
+                worker.task_id = None
+                worker.tasks = usage["tasks"]
+                worker.rss = usage["rss"]
+                worker.peak_rss = max(worker.peak_rss, usage["rss"])
+                self._resolve(task_id, kind, payload)
+                if usage["retiring"]:
+                    self._replace(worker, retired=True)
+
+        for worker in self._workers:
+            try:
+                worker.conn.send(None)
+            except OSError:
+                pass
+
+    def worker_pids(self) -> List[int]:
+        """Return the process ids of the live workers"""
+        return [w.process.pid for w in list(self._workers) if w.process.is_alive()]
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get per-worker memory usage and recycling counters
+
+        RSS is sampled by each worker after every job.
+
+        Returns:
+            Dict[str, Any]: workers (pid, tasks, rss_bytes, peak_rss_bytes), recycled and crashed
+        """
+        return {
+            "workers": [
+                {"pid": w.process.pid, "tasks": w.tasks, "rss_bytes": w.rss, "peak_rss_bytes": w.peak_rss}
+                for w in list(self._workers)
+            ],
+            "recycled": self.recycled,
+            "crashed": self.crashed,
+        }
+
+    def shutdown(self, wait: bool = True, cancel_futures: bool = False) -> None:
+        """
+        Stop the pool once queued tasks finish
+
+        Args:
+            wait (bool): Block until the workers have exited
+            cancel_futures (bool): Cancel tasks that have not started yet
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            if cancel_futures:
+                for task_id, *_ in self._pending:
+                    self._futures.pop(task_id).cancel()
+                self._pending.clear()
+        self._wake()
+        if wait:
+            self._dispatcher.join()
+            for worker in self._workers:
+                worker.process.join()
+                worker.conn.close()
+            gc.unfreeze()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
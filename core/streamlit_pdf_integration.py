@@ -16,8 +16,7 @@ except ImportError:
     # Fallback for direct execution
     from pdf_generator_optimized import PDFGenerator
 
-# Setup logging
-logging.basicConfig(level=logging.INFO)
+# Logging is configured by the application entry point, not at import time
 logger = logging.getLogger(__name__)
 
 
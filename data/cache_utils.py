@@ -2,30 +2,159 @@
 Caching utilities for the Stream Bill Generator
 This module provides caching mechanisms to improve performance.
 """
+import hashlib
 import json
 import os
+import sys
+import threading
 import time
+import weakref
+from collections import OrderedDict
 from functools import lru_cache
 from typing import Any, Dict, Optional
 
+from config.settings import get_setting
+
+def estimate_size(value: Any) -> int:
+    """
+    Estimate the memory held by a cached value in bytes
+
+    Containers are walked recursively and shared objects are counted once, so
+    the figure is close to what evicting the value would free.
+
+    Args:
+        value (Any): Value to measure
+
+    Returns:
+        int: Approximate size in bytes
+    """
+    seen = set()
+    stack = [value]
+    total = 0
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        total += sys.getsizeof(obj, 64)
+        if isinstance(obj, (str, bytes, bytearray, memoryview, int, float, bool)) or obj is None:
+            continue
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            stack.extend(obj)
+        elif hasattr(obj, "nbytes"):
+            # numpy arrays and similar buffers report their payload separately
+            total += int(getattr(obj, "nbytes", 0) or 0)
+    return total
+
+# Live caches, so forked worker processes can reset their locks and threads
+_CACHES = weakref.WeakSet()
+
+def _reset_caches_after_fork() -> None:
+    global _global_cache_lock
+    _global_cache_lock = threading.Lock()
+    for cache in list(_CACHES):
+        cache._after_fork()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_caches_after_fork)
+
+def _sweep_periodically(cache_ref, interval: float, stop: threading.Event) -> None:
+    """Sweeper thread body; exits once the cache is garbage collected"""
+    while not stop.wait(interval):
+        cache = cache_ref()
+        if cache is None:
+            return
+        cache.sweep()
+        del cache
+
 class InMemoryCache:
-    """Simple in-memory cache with TTL support"""
+    """
+    Thread-safe in-memory cache with TTL, LRU eviction and a byte budget
+
+    Entries are kept in least-recently-used order. When either the entry
+    limit or the byte budget is exceeded, the oldest entries are evicted.
+    Expired entries are dropped on access and by a background sweeper.
+    """
+    
+    def __init__(self, max_entries: Optional[int] = None, max_bytes: Optional[int] = None,
+                 default_ttl: Optional[int] = None, sweep_interval: float = 60.0):
+        """
+        Initialize the InMemoryCache
+
+        Args:
+            max_entries (Optional[int]): Maximum number of entries
+                (default: settings performance.max_cache_size)
+            max_bytes (Optional[int]): Maximum estimated size of all values
+                (default: settings performance.max_cache_bytes)
+            default_ttl (Optional[int]): TTL used when set() gets none
+                (default: settings performance.cache_ttl)
+            sweep_interval (float): Seconds between background sweeps; 0 disables the sweeper
+        """
+        self.max_entries = max_entries if max_entries is not None else get_setting("performance.max_cache_size", 1024)
+        self.max_bytes = max_bytes if max_bytes is not None else get_setting("performance.max_cache_bytes", 256 * 1024 * 1024)
+        self.default_ttl = default_ttl if default_ttl is not None else get_setting("performance.cache_ttl", 3600)
+        self.sweep_interval = sweep_interval
+        # key -> (value, expires_at, size), least recently used first
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.RLock()
+        self._stop = threading.Event()
+        self._sweeper = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        _CACHES.add(self)
+    
+    def _after_fork(self) -> None:
+        """Replace state a forked child must not share: the lock and the sweeper thread"""
+        self._lock = threading.RLock()
+        self._stop = threading.Event()
+        self._sweeper = None
+    
+    def _start_sweeper(self) -> None:
+        if self._sweeper is not None or not self.sweep_interval or self.sweep_interval <= 0:
+            return
+        self._sweeper = threading.Thread(
+            target=_sweep_periodically,
+            args=(weakref.ref(self), self.sweep_interval, self._stop),
+            name="cache-sweeper",
+            daemon=True,
+        )
+        self._sweeper.start()
     
-    def __init__(self):
-        self._cache = {}
-        self._timestamps = {}
+    def _remove(self, key: str) -> None:
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
     
-    def set(self, key: str, value: Any, ttl: int = 3600) -> None:
+    def set(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
         """
         Set a value in the cache with TTL
         
+        Values larger than the whole byte budget are not cached.
+
         Args:
             key (str): Cache key
             value (Any): Value to cache
-            ttl (int): Time to live in seconds (default: 1 hour)
+            ttl (Optional[int]): Time to live in seconds (default: settings performance.cache_ttl)
         """
-        self._cache[key] = value
-        self._timestamps[key] = time.time() + ttl
+        size = estimate_size(value)
+        expires_at = time.time() + (self.default_ttl if ttl is None else ttl)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (value, expires_at, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+            if self._sweeper is None:
+                self._start_sweeper()
     
     def get(self, key: str) -> Optional[Any]:
         """
@@ -37,28 +166,238 @@ class InMemoryCache:
         Returns:
             Optional[Any]: Cached value or None if not found or expired
         """
-        if key not in self._cache:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            # Check if expired
+            if time.time() > entry[1]:
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+    
+    def delete(self, key: str) -> bool:
+        """
+        Remove a value from the cache
+
+        Args:
+            key (str): Cache key
+
+        Returns:
+            bool: True if the key was cached
+        """
+        with self._lock:
+            if key not in self._entries:
+                return False
+            self._remove(key)
+            return True
+    
+    def sweep(self) -> int:
+        """
+        Drop every expired entry
+
+        Returns:
+            int: Number of entries removed
+        """
+        now = time.time()
+        with self._lock:
+            expired = [key for key, (_, expires_at, _) in self._entries.items() if now > expires_at]
+            for key in expired:
+                self._remove(key)
+            self.expirations += len(expired)
+        return len(expired)
+    
+    def stats(self) -> Dict[str, int]:
+        """
+        Get cache counters
+
+        Returns:
+            Dict[str, int]: hits, misses, evictions, expirations, entries and bytes
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+            }
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def clear(self) -> None:
+        """Clear all cached values"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+    
+    def close(self) -> None:
+        """Stop the background sweeper"""
+        self._stop.set()
+
+# Modules and libraries whose results the disk tier keeps (bills, HTML, PDFs)
+_CACHED_OUTPUT_SOURCES = (
+    "core/computations/bill_processor.py",
+    "exports/view_models.py",
+    "exports/renderers.py",
+    "exports/pdf_stamps.py",
+    "core/pdf_generator_optimized.py",
+)
+_CACHED_OUTPUT_PACKAGES = ("weasyprint", "reportlab", "xhtml2pdf", "pdfkit", "pypdf", "python-docx")
+
+def cache_namespace() -> str:
+    """
+    Version salt for the disk tier
+
+    Hashes the app version, the source of the modules whose results are
+    cached and the versions of the PDF and Word libraries, so after an
+    upgrade no bill, HTML page or PDF produced by older code is served.
+    Entries of older versions age out through TTL and LRU eviction.
+
+    Returns:
+        str: Short hex digest
+    """
+    from importlib import metadata
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    digest = hashlib.blake2b(digest_size=8)
+    digest.update(str(get_setting("app.version", "")).encode("utf-8"))
+    for path in _CACHED_OUTPUT_SOURCES:
+        try:
+            with open(os.path.join(root, path), "rb") as f:
+                digest.update(f.read())
+        except OSError:
+            digest.update(b"-")
+    for package in _CACHED_OUTPUT_PACKAGES:
+        try:
+            version = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            version = "-"
+        digest.update(f"{package}={version};".encode("utf-8"))
+    return digest.hexdigest()
+
+class TieredCache:
+    """
+    In-memory LRU in front of a persistent DiskCache
+
+    Reads fall through to disk and repopulate memory; writes go to both, so
+    processed bills, rendered HTML and PDF bytes survive a restart and are
+    shared by worker processes on the same host.
+    """
+    
+    def __init__(self, memory: InMemoryCache, disk: "DiskCache", namespace: str = ""):
+        """
+        Initialize the TieredCache
+
+        Args:
+            memory (InMemoryCache): Memory tier
+            disk (DiskCache): Disk tier
+            namespace (str): Prefix for disk keys, e.g. cache_namespace(), so
+                entries written by other code versions are not read
+        """
+        self.memory = memory
+        self.disk = disk
+        self.namespace = namespace
+    
+    def _disk_key(self, key: str) -> str:
+        return f"{self.namespace}:{key}" if self.namespace else key
+    
+    def set(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
+        """
+        Set a value in both tiers
+
+        Args:
+            key (str): Cache key
+            value (Any): Value to cache
+            ttl (Optional[int]): Time to live in seconds (default: settings performance.cache_ttl)
+        """
+        self.memory.set(key, value, ttl)
+        try:
+            self.disk.set(self._disk_key(key), value, ttl)
+        except Exception:
+            # Unpicklable values or a read-only disk stay memory-only
+            pass
+    
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Get a value from memory, falling back to disk
+
+        Args:
+            key (str): Cache key
+
+        Returns:
+            Optional[Any]: Cached value or None if not found or expired
+        """
+        value = self.memory.get(key)
+        if value is not None:
+            return value
+        try:
+            entry = self.disk.get_entry(self._disk_key(key))
+        except Exception:
             return None
-        
-        # Check if expired
-        if time.time() > self._timestamps.get(key, 0):
-            # Remove expired entry
-            self._cache.pop(key, None)
-            self._timestamps.pop(key, None)
+        if entry is None:
             return None
-        
-        return self._cache[key]
+        # Promote with the remaining lifetime, not a fresh TTL
+        value, expires_at = entry
+        self.memory.set(key, value, ttl=max(expires_at - time.time(), 0))
+        return value
+    
+    def delete(self, key: str) -> bool:
+        """Remove a value from both tiers"""
+        in_memory = self.memory.delete(key)
+        try:
+            return self.disk.delete(self._disk_key(key)) or in_memory
+        except Exception:
+            return in_memory
+    
+    def stats(self) -> Dict[str, Any]:
+        """Get counters of both tiers"""
+        try:
+            disk = self.disk.stats()
+        except Exception:
+            disk = {}
+        return {"memory": self.memory.stats(), "disk": disk}
     
     def clear(self) -> None:
         """Clear all cached values"""
-        self._cache.clear()
-        self._timestamps.clear()
+        self.memory.clear()
+        try:
+            self.disk.clear()
+        except Exception:
+            pass
+
+def _create_global_cache():
+    memory = InMemoryCache()
+    if not get_setting("performance.disk_cache", True):
+        return memory
+    from data.disk_cache import DiskCache
+    disk = DiskCache(
+        directory=get_setting("performance.disk_cache_dir") or None,
+        max_bytes=get_setting("performance.disk_cache_size", 512 * 1024 * 1024),
+        default_ttl=get_setting("performance.cache_ttl", 3600),
+    )
+    return TieredCache(memory, disk, namespace=cache_namespace())
 
-# Global cache instance
-_global_cache = InMemoryCache()
+# Global cache instance, created on first use
+_global_cache = None
+_global_cache_lock = threading.Lock()
 
-def get_cache() -> InMemoryCache:
-    """Get the global cache instance"""
+def get_cache():
+    """Get the global cache instance (memory, backed by disk unless performance.disk_cache is off)"""
+    global _global_cache
+    if _global_cache is None:
+        with _global_cache_lock:
+            if _global_cache is None:
+                _global_cache = _create_global_cache()
     return _global_cache
 
 @lru_cache(maxsize=1024)
@@ -0,0 +1,281 @@
+"""
+Persistent disk cache for the Stream Bill Generator
+This module provides a cache tier that survives restarts: an SQLite index of
+keys, sizes, expiry and access times, plus one blob file per value.
+
+Blobs are written to a temporary file and renamed into place, and index
+updates run in SQLite transactions, so several worker processes on one host
+can share a cache directory. Total blob size is capped; the least recently
+used entries are evicted first.
+"""
+import os
+import pickle
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+import weakref
+from contextlib import contextmanager
+from hashlib import sha256
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    filename TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    expires_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed_at);
+"""
+
+# Blob and temporary files younger than this may belong to a set() in progress
+_ORPHAN_GRACE = 600
+
+# SQLite connections must not cross fork(); children reopen the index
+_DISK_CACHES = weakref.WeakSet()
+
+def _reset_connections_after_fork() -> None:
+    for cache in list(_DISK_CACHES):
+        cache._local = threading.local()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_connections_after_fork)
+
+def default_cache_dir() -> str:
+    """Return $BILL_CACHE_DIR, or stream-bill-generator under the user cache directory"""
+    if os.environ.get("BILL_CACHE_DIR"):
+        return os.environ["BILL_CACHE_DIR"]
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "stream-bill-generator")
+
+class DiskCache:
+    """SQLite-indexed blob cache with TTL, a size cap and LRU eviction"""
+
+    def __init__(self, directory: Optional[str] = None, max_bytes: int = 512 * 1024 * 1024,
+                 default_ttl: int = 3600):
+        """
+        Initialize the DiskCache
+
+        The directory and index are created on first use.
+
+        Args:
+            directory (Optional[str]): Cache directory (default: default_cache_dir())
+            max_bytes (int): Maximum total size of the blob files
+            default_ttl (int): TTL used when set() gets none
+        """
+        self.directory = directory or default_cache_dir()
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self._local = threading.local()
+        _DISK_CACHES.add(self)
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.join(self.directory, "blobs"), exist_ok=True)
+            conn = sqlite3.connect(os.path.join(self.directory, "index.sqlite3"), timeout=30,
+                                   isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """Run the block in a write transaction; roll back if it raises"""
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+            conn.execute("COMMIT")
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+
+    def _blob_path(self, filename: str) -> str:
+        return os.path.join(self.directory, "blobs", filename)
+
+    def _unlink(self, filenames: List[str]) -> None:
+        for filename in filenames:
+            try:
+                os.remove(self._blob_path(filename))
+            except OSError:
+                pass
+
+    def set(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
+        """
+        Set a value in the cache with TTL
+
+        Args:
+            key (str): Cache key
+            value (Any): Picklable value to cache
+            ttl (Optional[int]): Time to live in seconds (default: default_ttl)
+        """
+        payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(payload) > self.max_bytes:
+            return
+        self._connection()
+
+        # Unique blob name per write, so readers never see a half-written file
+        filename = f"{sha256(key.encode('utf-8')).hexdigest()[:32]}-{uuid.uuid4().hex[:8]}"
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.join(self.directory, "blobs"), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(payload)
+            os.replace(tmp_path, self._blob_path(filename))
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        now = time.time()
+        expires_at = now + (self.default_ttl if ttl is None else ttl)
+        stale = []
+        try:
+            with self._transaction() as conn:
+                row = conn.execute("SELECT filename FROM entries WHERE key = ?", (key,)).fetchone()
+                if row:
+                    stale.append(row[0])
+                conn.execute(
+                    "INSERT OR REPLACE INTO entries (key, filename, size, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                    (key, filename, len(payload), expires_at, now),
+                )
+                stale.extend(self._evict(conn, now))
+        except BaseException:
+            stale = [filename]
+            raise
+        finally:
+            self._unlink(stale)
+
+    def _evict(self, conn: sqlite3.Connection, now: float) -> List[str]:
+        """Drop expired entries, then LRU entries over the size cap; return their blobs"""
+        removed = [row[0] for row in conn.execute("SELECT filename FROM entries WHERE expires_at < ?", (now,))]
+        conn.execute("DELETE FROM entries WHERE expires_at < ?", (now,))
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total > self.max_bytes:
+            victims = []
+            for key, filename, size in conn.execute("SELECT key, filename, size FROM entries ORDER BY accessed_at"):
+                if total <= self.max_bytes:
+                    break
+                victims.append((key,))
+                removed.append(filename)
+                total -= size
+            conn.executemany("DELETE FROM entries WHERE key = ?", victims)
+        return removed
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Get a value from the cache
+
+        Args:
+            key (str): Cache key
+
+        Returns:
+            Optional[Any]: Cached value or None if not found or expired
+        """
+        entry = self.get_entry(key)
+        return entry[0] if entry is not None else None
+
+    def get_entry(self, key: str) -> Optional[Tuple[Any, float]]:
+        """
+        Get a value from the cache together with its expiry time
+
+        Args:
+            key (str): Cache key
+
+        Returns:
+            Optional[Tuple[Any, float]]: (value, expires_at as a Unix time), or None if
+                not found or expired
+        """
+        conn = self._connection()
+        row = conn.execute("SELECT filename, expires_at FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        filename, expires_at = row
+        now = time.time()
+        if now > expires_at:
+            self.delete(key)
+            return None
+        try:
+            with open(self._blob_path(filename), "rb") as f:
+                value = pickle.loads(f.read())
+        except (OSError, pickle.UnpicklingError, EOFError):
+            # Replaced or evicted by another process since the lookup
+            return None
+        conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ? AND filename = ?", (now, key, filename))
+        return value, expires_at
+
+    def delete(self, key: str) -> bool:
+        """
+        Remove a value from the cache
+
+        Args:
+            key (str): Cache key
+
+        Returns:
+            bool: True if the key was cached
+        """
+        with self._transaction() as conn:
+            row = conn.execute("SELECT filename FROM entries WHERE key = ?", (key,)).fetchone()
+            conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+        if row:
+            self._unlink([row[0]])
+        return row is not None
+
+    def sweep(self) -> int:
+        """
+        Drop expired entries, enforce the size cap and remove orphaned files
+
+        Blob files that no entry refers to (left by a crash between writing
+        the blob and indexing it) and leftover temporary files are removed
+        once they are older than a grace period.
+
+        Returns:
+            int: Number of entries and orphaned files removed
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            removed = self._evict(conn, now)
+            referenced = {row[0] for row in conn.execute("SELECT filename FROM entries")}
+        self._unlink(removed)
+
+        orphans = []
+        for filename in os.listdir(os.path.join(self.directory, "blobs")):
+            if filename in referenced:
+                continue
+            try:
+                if os.path.getmtime(self._blob_path(filename)) < now - _ORPHAN_GRACE:
+                    orphans.append(filename)
+            except OSError:
+                pass
+        self._unlink(orphans)
+        return len(removed) + len(orphans)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Get cache counters
+
+        Returns:
+            Dict[str, int]: entries and bytes
+        """
+        entries, size = self._connection().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        return {"entries": entries, "bytes": size}
+
+    def clear(self) -> None:
+        """Clear all cached values"""
+        with self._transaction() as conn:
+            filenames = [row[0] for row in conn.execute("SELECT filename FROM entries")]
+            conn.execute("DELETE FROM entries")
+        self._unlink(filenames)
+
+    def close(self) -> None:
+        """Close this thread's index connection"""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
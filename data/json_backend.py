@@ -0,0 +1,122 @@
+"""
+JSON serialization backend for the Stream Bill Generator
+This module provides one fast, deterministic JSON encoder shared by the JSON
+export and by cache-key hashing.
+
+orjson is used when it is installed; otherwise the standard library encoder
+runs with compact separators. Keys are always sorted so the same bill data
+serializes to the same bytes regardless of dict insertion order, and values
+are normalized before encoding so both encoders write the same bytes.
+"""
+import hashlib
+import json
+import math
+from typing import Any, Tuple
+
+# Optional fast encoder
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    orjson = None
+    ORJSON_AVAILABLE = False
+
+def _key(key: Any) -> str:
+    """Turn a dict key into the string the stdlib encoder would write"""
+    if isinstance(key, str):
+        return key
+    if key is None or isinstance(key, (int, float)):
+        return json.dumps(key)
+    return str(key)
+
+def _plain_scalar(value: Any, portable: list) -> Any:
+    if isinstance(value, float):
+        if not math.isfinite(value):
+            return None
+        value = float(value)
+        # Exponent notation is formatted differently by orjson
+        if "e" in repr(value):
+            portable[0] = False
+        return value
+    return int(value)
+
+def _plain(value: Any, portable: list) -> Any:
+    """Convert value to plain JSON types: NaN becomes null, numpy scalars numbers, the rest str()"""
+    if value is None or value is True or value is False:
+        return value
+    if isinstance(value, str):
+        return str.__str__(value)
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return _plain_scalar(value, portable)
+    if isinstance(value, dict):
+        return {_key(k): _plain(v, portable) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_plain(item, portable) for item in value]
+    if type(value).__module__ == "numpy" and hasattr(value, "tolist"):
+        return _plain(value.tolist(), portable)
+    return _plain(str(value), portable)
+
+def _to_plain(data: Any) -> Tuple[Any, bool]:
+    """
+    Normalize data to the JSON types both encoders write identically
+
+    Returns:
+        Tuple[Any, bool]: The normalized data, and False when it holds values
+        only the stdlib encoder is known to format this way
+    """
+    portable = [True]
+    return _plain(data, portable), portable[0]
+
+def _stdlib_dumps(data: Any, indent: bool) -> bytes:
+    if indent:
+        text = json.dumps(data, sort_keys=True, ensure_ascii=False, default=str, indent=2)
+    else:
+        text = json.dumps(data, sort_keys=True, ensure_ascii=False, default=str, separators=(",", ":"))
+    return text.encode("utf-8")
+
+def dumps(data: Any, indent: bool = False) -> bytes:
+    """
+    Serialize data to UTF-8 JSON with sorted keys
+
+    NaN and infinities become null, numpy scalars and arrays become numbers
+    and lists, and other values that are not JSON types (dates, Decimals...)
+    are converted with str(). The bytes do not depend on whether orjson is
+    installed.
+
+    Args:
+        data (Any): Data to serialize
+        indent (bool): Pretty-print with two-space indentation
+
+    Returns:
+        bytes: UTF-8 encoded JSON
+    """
+    data, portable = _to_plain(data)
+    if orjson is not None and portable:
+        try:
+            return _orjson_dumps(data, indent)
+        except TypeError:
+            # e.g. integers wider than 64 bits; fall back to the stdlib encoder
+            pass
+    return _stdlib_dumps(data, indent)
+
+def _orjson_dumps(data: Any, indent: bool) -> bytes:
+    option = orjson.OPT_SORT_KEYS
+    if indent:
+        option |= orjson.OPT_INDENT_2
+    return orjson.dumps(data, option=option)
+
+def stable_hash(data: Any) -> str:
+    """
+    Hash data by its deterministic JSON encoding
+
+    Args:
+        data (Any): Data to hash
+
+    Returns:
+        str: SHA-256 hex digest
+    """
+    try:
+        payload = dumps(data)
+    except Exception:
+        payload = repr(data).encode("utf-8")
+    return hashlib.sha256(payload).hexdigest()
@@ -1,193 +1,412 @@
 """
 Redis caching utilities for the Stream Bill Generator
 This module provides Redis-based caching as an alternative to in-memory caching.
+
+Connections are made lazily by a background thread with connect timeouts
+and exponential backoff, which also health-checks the connection; until it
+is up, caches behave as if Redis were absent.
+
+HybridCache keeps a bounded in-process LRU (L1) in front of Redis (L2). Reads
+are served from L1 and fall through to Redis; writes go to both. Values are
+pickled, so rendered PDFs can be cached as bytes. Only processes of this
+application should write to the Redis namespace, since cached values are
+unpickled on read.
 """
+import importlib.util
 import json
+import logging
+import os
+import pickle
+import random
+import threading
 import time
-from typing import Any, Dict, Optional
-try:
-    import redis
-    REDIS_AVAILABLE = True
-except ImportError:
-    REDIS_AVAILABLE = False
-    redis = None
+import weakref
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+# redis is imported by the connector thread; importing this module does no I/O
+REDIS_AVAILABLE = importlib.util.find_spec("redis") is not None
+
+from data.cache_utils import InMemoryCache
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_NAMESPACE = "stream-bill"
+
+# Forked children restart their own connector thread
+_REDIS_CACHES = weakref.WeakSet()
+
+def _reset_connectors_after_fork() -> None:
+    for cache in list(_REDIS_CACHES):
+        cache._lock = threading.Lock()
+        cache._wake = threading.Event()
+        cache._stop = threading.Event()
+        cache._connector = None
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_connectors_after_fork)
+
+def _serialize(value: Any) -> bytes:
+    return pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+
+def _deserialize(payload: Optional[bytes]) -> Optional[Any]:
+    if payload is None:
+        return None
+    try:
+        return pickle.loads(payload)
+    except Exception:
+        # Values written by older versions were JSON or plain strings
+        text = payload.decode("utf-8", errors="replace") if isinstance(payload, bytes) else payload
+        try:
+            return json.loads(text)
+        except (json.JSONDecodeError, TypeError):
+            return text
 
 class RedisCache:
-    """Redis-based cache with TTL support"""
-    
-    def __init__(self, host: str = "localhost", port: int = 6379, db: int = 0):
+    """Redis-based cache with TTL support, namespaced keys and a circuit breaker"""
+
+    def __init__(self, host: str = "localhost", port: int = 6379, db: int = 0,
+                 namespace: str = DEFAULT_NAMESPACE, client: Any = None, retry_after: float = 30.0,
+                 client_factory: Optional[Callable[[], Any]] = None, connect_timeout: float = 0.5,
+                 health_interval: float = 30.0, backoff: float = 0.5, max_backoff: float = 60.0):
         """
         Initialize the RedisCache
-        
+
+        No connection is made here; the first cache call starts a background
+        connector and is served as a miss until the connection is up.
+
         Args:
             host (str): Redis host
             port (int): Redis port
             db (int): Redis database number
+            namespace (str): Prefix for every key written by this cache
+            client (Any): Ready Redis client to use instead of connecting (e.g. fakeredis)
+            retry_after (float): Seconds to skip Redis after a failed call
+            client_factory (Optional[Callable[[], Any]]): Builds a client
+                (default: redis.Redis with connect timeouts)
+            connect_timeout (float): Socket connect and read timeout in seconds
+            health_interval (float): Seconds between pings of a live connection
+            backoff (float): First reconnection delay in seconds, doubled per failure
+            max_backoff (float): Longest reconnection delay in seconds
         """
         self.host = host
         self.port = port
         self.db = db
-        self.client = None
-        self._connect()
-    
-    def _connect(self) -> None:
-        """Connect to Redis"""
-        if not REDIS_AVAILABLE:
-            print("Redis not available, using in-memory cache")
+        self.namespace = namespace
+        self.retry_after = retry_after
+        self.client = client
+        self.client_factory = client_factory
+        self.connect_timeout = connect_timeout
+        self.health_interval = health_interval
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.connect_attempts = 0
+        self._open_until = 0.0
+        self._lock = threading.Lock()
+        self._connector = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        _REDIS_CACHES.add(self)
+
+    def _create_client(self) -> Any:
+        if self.client_factory is not None:
+            return self.client_factory()
+        import redis
+        return redis.Redis(host=self.host, port=self.port, db=self.db,
+                           socket_connect_timeout=self.connect_timeout, socket_timeout=self.connect_timeout)
+
+    def _start_connector(self) -> None:
+        """Start the background connector once, if there is a way to connect"""
+        if self._connector is not None or not (REDIS_AVAILABLE or self.client_factory):
             return
-            
-        try:
-            self.client = redis.Redis(host=self.host, port=self.port, db=self.db, decode_responses=True)
-            # Test connection
-            self.client.ping()
-            print("Connected to Redis successfully")
-        except Exception as e:
-            print(f"Failed to connect to Redis: {e}")
-            self.client = None
-    
+        with self._lock:
+            if self._connector is None:
+                self._connector = threading.Thread(target=self._connect_loop, name="redis-connector", daemon=True)
+                self._connector.start()
+
+    def _connect_loop(self) -> None:
+        """Connect with exponential backoff, then ping the live connection periodically"""
+        failures = 0
+        while not self._stop.is_set():
+            if self.client is None:
+                self.connect_attempts += 1
+                try:
+                    client = self._create_client()
+                    client.ping()
+                except Exception as e:
+                    failures += 1
+                    if failures == 1:
+                        logger.info("Redis unavailable at %s:%s, retrying in the background: %s", self.host, self.port, e)
+                    delay = min(self.max_backoff, self.backoff * 2 ** (failures - 1))
+                    self._stop.wait(delay * random.uniform(0.5, 1.0))
+                    continue
+                failures = 0
+                self.client = client
+                self._open_until = 0.0
+                logger.info("Connected to Redis at %s:%s", self.host, self.port)
+
+            # Health check; a tripped breaker wakes the checker early
+            self._wake.wait(self.health_interval)
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            try:
+                self.client.ping()
+                self._open_until = 0.0
+            except Exception as e:
+                logger.warning("Lost connection to Redis: %s", e)
+                self.client = None
+
+    def close(self) -> None:
+        """Stop the background connector"""
+        self._stop.set()
+        self._wake.set()
+
+    def _key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    @property
+    def available(self) -> bool:
+        """True when connected and the circuit breaker is closed; never blocks"""
+        if self.client is None:
+            self._start_connector()
+            return False
+        return time.monotonic() >= self._open_until
+
+    def _trip(self, error: Exception) -> None:
+        """Open the circuit breaker after a failed call and ask for a health check"""
+        with self._lock:
+            if time.monotonic() >= self._open_until:
+                logger.warning("Redis call failed, skipping Redis for %.0fs: %s", self.retry_after, error)
+            self._open_until = time.monotonic() + self.retry_after
+        self._wake.set()
+
     def set(self, key: str, value: Any, ttl: int = 3600) -> bool:
         """
         Set a value in the cache with TTL
-        
+
         Args:
             key (str): Cache key
             value (Any): Value to cache
             ttl (int): Time to live in seconds (default: 1 hour)
-            
+
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        return self.set_many({key: value}, ttl)
+
+    def set_many(self, values: Dict[str, Any], ttl: int = 3600) -> bool:
+        """
+        Set several values in one pipelined round trip
+
+        Args:
+            values (Dict[str, Any]): Values by cache key
+            ttl (int): Time to live in seconds (default: 1 hour)
+
         Returns:
             bool: True if successful, False otherwise
         """
-        if not REDIS_AVAILABLE or self.client is None:
+        if not self.available or not values:
             return False
-            
+
         try:
-            # Serialize complex objects to JSON
-            if isinstance(value, (dict, list, tuple)):
-                serialized_value = json.dumps(value)
-            else:
-                serialized_value = str(value)
-                
-            result = self.client.setex(key, ttl, serialized_value)
-            return result
+            pipe = self.client.pipeline(transaction=False)
+            for key, value in values.items():
+                pipe.setex(self._key(key), ttl, _serialize(value))
+            return all(pipe.execute())
         except Exception as e:
-            print(f"Error setting cache value: {e}")
+            self._trip(e)
             return False
-    
+
     def get(self, key: str) -> Optional[Any]:
         """
         Get a value from the cache
-        
+
         Args:
             key (str): Cache key
-            
+
         Returns:
             Optional[Any]: Cached value or None if not found or expired
         """
-        if not REDIS_AVAILABLE or self.client is None:
-            return None
-            
+        return self.mget([key])[0]
+
+    def mget(self, keys: List[str]) -> List[Optional[Any]]:
+        """
+        Get several values in one round trip
+
+        Args:
+            keys (List[str]): Cache keys
+
+        Returns:
+            List[Optional[Any]]: Cached values in key order, None where missing
+        """
+        if not self.available or not keys:
+            return [None] * len(keys)
+
         try:
-            value = self.client.get(key)
-            if value is None:
-                return None
-                
-            # Try to deserialize JSON
-            try:
-                return json.loads(value)
-            except (json.JSONDecodeError, TypeError):
-                return value
+            payloads = self.client.mget([self._key(key) for key in keys])
+        except Exception as e:
+            self._trip(e)
+            return [None] * len(keys)
+        return [_deserialize(payload) for payload in payloads]
+
+    def delete(self, key: str) -> bool:
+        """
+        Remove a value from the cache
+
+        Args:
+            key (str): Cache key
+
+        Returns:
+            bool: True if the key existed
+        """
+        if not self.available:
+            return False
+        try:
+            return bool(self.client.delete(self._key(key)))
         except Exception as e:
-            print(f"Error getting cache value: {e}")
-            return None
-    
+            self._trip(e)
+            return False
+
     def clear(self) -> bool:
         """
-        Clear all cached values
-        
+        Clear all values in this cache's namespace
+
+        Other data in the Redis database is left untouched.
+
         Returns:
             bool: True if successful, False otherwise
         """
-        if not REDIS_AVAILABLE or self.client is None:
+        if not self.available:
             return False
-            
+
         try:
-            self.client.flushdb()
+            batch = []
+            for key in self.client.scan_iter(match=self._key("*"), count=500):
+                batch.append(key)
+                if len(batch) >= 500:
+                    self.client.delete(*batch)
+                    batch = []
+            if batch:
+                self.client.delete(*batch)
             return True
         except Exception as e:
-            print(f"Error clearing cache: {e}")
+            self._trip(e)
             return False
 
-# Hybrid cache that uses Redis when available, falls back to in-memory
+# Hybrid cache with an in-process L1 in front of Redis
 class HybridCache:
-    """Hybrid cache that uses Redis when available, falls back to in-memory"""
-    
-    def __init__(self, redis_host: str = "localhost", redis_port: int = 6379, redis_db: int = 0):
+    """Two-tier cache: in-process LRU (L1) with read-through/write-through to Redis (L2)"""
+
+    def __init__(self, redis_host: str = "localhost", redis_port: int = 6379, redis_db: int = 0,
+                 namespace: str = DEFAULT_NAMESPACE, l1_ttl: int = 60,
+                 redis_cache: Optional[RedisCache] = None, memory_cache: Optional[InMemoryCache] = None):
         """
         Initialize the HybridCache
-        
+
         Args:
             redis_host (str): Redis host
             redis_port (int): Redis port
             redis_db (int): Redis database number
+            namespace (str): Prefix for Redis keys
+            l1_ttl (int): Longest time a value read from or written to Redis is
+                served from L1, which bounds staleness between processes
+            redis_cache (Optional[RedisCache]): L2 to use instead of connecting
+            memory_cache (Optional[InMemoryCache]): L1 to use instead of a new one
         """
-        self.redis_cache = RedisCache(redis_host, redis_port, redis_db) if REDIS_AVAILABLE else None
-        from data.cache_utils import InMemoryCache
-        self.memory_cache = InMemoryCache()
-    
+        if redis_cache is None and REDIS_AVAILABLE:
+            redis_cache = RedisCache(redis_host, redis_port, redis_db, namespace=namespace)
+        self.redis_cache = redis_cache
+        self.memory_cache = memory_cache if memory_cache is not None else InMemoryCache()
+        self.l1_ttl = l1_ttl
+
     def set(self, key: str, value: Any, ttl: int = 3600) -> None:
         """
         Set a value in the cache with TTL
-        
+
         Args:
             key (str): Cache key
             value (Any): Value to cache
             ttl (int): Time to live in seconds (default: 1 hour)
         """
-        # Try Redis first
+        self.set_many({key: value}, ttl)
+
+    def set_many(self, values: Dict[str, Any], ttl: int = 3600) -> None:
+        """
+        Set several values, writing through to Redis in one pipeline
+
+        Args:
+            values (Dict[str, Any]): Values by cache key
+            ttl (int): Time to live in seconds (default: 1 hour)
+        """
+        # Without Redis, L1 is the only tier and keeps the full TTL
+        l1_ttl = ttl if self.redis_cache is None else min(ttl, self.l1_ttl)
+        for key, value in values.items():
+            self.memory_cache.set(key, value, l1_ttl)
         if self.redis_cache is not None:
-            success = self.redis_cache.set(key, value, ttl)
-            if success:
-                return
-                
-        # Fall back to in-memory cache
-        self.memory_cache.set(key, value, ttl)
-    
+            self.redis_cache.set_many(values, ttl)
+
     def get(self, key: str) -> Optional[Any]:
         """
         Get a value from the cache
-        
+
         Args:
             key (str): Cache key
-            
+
         Returns:
             Optional[Any]: Cached value or None if not found or expired
         """
-        # Try Redis first
+        return self.mget([key])[0]
+
+    def mget(self, keys: Iterable[str]) -> List[Optional[Any]]:
+        """
+        Get several values, fetching L1 misses from Redis in one round trip
+
+        Args:
+            keys (Iterable[str]): Cache keys
+
+        Returns:
+            List[Optional[Any]]: Cached values in key order, None where missing
+        """
+        keys = list(keys)
+        values = [self.memory_cache.get(key) for key in keys]
+        missing = [i for i, value in enumerate(values) if value is None]
+        if missing and self.redis_cache is not None:
+            fetched = self.redis_cache.mget([keys[i] for i in missing])
+            for i, value in zip(missing, fetched):
+                if value is not None:
+                    values[i] = value
+                    self.memory_cache.set(keys[i], value, self.l1_ttl)
+        return values
+
+    def delete(self, key: str) -> None:
+        """Remove a value from both tiers"""
+        self.memory_cache.delete(key)
         if self.redis_cache is not None:
-            value = self.redis_cache.get(key)
-            if value is not None:
-                return value
-                
-        # Fall back to in-memory cache
-        return self.memory_cache.get(key)
-    
+            self.redis_cache.delete(key)
+
     def clear(self) -> None:
         """Clear all cached values"""
         if self.redis_cache is not None:
             self.redis_cache.clear()
         self.memory_cache.clear()
 
-# Global hybrid cache instance
-_hybrid_cache = HybridCache()
+# Global hybrid cache instance, created on first use
+_hybrid_cache = None
+_hybrid_cache_lock = threading.Lock()
 
 def get_cache() -> HybridCache:
     """Get the global hybrid cache instance"""
+    global _hybrid_cache
+    if _hybrid_cache is None:
+        with _hybrid_cache_lock:
+            if _hybrid_cache is None:
+                _hybrid_cache = HybridCache()
     return _hybrid_cache
 
 def cache_bill_data(bill_id: str, bill_data: Dict[str, Any], ttl: int = 7200) -> None:
     """
     Cache bill data
-    
+
     Args:
         bill_id (str): Bill ID
         bill_data (Dict[str, Any]): Bill data
@@ -199,10 +418,10 @@ def cache_bill_data(bill_id: str, bill_data: Dict[str, Any], ttl: int = 7200) ->
 def get_cached_bill_data(bill_id: str) -> Optional[Dict[str, Any]]:
     """
     Get cached bill data
-    
+
     Args:
         bill_id (str): Bill ID
-        
+
     Returns:
         Optional[Dict[str, Any]]: Cached bill data or None
     """
@@ -212,15 +431,15 @@ def get_cached_bill_data(bill_id: str) -> Optional[Dict[str, Any]]:
 if __name__ == "__main__":
     # Example usage
     cache = get_cache()
-    
+
     # Test setting and getting values
     test_data = {"bill_id": "12345", "amount": 1000.0, "items": ["item1", "item2"]}
     cache.set("test_bill", test_data, ttl=10)
-    
+
     retrieved_data = cache.get("test_bill")
     print("Retrieved data:", retrieved_data)
-    
+
     # Test expiration
     time.sleep(11)
     expired_data = cache.get("test_bill")
-    print("Expired data:", expired_data)
\ No newline at end of file
+    print("Expired data:", expired_data)
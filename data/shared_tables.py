@@ -0,0 +1,176 @@
+"""
+Shared-memory table transport for the Stream Bill Generator
+This module moves typed Arrow tables (see exports.advanced_formats.create_item_tables)
+between processes without pickling their columns.
+
+The sender writes each table as an Arrow IPC stream into one
+multiprocessing.shared_memory segment and passes only a small handle (segment
+name, byte ranges, metadata). On Linux the receiver memory-maps the segment
+through Arrow and reads the tables in place: their columns point straight into
+the shared pages and keep the mapping alive for as long as they are used.
+Where POSIX shared memory is not visible as a file, the bytes are copied once.
+
+Every segment has exactly one owner, which unlinks it: the SharedTables object
+that created it, or the receiver it was released to. Owners unlink on close(),
+when they are garbage collected, and at interpreter exit; the multiprocessing
+resource tracker removes anything left by a process that crashed.
+"""
+import logging
+import os
+import sys
+import weakref
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+from typing import Dict, Iterator, NamedTuple, Optional, Tuple
+
+# Optional Arrow support
+try:
+    import pyarrow as pa
+    PYARROW_AVAILABLE = True
+except ImportError:
+    pa = None
+    PYARROW_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Arrow expects buffers aligned to 64 bytes
+ALIGNMENT = 64
+
+# Linux exposes POSIX shared memory as files, which Arrow can map directly
+SHM_DIR = "/dev/shm"
+
+# Receivers must not register segments they did not create (Python 3.13+)
+_ATTACH_KWARGS = {"track": False} if sys.version_info >= (3, 13) else {}
+
+
+class SharedTablesHandle(NamedTuple):
+    """Picklable description of a published segment"""
+    name: str
+    layout: Dict[str, Tuple[int, int]]  # table name -> (offset, size)
+    metadata: Dict[str, str]
+
+
+def _aligned(size: int) -> int:
+    return (size + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def _ipc_size(table: "pa.Table") -> int:
+    sink = pa.MockOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.size()
+
+
+def _write_tables(segment: shared_memory.SharedMemory, tables: Dict[str, "pa.Table"],
+                  layout: Dict[str, Tuple[int, int]]) -> None:
+    # Runs in its own frame so no view of segment.buf outlives the call
+    for name, table in tables.items():
+        start, size = layout[name]
+        with pa.FixedSizeBufferWriter(pa.py_buffer(segment.buf[start:start + size])) as sink:
+            with pa.ipc.new_stream(sink, table.schema) as writer:
+                writer.write_table(table)
+
+
+def _read_tables(handle: "SharedTablesHandle") -> Dict[str, "pa.Table"]:
+    path = os.path.join(SHM_DIR, handle.name.lstrip("/"))
+    if os.path.exists(path):
+        # Arrow reference-counts the mapping, so tables may outlive the segment name
+        with pa.memory_map(path) as source:
+            buffer = source.read_buffer()
+    else:
+        segment = shared_memory.SharedMemory(name=handle.name, **_ATTACH_KWARGS)
+        try:
+            buffer = pa.py_buffer(bytes(segment.buf))
+        finally:
+            segment.close()
+    return {
+        name: pa.ipc.open_stream(buffer.slice(offset, size)).read_all()
+        for name, (offset, size) in handle.layout.items()
+    }
+
+
+def _unlink(name: str) -> None:
+    try:
+        segment = shared_memory.SharedMemory(name=name)
+    except FileNotFoundError:
+        return
+    segment.close()
+    segment.unlink()
+
+
+class SharedTables:
+    """Owner of a shared-memory segment holding named Arrow tables"""
+
+    def __init__(self, tables: Dict[str, "pa.Table"], metadata: Optional[Dict[str, str]] = None):
+        """
+        Write the tables into a new shared-memory segment
+
+        Args:
+            tables (Dict[str, pa.Table]): Tables to publish, by name
+            metadata (Optional[Dict[str, str]]): Small values sent with the handle
+        """
+        if not PYARROW_AVAILABLE:
+            raise ImportError("pyarrow is required for shared table transport")
+
+        layout = {}
+        offset = 0
+        for name, table in tables.items():
+            size = _ipc_size(table)
+            layout[name] = (offset, size)
+            offset = _aligned(offset + size)
+
+        segment = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+        self.handle = SharedTablesHandle(segment.name, layout, dict(metadata or {}))
+        self._finalizer = weakref.finalize(self, _unlink, segment.name)
+        try:
+            _write_tables(segment, tables, layout)
+        finally:
+            # Drop our mapping; the segment lives until it is unlinked
+            segment.close()
+
+    @property
+    def name(self) -> str:
+        return self.handle.name
+
+    def release(self) -> SharedTablesHandle:
+        """
+        Hand ownership to the receiver, which must attach with unlink=True
+
+        Returns:
+            SharedTablesHandle: Handle to send to the receiver
+        """
+        self._finalizer.detach()
+        return self.handle
+
+    def close(self) -> None:
+        """Unlink the segment unless ownership was released"""
+        self._finalizer()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+@contextmanager
+def attach_tables(handle: SharedTablesHandle, unlink: bool = False) -> Iterator[Dict[str, "pa.Table"]]:
+    """
+    Map a published segment and read its tables in place
+
+    Args:
+        handle (SharedTablesHandle): Handle from SharedTables
+        unlink (bool): Take ownership and unlink the segment when the block exits
+            (also on error); tables already read stay valid
+
+    Yields:
+        Dict[str, pa.Table]: Tables by name
+    """
+    if not PYARROW_AVAILABLE:
+        raise ImportError("pyarrow is required for shared table transport")
+
+    try:
+        yield _read_tables(handle)
+    finally:
+        if unlink:
+            _unlink(handle.name)
@@ -0,0 +1,152 @@
+"""
+Single-flight deduplication for the Stream Bill Generator
+This module makes concurrent requests for the same expensive result share one
+computation instead of each running it.
+
+Within a process, callers with the same key wait for the first caller and
+receive its result (or its exception). Across processes, the first caller
+holds an exclusive file lock for the key while computing; callers in other
+processes block on the lock, then look the result up in the shared cache
+before computing anything themselves. Lock files are removed when released.
+"""
+import os
+import tempfile
+import threading
+import weakref
+from hashlib import sha256
+from typing import Any, Callable, Dict, Optional
+
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:  # Windows: deduplicate within the process only
+    fcntl = None
+    FCNTL_AVAILABLE = False
+
+# Forked children start with no in-flight calls and fresh locks
+_GROUPS = weakref.WeakSet()
+
+def _reset_groups_after_fork() -> None:
+    for group in list(_GROUPS):
+        group._calls = {}
+        group._lock = threading.Lock()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_groups_after_fork)
+
+class _Call:
+    """One in-flight computation shared by every waiter"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+class SingleFlight:
+    """Deduplicate concurrent computations by key, across threads and processes"""
+
+    def __init__(self, lock_dir: Optional[str] = None):
+        """
+        Initialize the SingleFlight group
+
+        Args:
+            lock_dir (Optional[str]): Directory for per-key lock files
+                (default: stream-bill-locks in the system temp directory)
+        """
+        self.lock_dir = lock_dir or os.path.join(tempfile.gettempdir(), "stream-bill-locks")
+        self._calls: Dict[str, _Call] = {}
+        self._lock = threading.Lock()
+        _GROUPS.add(self)
+
+    def do(self, key: str, compute: Callable[[], Any], lookup: Optional[Callable[[], Any]] = None) -> Any:
+        """
+        Run compute() once for all concurrent callers with the same key
+
+        Args:
+            key (str): Identity of the result, e.g. a cache key
+            compute (Callable[[], Any]): Produces the result; should also store it
+                where lookup() can find it
+            lookup (Optional[Callable[[], Any]]): Returns a result another process
+                already stored, or None
+
+        Returns:
+            Any: Result of the shared computation
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                call.waiters += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = self._run_exclusive(key, compute, lookup)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def in_flight(self, key: str) -> int:
+        """Return the number of callers waiting on key (0 when idle)"""
+        with self._lock:
+            call = self._calls.get(key)
+            return 0 if call is None else call.waiters + 1
+
+    def _run_exclusive(self, key: str, compute: Callable[[], Any], lookup: Optional[Callable[[], Any]]) -> Any:
+        if not FCNTL_AVAILABLE:
+            return compute()
+
+        lock_path = os.path.join(self.lock_dir, sha256(key.encode("utf-8")).hexdigest()[:32] + ".lock")
+        fd = self._lock_file(lock_path)
+        try:
+            if lookup is not None:
+                # Another process may have finished while we waited for the lock
+                result = lookup()
+                if result is not None:
+                    return result
+            return compute()
+        finally:
+            # Keys include workbook digests, so lock files must not pile up. The
+            # file is removed while still locked; waiters notice and relock.
+            try:
+                os.unlink(lock_path)
+            except OSError:
+                pass
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+    def _lock_file(self, lock_path: str) -> int:
+        """Open and exclusively lock lock_path, returning the descriptor"""
+        while True:
+            os.makedirs(self.lock_dir, exist_ok=True)
+            fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                # The previous holder may have unlinked the file while we waited
+                if os.fstat(fd).st_ino == os.stat(lock_path).st_ino:
+                    return fd
+            except FileNotFoundError:
+                pass
+            except BaseException:
+                os.close(fd)
+                raise
+            os.close(fd)
+
+# Global single-flight group
+_single_flight = SingleFlight()
+
+def get_single_flight() -> SingleFlight:
+    """Get the global single-flight group"""
+    return _single_flight
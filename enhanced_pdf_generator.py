@@ -45,6 +45,9 @@ except ImportError:
     Environment = None
     FileSystemLoader = None
 
+from exports.view_models import build_view_model
+from core.engine_health import get_engine_health
+
 # Environment detection
 IN_CLOUD_ENV = os.environ.get('STREAMLIT_CLOUD', '').lower() == 'true' or \
                os.environ.get('DEPLOYMENT_ENV', '').lower() == 'cloud' or \
@@ -98,28 +101,53 @@ class EnhancedPDFGenerator:
             if not PDFKIT_AVAILABLE:
                 raise Exception("pdfkit is required but not available in cloud environment")
         
-        # Determine which engine to use
+        # Determine which engine to use, skipping engines whose breaker is open
+        health = get_engine_health()
         if engine is None:
             if not self.engines:
                 raise Exception("No PDF generation engines available. Please install one of: weasyprint, xhtml2pdf, pdfkit, playwright")
-            engine = self.engines[0]  # Use the best available engine
+            usable = health.usable(self.engines)
+            if not usable:
+                raise Exception("No healthy PDF engine available; all circuit breakers are open")
+            engine = usable[0]  # Use the best available engine
+        elif not health.allow(engine):
+            raise Exception(f"PDF engine {engine} keeps failing; skipped until its circuit breaker closes")
         
+        return self._generate_with_engine(template_name, data, output_path, engine, orientation)
+    
+    def _generate_with_engine(self, template_name, data, output_path, engine, orientation):
+        """Render the template and convert it with one engine, recording the engine's health"""
         # Check if environment is available
         if self.env is None:
             raise Exception("Jinja2 environment not available")
             
         # Render HTML from template
+        view = build_view_model(template_name, data)
         try:
             template = self.env.get_template(f"enhanced_{template_name}.html")
-            html_content = template.render(data=data)
+            html_content = template.render(data=data, view=view)
         except Exception as e:
             # Fallback to regular template if enhanced template not found
             try:
                 template = self.env.get_template(f"{template_name}.html")
-                html_content = template.render(data=data)
+                html_content = template.render(data=data, view=view)
             except Exception as e2:
                 raise Exception(f"Could not render template: {str(e2)}")
         
+        health = get_engine_health()
+        try:
+            success = self._convert(html_content, output_path, engine, orientation)
+        except Exception:
+            health.record_failure(engine)
+            raise
+        if success:
+            health.record_success(engine)
+        else:
+            health.record_failure(engine)
+        return success
+    
+    def _convert(self, html_content, output_path, engine, orientation):
+        """Convert HTML to PDF with the given engine"""
         # Generate PDF using selected engine
         if engine == "weasyprint" and WEASYPRINT_AVAILABLE:
             return self._generate_weasyprint(html_content, output_path, orientation)
@@ -284,10 +312,14 @@ def generate_pdf_with_fallback(template_name, data, output_path, orientation="po
     """
     generator = EnhancedPDFGenerator()
     
-    # Try engines in order of preference
+    health = get_engine_health()
+    
+    # Try engines in order of preference; known-bad engines are skipped silently
     for engine in generator.engines:
+        if not health.allow(engine):
+            continue
         try:
-            success = generator.generate_pdf(template_name, data, output_path, engine, orientation)
+            success = generator._generate_with_engine(template_name, data, output_path, engine, orientation)
             if success:
                 return engine
         except Exception as e:
@@ -1,26 +1,48 @@
 """
 Advanced export formats for the Stream Bill Generator
-This module provides XML and JSON export capabilities.
+This module provides XML, JSON and (when pyarrow is installed) Parquet export capabilities.
 """
-import json
+import os
+import uuid
 import xml.etree.ElementTree as ET
-from typing import Dict, Any, List
+from collections.abc import Iterator
+from datetime import datetime, timezone
+from typing import Dict, Any, List, IO, Optional
+from xml.sax.saxutils import XMLGenerator
 import pandas as pd
 
-def generate_json(data: Dict[str, Any], output_path: str) -> bool:
+from core.computations.bill_processor import safe_float
+from data import json_backend
+
+# Optional columnar export support
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    pa = None
+    pq = None
+    PYARROW_AVAILABLE = False
+
+def generate_json(data: Dict[str, Any], output_path: str, indent: bool = False) -> bool:
     """
     Generate JSON export of bill data
     
+    Keys are sorted so exports of the same bill are byte-identical; the
+    output is compact unless indent is requested.
+    
     Args:
         data (Dict[str, Any]): Bill data
         output_path (str): Path where JSON file should be saved
+        indent (bool): Pretty-print with two-space indentation
         
     Returns:
         bool: True if successful, False otherwise
     """
     try:
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False, default=str)
+        payload = json_backend.dumps(data, indent=indent)
+        with open(output_path, 'wb') as f:
+            f.write(payload)
         return True
     except Exception as e:
         print(f"Error generating JSON: {e}")
@@ -59,6 +81,44 @@ def dict_to_xml(tag: str, d: Dict[str, Any]) -> ET.Element:
             elem.append(child)
     return elem
 
+def _write_xml_element(writer: XMLGenerator, tag: str, value: Any) -> None:
+    """Write one value with the same element layout as dict_to_xml"""
+    writer.startElement(tag, {})
+    if isinstance(value, dict):
+        for key, val in value.items():
+            _write_xml_element(writer, key, val)
+    elif isinstance(value, (list, Iterator)):
+        for item in value:
+            if isinstance(item, dict):
+                _write_xml_element(writer, "item", item)
+            else:
+                writer.startElement("item", {})
+                writer.characters(str(item))
+                writer.endElement("item")
+    else:
+        writer.characters(str(value))
+    writer.endElement(tag)
+
+def write_xml_stream(tag: str, data: Dict[str, Any], stream: IO[bytes], encoding: str = "utf-8") -> None:
+    """
+    Stream bill data as XML without building an element tree
+    
+    Produces the same element layout as dict_to_xml. Elements are written as
+    they are visited, and lists may be replaced by iterators or generators
+    that yield items on demand, so memory use does not grow with the number
+    of items.
+    
+    Args:
+        tag (str): Root tag name
+        data (Dict[str, Any]): Dictionary to write
+        stream (IO[bytes]): Binary stream to write to
+        encoding (str): Output encoding
+    """
+    writer = XMLGenerator(stream, encoding=encoding, short_empty_elements=True)
+    writer.startDocument()
+    _write_xml_element(writer, tag, data)
+    writer.endDocument()
+
 def generate_xml(data: Dict[str, Any], output_path: str) -> bool:
     """
     Generate XML export of bill data
@@ -71,9 +131,8 @@ def generate_xml(data: Dict[str, Any], output_path: str) -> bool:
         bool: True if successful, False otherwise
     """
     try:
-        root = dict_to_xml("bill", data)
-        tree = ET.ElementTree(root)
-        tree.write(output_path, encoding='utf-8', xml_declaration=True)
+        with open(output_path, 'wb') as f:
+            write_xml_stream("bill", data, f)
         return True
     except Exception as e:
         print(f"Error generating XML: {e}")
@@ -217,6 +276,278 @@ def export_bill_data(first_page_data: Dict[str, Any],
     
     return generated_files
 
+# Typed columns per item kind: (name, "string" | "float")
+ITEM_FIELDS = {
+    "work_order": [
+        ("serial_no", "string"), ("description", "string"), ("unit", "string"),
+        ("quantity", "float"), ("rate", "float"), ("amount", "float"), ("remark", "string"),
+    ],
+    "extra_item": [
+        ("serial_no", "string"), ("description", "string"), ("unit", "string"),
+        ("quantity", "float"), ("rate", "float"), ("amount", "float"), ("remark", "string"),
+    ],
+    "deviation": [
+        ("serial_no", "string"), ("description", "string"), ("unit", "string"),
+        ("qty_wo", "float"), ("rate", "float"), ("amt_wo", "float"),
+        ("qty_bill", "float"), ("amt_bill", "float"),
+        ("excess_qty", "float"), ("excess_amt", "float"),
+        ("saving_qty", "float"), ("saving_amt", "float"), ("remark", "string"),
+    ],
+}
+
+# Bill-level columns repeated on every row so datasets can be partitioned and filtered
+BILL_FIELDS = [("bill_id", "string"), ("agreement_no", "string"), ("contractor", "string"), ("exported_at", "timestamp")]
+
+def _header_value(header: List[List[Any]], label: str) -> str:
+    """Find the value next to (or on the row below) a header label"""
+    for index, row in enumerate(header):
+        cells = [str(cell).strip() for cell in row if str(cell).strip()]
+        for position, cell in enumerate(cells):
+            if label.lower() in cell.lower():
+                if position + 1 < len(cells):
+                    return cells[position + 1]
+                for next_row in header[index + 1:]:
+                    values = [str(c).strip() for c in next_row if str(c).strip()]
+                    if values:
+                        return values[0]
+                return ""
+    return ""
+
+def bill_metadata(first_page_data: Dict[str, Any]) -> Dict[str, str]:
+    """
+    Extract bill identification fields from the first page header
+    
+    Args:
+        first_page_data (Dict[str, Any]): First page data
+        
+    Returns:
+        Dict[str, str]: agreement_no and contractor ('' when not found)
+    """
+    header = first_page_data.get("header", [])
+    return {
+        "agreement_no": _header_value(header, "Agreement No."),
+        "contractor": _header_value(header, "Name of Contractor"),
+    }
+
+def item_schema(kind: str) -> "pa.Schema":
+    """
+    Arrow schema for one item kind ("work_order", "extra_item" or "deviation")
+    
+    Args:
+        kind (str): Item kind
+        
+    Returns:
+        pa.Schema: Bill columns followed by the typed item columns
+    """
+    types = {"string": pa.string(), "float": pa.float64(), "timestamp": pa.timestamp("s", tz="UTC")}
+    return pa.schema([(name, types[type_name]) for name, type_name in BILL_FIELDS + ITEM_FIELDS[kind]])
+
+def create_item_tables(first_page_data: Dict[str, Any],
+                       deviation_data: Dict[str, Any],
+                       extra_items_data: Dict[str, Any],
+                       bill_id: Optional[str] = None) -> Dict[str, "pa.Table"]:
+    """
+    Build one typed Arrow table per item kind
+    
+    Unlike create_bill_dataframe, each kind keeps its own columns, numbers
+    are stored as float64 (blank cells become nulls) and text as strings.
+    
+    Args:
+        first_page_data (Dict[str, Any]): First page data
+        deviation_data (Dict[str, Any]): Deviation statement data
+        extra_items_data (Dict[str, Any]): Extra items data
+        bill_id (Optional[str]): Identifier stored on every row (random if omitted)
+        
+    Returns:
+        Dict[str, pa.Table]: Tables keyed by item kind
+    """
+    if not PYARROW_AVAILABLE:
+        raise ImportError("pyarrow is required for Parquet export")
+    
+    metadata = bill_metadata(first_page_data)
+    bill_values = {
+        "bill_id": bill_id or uuid.uuid4().hex,
+        "agreement_no": metadata["agreement_no"],
+        "contractor": metadata["contractor"],
+        "exported_at": datetime.now(timezone.utc).replace(microsecond=0),
+    }
+    sources = {
+        "work_order": [item for item in first_page_data.get("items", []) if not item.get("is_divider", False)],
+        "extra_item": extra_items_data.get("items", []),
+        "deviation": deviation_data.get("items", []),
+    }
+    
+    tables = {}
+    for kind, items in sources.items():
+        schema = item_schema(kind)
+        columns = []
+        for name, _ in BILL_FIELDS:
+            columns.append(pa.array([bill_values[name]] * len(items), type=schema.field(name).type))
+        for name, field_type in ITEM_FIELDS[kind]:
+            if field_type == "float":
+                values = [safe_float(item.get(name), None) for item in items]
+                columns.append(pa.array(values, type=pa.float64(), from_pandas=True))
+            else:
+                columns.append(pa.array([str(item.get(name, "")) for item in items], type=pa.string()))
+        tables[kind] = pa.Table.from_arrays(columns, schema=schema)
+    return tables
+
+def export_to_parquet(first_page_data: Dict[str, Any],
+                      deviation_data: Dict[str, Any],
+                      extra_items_data: Dict[str, Any],
+                      output_dir: str) -> List[str]:
+    """
+    Export bill line items to one Parquet file per item kind
+    (bill_work_orders.parquet, bill_extra_items.parquet, bill_deviations.parquet)
+    
+    Args:
+        first_page_data (Dict[str, Any]): First page data
+        deviation_data (Dict[str, Any]): Deviation statement data
+        extra_items_data (Dict[str, Any]): Extra items data
+        output_dir (str): Directory where files should be saved
+        
+    Returns:
+        List[str]: Paths of the generated files (empty on failure)
+    """
+    try:
+        tables = create_item_tables(first_page_data, deviation_data, extra_items_data)
+        paths = []
+        for kind, table in tables.items():
+            path = os.path.join(output_dir, f"bill_{kind}s.parquet")
+            pq.write_table(table, path)
+            paths.append(path)
+        return paths
+    except Exception as e:
+        print(f"Error exporting to Parquet: {e}")
+        return []
+
+def write_item_tables(tables: Dict[str, "pa.Table"],
+                      bill_id: str,
+                      dataset_dir: str,
+                      partition_by: str = "agreement_no") -> None:
+    """
+    Append item tables from create_item_tables to a partitioned Parquet dataset
+    
+    Args:
+        tables (Dict[str, pa.Table]): Tables keyed by item kind
+        bill_id (str): Bill identifier used in the file names
+        dataset_dir (str): Root directory of the dataset
+        partition_by (str): Partition column ("agreement_no" or "contractor")
+    """
+    for kind, table in tables.items():
+        if table.num_rows == 0:
+            continue
+        pq.write_to_dataset(
+            table,
+            root_path=os.path.join(dataset_dir, kind),
+            partition_cols=[partition_by],
+            basename_template=f"{bill_id}-{{i}}.parquet",
+        )
+
+def write_parquet_dataset(first_page_data: Dict[str, Any],
+                          deviation_data: Dict[str, Any],
+                          extra_items_data: Dict[str, Any],
+                          dataset_dir: str,
+                          partition_by: str = "agreement_no") -> bool:
+    """
+    Append a bill's line items to a partitioned Parquet dataset
+    
+    Creates <dataset_dir>/<kind>/<partition_by>=<value>/<bill_id>-0.parquet,
+    so successive batch runs add files next to earlier ones and the dataset
+    can be scanned with pyarrow.dataset, DuckDB, Spark, etc.
+    
+    Args:
+        first_page_data (Dict[str, Any]): First page data
+        deviation_data (Dict[str, Any]): Deviation statement data
+        extra_items_data (Dict[str, Any]): Extra items data
+        dataset_dir (str): Root directory of the dataset
+        partition_by (str): Partition column ("agreement_no" or "contractor")
+        
+    Returns:
+        bool: True if successful, False otherwise
+    """
+    try:
+        bill_id = uuid.uuid4().hex
+        tables = create_item_tables(first_page_data, deviation_data, extra_items_data, bill_id=bill_id)
+        write_item_tables(tables, bill_id, dataset_dir, partition_by)
+        return True
+    except Exception as e:
+        print(f"Error writing Parquet dataset: {e}")
+        return False
+
+def share_item_tables(first_page_data: Dict[str, Any],
+                      deviation_data: Dict[str, Any],
+                      extra_items_data: Dict[str, Any]) -> "SharedTables":
+    """
+    Publish a bill's item tables in shared memory for another process
+    
+    The receiver reads them with data.shared_tables.attach_tables and finds
+    the bill id in handle.metadata["bill_id"].
+    
+    Args:
+        first_page_data (Dict[str, Any]): First page data
+        deviation_data (Dict[str, Any]): Deviation statement data
+        extra_items_data (Dict[str, Any]): Extra items data
+        
+    Returns:
+        SharedTables: Owner of the segment (close() it, or release() the handle)
+    """
+    from data.shared_tables import SharedTables
+    
+    bill_id = uuid.uuid4().hex
+    tables = create_item_tables(first_page_data, deviation_data, extra_items_data, bill_id=bill_id)
+    return SharedTables(tables, metadata={"bill_id": bill_id})
+
+def lazy_bill_data_exports(first_page_data: Dict[str, Any],
+                           last_page_data: Dict[str, Any],
+                           deviation_data: Dict[str, Any],
+                           extra_items_data: Dict[str, Any],
+                           note_sheet_data: Dict[str, Any],
+                           output_dir: str) -> List[Any]:
+    """
+    Describe the JSON, XML and CSV exports as independent lazy artifacts
+    
+    Same outputs as export_bill_data, but each format is a separate
+    LazyArtifact so it can be built concurrently with the other documents.
+    A format that fails to export builds to None and is left out of archives.
+    
+    Args:
+        first_page_data (Dict[str, Any]): First page data
+        last_page_data (Dict[str, Any]): Last page data
+        deviation_data (Dict[str, Any]): Deviation statement data
+        extra_items_data (Dict[str, Any]): Extra items data
+        note_sheet_data (Dict[str, Any]): Note sheet data
+        output_dir (str): Directory where files should be saved
+        
+    Returns:
+        List[LazyArtifact]: JSON, XML and CSV artifacts
+    """
+    import os
+    from exports.renderers import LazyArtifact
+    
+    all_data = {
+        "first_page": first_page_data,
+        "last_page": last_page_data,
+        "deviation_statement": deviation_data,
+        "extra_items": extra_items_data,
+        "note_sheet": note_sheet_data
+    }
+    json_path = os.path.join(output_dir, "bill_data.json")
+    xml_path = os.path.join(output_dir, "bill_data.xml")
+    csv_path = os.path.join(output_dir, "bill_data.csv")
+    
+    return [
+        LazyArtifact("bill_data.json",
+                     lambda: json_path if generate_json(all_data, json_path) else None,
+                     mime="application/json"),
+        LazyArtifact("bill_data.xml",
+                     lambda: xml_path if generate_xml(all_data, xml_path) else None,
+                     mime="application/xml"),
+        LazyArtifact("bill_data.csv",
+                     lambda: csv_path if export_to_csv(first_page_data, deviation_data, extra_items_data, csv_path) else None,
+                     mime="text/csv"),
+    ]
+
 if __name__ == "__main__":
     # Example usage
     sample_data = {
@@ -0,0 +1,134 @@
+"""
+Cached DOCX skeletons for the certificate sheets
+
+Certificate II and III are almost entirely fixed boilerplate. Each skeleton
+is built once with ``{field}`` placeholders, saved and cached as bytes. Per
+bill only the runs holding placeholders are rewritten, so generating these
+sheets no longer depends on re-creating the heading, table and paragraphs.
+"""
+
+import io
+import threading
+
+from docx import Document
+from docx.oxml.ns import qn
+
+from exports.docx_tables import add_table
+
+_SKELETONS = {}
+_SKELETONS_LOCK = threading.Lock()
+
+
+def _build_certificate_ii(doc):
+    doc.add_heading("II. CERTIFICATE AND SIGNATURES", level=1)
+
+    doc.add_paragraph("The measurements on which are based the entries in columns 1 to 6 of Account I, were made by {measurement_officer} on {measurement_date}, and are recorded at page {measurement_book_page} of Measurement Book No. {measurement_book_no}.")
+
+    doc.add_paragraph("*Certified that in addition to and quite apart from the quantities of work actually executed, as shown in column 4 of Account I, some work has actually been done in connection with several items and the value of such work (after deduction therefrom the proportionate amount of secured advances, if any, ultimately recoverable on account of the quantities of materials used therein) is in no case, less than the advance payments as per item 2 of the Memorandum, if payment is made.")
+
+    doc.add_paragraph("+Certified that the contractor has made satisfactory progress with the work, and that the quantities and amounts claimed are correct and the work has been executed in accordance with the specifications and the terms of the contract.")
+
+    doc.add_paragraph("I also certify that the amount claimed is not more than the amount admissible under the contract.")
+
+    # Signature blocks
+    doc.add_paragraph("\nDated signature of officer preparing the bill")
+    doc.add_paragraph("Name: {officer_name}")
+    doc.add_paragraph("Designation: {officer_designation}")
+    doc.add_paragraph("Date: {bill_date}")
+
+    doc.add_paragraph("\n+Dated signature of officer authorising payment")
+    doc.add_paragraph("Name: {authorising_officer_name}")
+    doc.add_paragraph("Designation: {authorising_officer_designation}")
+    doc.add_paragraph("Date: {authorisation_date}")
+
+
+def _build_certificate_iii(doc):
+    doc.add_heading("III. MEMORANDUM OF PAYMENTS", level=1)
+
+    rows = [
+        ["S.No.", "Description", "Entry No.", "Amount Rs."],
+        ["1.", "Total value of work actually measured, as per Account I, Col. 5, Entry [A]", "[A]", "{grand_total}"],
+        ["2.", "Total up-to-date advance payments for work not yet measured as per details given below:", "", ""],
+        ["", "(a) Total as per previous bill", "[B]", "Nil"],
+        ["", "(b) Since previous bill", "[D]", "Nil"],
+        ["3.", "Total up-to-date secured advances on security of materials", "[C]", "Nil"],
+        ["4.", "Total (Items 1 + 2 + 3) A+B+C", "", "{grand_total}"],
+        ["5.", "Deduct: Amount withheld", "", ""],
+        ["", "(a) From previous bill as per last Running Account Bill", "[5]", "Nil"],
+        ["", "(b) From this bill", "", "Nil"],
+        ["6.", 'Balance i.e. "up-to-date" payments (Item 4-5)', "", "{grand_total}"],
+        ["7.", "Total amount of payments already made as per Entry (K)", "[K]", "0"],
+        ["8.", "Payments now to be made, as detailed below:", "", "{payable}"],
+        ["", "(a) By recovery of amounts creditable to this work", "[a]", ""],
+        ["", "SD @ 10%", "", "{sd}"],
+        ["", "IT @ 2%", "", "{it}"],
+        ["", "GST @ 2%", "", "{gst}"],
+        ["", "LC @ 1%", "", "{lc}"],
+        ["", "Total recovery", "", "{total_recovery}"],
+        ["", "(b) By recovery of amount creditable to other works", "[b]", "Nil"],
+        ["", "(c) By cheque", "[c]", "{cheque}"],
+    ]
+    rows.extend([[]] * 4)
+    add_table(doc, rows, cols=4)
+
+    # Payment details
+    doc.add_paragraph("\nPay Rs. {cheque}")
+    doc.add_paragraph("Pay Rupees {payable_words} (by cheque)")
+    doc.add_paragraph("Dated the ____ / ____ / ________")
+    doc.add_paragraph("Dated initials of Disbursing Officer: _______________")
+    doc.add_paragraph("\nReceived Rupees {payable_words} (by cheque) as per above memorandum, on account of this bill")
+    doc.add_paragraph("Signature of Contractor: _______________")
+    doc.add_paragraph("\nPaid by me, vide cheque No. _______ dated ____ / ____ / ________")
+    doc.add_paragraph("Dated initials of person actually making the payment: _______________")
+
+
+_BUILDERS = {
+    "Certificate II": _build_certificate_ii,
+    "Certificate III": _build_certificate_iii,
+}
+
+
+def has_skeleton(sheet_name):
+    """Return True when the sheet is generated from a cached skeleton"""
+    return sheet_name in _BUILDERS
+
+
+def get_skeleton_bytes(sheet_name):
+    """
+    Return the saved skeleton document for a sheet, building it on first use
+
+    Args:
+        sheet_name (str): "Certificate II" or "Certificate III"
+
+    Returns:
+        bytes: DOCX file content with ``{field}`` placeholders
+    """
+    skeleton = _SKELETONS.get(sheet_name)
+    if skeleton is None:
+        with _SKELETONS_LOCK:
+            skeleton = _SKELETONS.get(sheet_name)
+            if skeleton is None:
+                doc = Document()
+                _BUILDERS[sheet_name](doc)
+                buffer = io.BytesIO()
+                doc.save(buffer)
+                skeleton = buffer.getvalue()
+                _SKELETONS[sheet_name] = skeleton
+    return skeleton
+
+
+def fill_skeleton(sheet_name, values, doc_path):
+    """
+    Write a certificate document by patching its cached skeleton
+
+    Args:
+        sheet_name (str): "Certificate II" or "Certificate III"
+        values (dict): Placeholder values
+        doc_path (str): Path where to save the document
+    """
+    doc = Document(io.BytesIO(get_skeleton_bytes(sheet_name)))
+    for run in doc.element.body.iter(qn("w:r")):
+        text = run.text
+        if "{" in text:
+            run.text = text.format_map(values)
+    doc.save(doc_path)
@@ -0,0 +1,44 @@
+"""
+Bulk table writer for python-docx documents
+
+python-docx locates rows and cells with XPath on every ``table.rows[i]`` /
+``row.cells`` access, so filling a table cell by cell is quadratic in the
+number of rows. This module builds the rows directly in lxml from a template
+row instead, producing the same XML as assigning ``cell.text`` one cell at a
+time.
+"""
+
+from copy import deepcopy
+
+
+def add_table(doc, rows, cols, style="Table Grid"):
+    """
+    Append a table to the document and fill it in a single pass
+
+    Args:
+        doc: python-docx Document
+        rows (iterable): Row values; each row is a sequence of up to ``cols``
+            cell values. ``None`` leaves the cell empty, anything else is
+            written with ``str()`` exactly like ``cell.text = str(value)``.
+        cols (int): Number of columns
+        style (str): Table style name
+
+    Returns:
+        docx.table.Table: The populated table
+    """
+    table = doc.add_table(rows=1, cols=cols)
+    table.style = style
+
+    tbl = table._tbl
+    template = tbl.tr_lst[0]
+    tbl.remove(template)
+
+    for values in rows:
+        tr = deepcopy(template)
+        for tc, value in zip(tr.tc_lst, values):
+            if value is None:
+                continue
+            tc.p_lst[0].add_r().text = str(value)
+        tbl.append(tr)
+
+    return table
@@ -0,0 +1,371 @@
+"""
+Stamped PDF rendering for the certificate sheets
+
+Certificate II and III are fixed statutory text with a few variable fields,
+yet the HTML path lays them out in full for every bill. Here the static layer
+of each certificate (heading, wording, table rules, captions) is drawn once
+with ReportLab and cached as PDF bytes together with the position of every
+field. Per bill only a small overlay holding the field values is drawn and
+merged onto the cached page with pypdf, which takes a few milliseconds.
+
+The layout is drawn by hand after templates/certificate_ii.html and
+certificate_iii.html, so template edits do not reach it and it does not match
+the HTML render exactly. Stamping is therefore off unless
+pdf.stamp_certificates is set, until a visual diff against the HTML render
+keeps the two in step. Both layers use the standard PDF fonts, so values they
+cannot show raise ValueError and are left to the HTML renderer.
+"""
+
+import io
+import threading
+from typing import NamedTuple
+from xml.sax.saxutils import escape
+
+from reportlab.lib.colors import HexColor
+from reportlab.lib.enums import TA_CENTER, TA_JUSTIFY, TA_LEFT, TA_RIGHT
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import ParagraphStyle
+from reportlab.lib.units import mm
+from reportlab.pdfgen import canvas as pdf_canvas
+from reportlab.platypus import KeepInFrame, Paragraph
+
+PAGE_WIDTH, PAGE_HEIGHT = A4
+
+# The templates' .container: 188mm wide, 10mm from the top, 11mm from the left
+LEFT = 11 * mm
+TOP = PAGE_HEIGHT - 10 * mm
+WIDTH = 188 * mm
+
+# CSS pixels in points
+PX = 0.75
+
+_STATIC_LAYERS = {}
+_STATIC_LAYERS_LOCK = threading.Lock()
+
+
+class Slot(NamedTuple):
+    """Box on the static page that the overlay fills with a field"""
+    text: str  # Paragraph markup with {field} placeholders
+    x: float
+    top: float
+    width: float
+    height: float
+    style: ParagraphStyle
+
+
+def _style(name, font, size, leading, align=TA_LEFT, color="#1a1a1a"):
+    return ParagraphStyle(name, fontName=font, fontSize=size, leading=leading,
+                          alignment=align, textColor=HexColor(color))
+
+
+class _Page:
+    """Top-down layout cursor that draws static text and records field slots"""
+
+    def __init__(self, canvas):
+        self.canvas = canvas
+        self.y = TOP
+        self.slots = []
+
+    def text(self, markup, style, x=LEFT, width=WIDTH):
+        """Draw static markup at the cursor and move below it"""
+        paragraph = Paragraph(markup, style)
+        _, height = paragraph.wrap(width, PAGE_HEIGHT)
+        paragraph.drawOn(self.canvas, x, self.y - height)
+        self.y -= height
+
+    def slot(self, markup, style, lines=1, x=LEFT, width=WIDTH):
+        """Reserve lines of style at the cursor for markup with placeholders"""
+        height = lines * style.leading
+        self.slots.append(Slot(markup, x, self.y, width, height, style))
+        self.y -= height
+
+    def space(self, points):
+        self.y -= points
+
+    def heading(self, title, font):
+        self.text(escape(title), _style("heading", font, 16, 19.2, TA_CENTER, "#2c3e50"))
+
+
+def _height(markup, style, width):
+    return Paragraph(markup, style).wrap(width, PAGE_HEIGHT)[1]
+
+
+def _build_certificate_ii(page):
+    body = _style("body", "Times-Roman", 11, 17.6, TA_JUSTIFY)
+    note = _style("note", "Times-Italic", 9, 13.5, color="#666666")
+    caption = _style("caption", "Times-Italic", 11, 16.5, TA_RIGHT)
+    officer = _style("officer", "Times-Bold", 11, 16.5, TA_RIGHT)
+    c = page.canvas
+
+    page.heading("II. CERTIFICATE AND SIGNATURES", "Times-Bold")
+    page.space(10 * PX)
+    c.setStrokeColor(HexColor("#2c3e50"))
+    c.setLineWidth(2 * PX)
+    c.line(LEFT, page.y, LEFT + WIDTH, page.y)
+    page.space(20 * PX)
+
+    def highlight(text):
+        return f'<font name="Times-Bold" color="#1565c0">{text}</font>'
+
+    measurements = (
+        f"The measurements on which are based the entries in columns 1 to 6 of Account I, were made by "
+        f"{highlight('{measurement_officer}')} on {highlight('{measurement_date}')}, and are recorded at page "
+        f"{highlight('{measurement_book_page}')} of Measurement Book No. {highlight('{measurement_book_no}')}."
+    )
+    statements = [
+        f"{highlight('*Certified')} that in addition to and quite apart from the quantities of work actually "
+        "executed, as shown in column 4 of Account I, some work has actually been done in connection with "
+        "several items and the value of such work (after deduction therefrom the proportionate amount of "
+        "secured advances, if any, ultimately recoverable on account of the quantities of materials used "
+        "therein) is in no case, less than the advance payments as per item 2 of the Memorandum, if payment "
+        "is made.",
+        f"{highlight('+Certified')} that the contractor has made satisfactory progress with the work, and that "
+        "the quantities and amounts claimed are correct and the work has been executed in accordance with the "
+        "specifications and the terms of the contract.",
+        "I also certify that the amount claimed is not more than the amount admissible under the contract.",
+    ]
+    notes = "* Strike out if not applicable<br/>+ Strike out if not applicable"
+
+    # The section box is painted first, so measure its contents before drawing them
+    padding = 15 * PX
+    inner_x, inner_width = LEFT + padding, WIDTH - 2 * padding
+    measurement_lines = 4
+    gap = 15 * PX
+    inner_height = (measurement_lines * body.leading + gap
+                    + sum(_height(text, body, inner_width) + gap for text in statements)
+                    + 5 * PX + _height(notes, note, inner_width))
+
+    page.space(20 * PX)
+    c.setStrokeColor(HexColor("#cccccc"))
+    c.setFillColor(HexColor("#f9f9f9"))
+    c.setLineWidth(PX)
+    c.roundRect(LEFT, page.y - inner_height - 2 * padding, WIDTH, inner_height + 2 * padding,
+                5 * PX, stroke=1, fill=1)
+
+    page.space(padding)
+    page.slot(measurements, body, lines=measurement_lines, x=inner_x, width=inner_width)
+    page.space(gap)
+    for text in statements:
+        page.text(text, body, x=inner_x, width=inner_width)
+        page.space(gap)
+    page.space(5 * PX)
+    page.text(notes, note, x=inner_x, width=inner_width)
+    page.space(padding + 20 * PX)
+
+    # Signature blocks are right aligned with 20px of padding
+    width = WIDTH - 20 * PX
+    for title, fields in (
+        ("Dated signature of officer preparing the bill",
+         ("{officer_name}", "{officer_designation}", "Date: {bill_date}")),
+        ("+Dated signature of officer authorising payment",
+         ("{authorising_officer_name}", "{authorising_officer_designation}", "Date: {authorisation_date}")),
+    ):
+        page.space(30 * PX + 8 * PX)
+        page.text(escape(title), caption, width=width)
+        page.space(8 * PX + 15 * PX)
+        for field in fields:
+            page.space(5 * PX)
+            page.slot(field, officer, width=width)
+            page.space(5 * PX)
+
+
+# S.No., description, entry, amount, row class, description indent (px)
+_MEMORANDUM_ROWS = [
+    ("1.", "Total value of work actually measured, as per Account I, Col. 5, Entry [A]", "[A]", "{grand_total}", "", 0),
+    ("2.", "Total up-to-date advance payments for work not yet measured as per details given below:", "", "", "", 0),
+    ("", "(a) Total as per previous bill", "[B]", "Nil", "", 20),
+    ("", "(b) Since previous bill", "[D]", "Nil", "", 20),
+    ("3.", "Total up-to-date secured advances on security of materials", "[C]", "Nil", "", 0),
+    ("4.", "<b>Total (Items 1 + 2 + 3) A+B+C</b>", "", "{grand_total}", "total", 0),
+    ("5.", "Deduct: Amount withheld", "", "", "", 0),
+    ("", "(a) From previous bill as per last Running Account Bill", "[5]", "Nil", "", 20),
+    ("", "(b) From this bill", "", "Nil", "", 20),
+    ("6.", '<b>Balance i.e. "up-to-date" payments (Item 4-5)</b>', "", "{grand_total}", "total", 0),
+    ("7.", "Total amount of payments already made as per Entry (K)", "[K]", "0", "", 0),
+    ("8.", "<b>Payments now to be made, as detailed below:</b>", "", "{payable}", "total", 0),
+    ("", "(a) By recovery of amounts creditable to this work", "[a]", "", "", 20),
+    ("", "SD @ 10%", "", "{sd}", "deduction", 30),
+    ("", "IT @ 2%", "", "{it}", "deduction", 30),
+    ("", "GST @ 2%", "", "{gst}", "deduction", 30),
+    ("", "LC @ 1%", "", "{lc}", "deduction", 30),
+    ("", "<b>Total recovery</b>", "", "{total_recovery}", "deduction", 20),
+    ("", "(b) By recovery of amount creditable to other works", "[b]", "Nil", "", 20),
+    ("", "<b>(c) By cheque</b>", "[c]", "{cheque}", "final", 20),
+]
+
+_ROW_COLORS = {"total": "#fff3e0", "deduction": "#ffebee", "final": "#e8f5e8"}
+
+
+def _build_certificate_iii(page):
+    cell = _style("cell", "Helvetica", 10, 12)
+    header = _style("header", "Helvetica-Bold", 10, 12, TA_CENTER, "#2c3e50")
+    amount = _style("amount", "Helvetica-Bold", 10, 12, TA_RIGHT, "#1565c0")
+    details = _style("details", "Helvetica", 10, 18, TA_CENTER)
+    c = page.canvas
+
+    page.heading("III. MEMORANDUM OF PAYMENTS", "Helvetica-Bold")
+    page.space(15 * PX + 10 * PX)
+
+    padding = 5 * PX
+    widths = [WIDTH * share for share in (0.08, 0.52, 0.15, 0.25)]
+    edges = [LEFT]
+    for width in widths:
+        edges.append(edges[-1] + width)
+
+    c.setStrokeColor(HexColor("#2c3e50"))
+    c.setLineWidth(PX)
+    rows = [("S.No.", "Description", "Entry No.", "Amount Rs.", "header", 0)] + _MEMORANDUM_ROWS
+    for sno, description, entry, value, kind, indent in rows:
+        if kind == "header":
+            cells = [(escape(text), header, 0) for text in (sno, description, entry, value)]
+        else:
+            cells = [(sno, cell, 0), (description, cell, (indent or 5) * PX), (entry, cell, 0), (value, amount, 0)]
+        height = 2 * padding + max(
+            _height(text, style, widths[i] - 2 * padding - inset) if text else style.leading
+            for i, (text, style, inset) in enumerate(cells)
+        )
+        fill = {"header": "#f8f9fa"}.get(kind) or _ROW_COLORS.get(kind)
+        if fill:
+            c.setFillColor(HexColor(fill))
+        for i in range(4):
+            c.rect(edges[i], page.y - height, widths[i], height, stroke=1, fill=1 if fill else 0)
+
+        top = page.y
+        for i, (text, style, inset) in enumerate(cells):
+            if not text:
+                continue
+            x, width = edges[i] + padding + inset, widths[i] - 2 * padding - inset
+            page.y = top - padding
+            if "{" in text:
+                page.slot(text, style, x=x, width=width)
+            else:
+                page.text(text, style, x=x, width=width)
+        page.y = top - height
+
+    page.space(10 * PX + 20 * PX)
+    lines = [
+        ("<b>Pay Rs. {cheque}</b>", 1, 0),
+        ("<b>Pay Rupees {payable_words} (by cheque)</b>", 2, 0),
+        ("Dated the ____ / ____ / ________", 0, 0),
+        ("Dated initials of Disbursing Officer: _______________", 0, 0),
+        ("Received Rupees {payable_words} (by cheque) as per above memorandum, on account of this bill", 2, 20),
+        ("Signature of Contractor: _______________", 0, 0),
+        ("Paid by me, vide cheque No. _______ dated ____ / ____ / ________", 0, 20),
+        ("Dated initials of person actually making the payment: _______________", 0, 0),
+    ]
+    for markup, slot_lines, margin in lines:
+        page.space(max(margin, 8) * PX)
+        if slot_lines:
+            page.slot(markup, details, lines=slot_lines)
+        else:
+            page.text(markup, details)
+        page.space(8 * PX)
+
+
+_BUILDERS = {
+    "Certificate II": _build_certificate_ii,
+    "Certificate III": _build_certificate_iii,
+}
+
+
+def has_stamp(sheet_name):
+    """Return True when the sheet can be rendered by stamping a cached page"""
+    return sheet_name in _BUILDERS
+
+
+def get_static_layer(sheet_name):
+    """
+    Return the static page of a certificate, drawing it on first use
+
+    Args:
+        sheet_name (str): "Certificate II" or "Certificate III"
+
+    Returns:
+        tuple: (PDF bytes, list of Slot) for the sheet
+    """
+    layer = _STATIC_LAYERS.get(sheet_name)
+    if layer is None:
+        with _STATIC_LAYERS_LOCK:
+            layer = _STATIC_LAYERS.get(sheet_name)
+            if layer is None:
+                buffer = io.BytesIO()
+                canvas = pdf_canvas.Canvas(buffer, pagesize=A4)
+                canvas.setTitle(sheet_name)
+                # As a form XObject the page content is one operator, so
+                # stamping does not re-parse the static drawing
+                canvas.beginForm("static")
+                page = _Page(canvas)
+                _BUILDERS[sheet_name](page)
+                canvas.endForm()
+                canvas.doForm("static")
+                canvas.showPage()
+                canvas.save()
+                layer = _STATIC_LAYERS[sheet_name] = (buffer.getvalue(), page.slots)
+    return layer
+
+
+def _field_values(values):
+    """Escape field values for Paragraph markup, rejecting text the standard fonts lack"""
+    escaped = {}
+    for name, value in values.items():
+        text = str(value)
+        try:
+            text.encode("cp1252")
+        except UnicodeEncodeError:
+            raise ValueError(f"{name} needs glyphs outside the standard PDF fonts")
+        escaped[name] = escape(text)
+    return escaped
+
+
+def draw_overlay(sheet_name, values):
+    """
+    Draw the variable fields of a certificate on an otherwise empty page
+
+    Args:
+        sheet_name (str): "Certificate II" or "Certificate III"
+        values (dict): Field values (see exports.view_models)
+
+    Returns:
+        bytes: One-page PDF holding only the field values
+    """
+    _, slots = get_static_layer(sheet_name)
+    fields = _field_values(values)
+    buffer = io.BytesIO()
+    canvas = pdf_canvas.Canvas(buffer, pagesize=A4)
+    # pypdf parses the content of a stamped page; keep it to one operator
+    canvas.beginForm("overlay")
+    for slot in slots:
+        flowable = Paragraph(slot.text.format_map(fields), slot.style)
+        _, height = flowable.wrapOn(canvas, slot.width, slot.height)
+        if height > slot.height:
+            # Long names or amounts in words shrink to fit their box
+            flowable = KeepInFrame(slot.width, slot.height, [flowable], mode="shrink")
+            _, height = flowable.wrapOn(canvas, slot.width, slot.height)
+        flowable.drawOn(canvas, slot.x, slot.top - height)
+    canvas.endForm()
+    canvas.doForm("overlay")
+    canvas.showPage()
+    canvas.save()
+    return buffer.getvalue()
+
+
+def stamp_certificate(sheet_name, values, pdf_path):
+    """
+    Write a certificate PDF by stamping its field overlay onto the cached page
+
+    Args:
+        sheet_name (str): "Certificate II" or "Certificate III"
+        values (dict): Field values (see exports.view_models)
+        pdf_path (str): Path where to save the PDF
+
+    Raises:
+        ValueError: When a value cannot be shown with the standard PDF fonts
+    """
+    from pypdf import PdfReader, PdfWriter
+
+    static_pdf, _ = get_static_layer(sheet_name)
+    overlay = PdfReader(io.BytesIO(draw_overlay(sheet_name, values))).pages[0]
+    writer = PdfWriter(clone_from=PdfReader(io.BytesIO(static_pdf)))
+    writer.pages[0].merge_page(overlay)
+    with open(pdf_path, "wb") as f:
+        writer.write(f)
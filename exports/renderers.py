@@ -3,47 +3,199 @@ Export renderers for generating PDF, Word, and other document formats
 This module handles the output generation while preserving the core computation logic.
 
 Foolproof PDF generation flow:
-- Render HTML via Jinja2
+- Render HTML via Jinja2 from precomputed view models (see exports.view_models)
 - Generate PDF via a unified engine with intelligent fallbacks
 - Optional in-memory caching to reduce repeated conversions
+- Optional lazy artifacts so files are only built when first requested, with
+  independent artifacts built concurrently in dependency order (sheet PDFs
+  one at a time)
+- Paginated rendering for very large deviation statements (bounded memory)
+- Certificates optionally stamped onto a cached static page (see exports.pdf_stamps)
 """
 
 import os
 import tempfile
-import json
-import hashlib
-from jinja2 import Environment, FileSystemLoader
-from docx import Document
-from pypdf import PdfReader, PdfWriter
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from itertools import islice
 import zipfile
 
+from config.settings import get_setting
+from data.json_backend import stable_hash
+
+# jinja2, python-docx, pypdf and the view models (which pull in pandas) are
+# imported by the functions that use them, so importing this module stays cheap
+
 # Unified PDF generator with fallbacks (weasyprint/reportlab/xhtml2pdf/pdfkit)
 try:
     from core.pdf_generator_optimized import PDFGenerator
 except Exception:  # Fallback for legacy path
     from pdf_generator_optimized import PDFGenerator  # type: ignore
 
-# Lightweight in-memory cache (falls back silently if unavailable)
+# Shared cache and single-flight group (fall back silently if unavailable)
 try:
     from data.cache_utils import get_cache
-    _CACHE = get_cache()
+    from data.single_flight import get_single_flight
+    _SINGLE_FLIGHT = get_single_flight()
 except Exception:
-    _CACHE = None
+    get_cache = None
+    _SINGLE_FLIGHT = None
+
+
+def _shared_cache():
+    """The shared cache, created on first render rather than at import; None if unavailable"""
+    if get_cache is None:
+        return None
+    try:
+        return get_cache()
+    except Exception:
+        return None
+
+
+# Compiled template code by Jinja bucket key; shared by every environment in the process
+_TEMPLATE_BYTECODE = {}
+_BYTECODE_CACHE = None
+
+
+def _template_bytecode_cache():
+    global _BYTECODE_CACHE
+    if _BYTECODE_CACHE is None:
+        from jinja2 import BytecodeCache
+
+        class _MemoryBytecodeCache(BytecodeCache):
+            # Buckets check the template source checksum, so edits still recompile
+            def load_bytecode(self, bucket):
+                code = _TEMPLATE_BYTECODE.get(bucket.key)
+                if code is not None:
+                    bucket.bytecode_from_string(code)
+
+            def dump_bytecode(self, bucket):
+                _TEMPLATE_BYTECODE[bucket.key] = bucket.bytecode_to_string()
+
+        _BYTECODE_CACHE = _MemoryBytecodeCache()
+    return _BYTECODE_CACHE
 
 
 def setup_jinja_environment(template_dir):
     """Set up Jinja2 environment with the specified template directory"""
-    # Keep no template cache to match existing test behavior
-    return Environment(loader=FileSystemLoader(template_dir), cache_size=0)
+    from jinja2 import Environment, FileSystemLoader
+
+    # Keep no template cache to match existing test behavior; compiled code is
+    # reused through the bytecode cache while the template source is unchanged
+    return Environment(loader=FileSystemLoader(template_dir), cache_size=0,
+                       bytecode_cache=_template_bytecode_cache())
 
 
 def _hash_dict_stable(data: dict) -> str:
     """Create a stable hash for dictionaries (handles nested structures)."""
+    return stable_hash(data)
+
+
+# Deviation statements above this many rows are rendered page by page
+DEVIATION_STREAMING_THRESHOLD = 500
+DEVIATION_ROWS_PER_PAGE = 30
+DEVIATION_PAGES_PER_BATCH = 20
+
+
+def _deviation_statement_parts(template_dir):
+    """Load the macros shared by the deviation statement templates."""
+    env = setup_jinja_environment(template_dir)
+    return env.get_template("deviation_statement_parts.html").module
+
+
+def _iter_deviation_pages(parts, data, rows_per_page):
+    from exports.view_models import build_view_model
+
+    view = build_view_model("Deviation Statement", data)
+    summary = data.get("summary", {})
+    items = data.get("items", [])
+    last_start = max(len(items) - 1, 0) // rows_per_page * rows_per_page
+    for start in range(0, last_start + 1, rows_per_page):
+        page_items = items[start:start + rows_per_page]
+        yield str(parts.page(page_items, view, summary, start == last_start))
+
+
+def iter_deviation_statement_pages(data, template_dir, rows_per_page=DEVIATION_ROWS_PER_PAGE):
+    """
+    Render the deviation statement as a generator of page-sized HTML fragments
+
+    Each fragment is a complete table with its own header row; the summary
+    rows are appended to the last fragment only.
+
+    Args:
+        data (dict): Deviation statement data
+        template_dir (str): Directory containing templates
+        rows_per_page (int): Item rows per fragment
+
+    Yields:
+        str: HTML table fragment for one page
+    """
+    parts = _deviation_statement_parts(template_dir)
+    yield from _iter_deviation_pages(parts, data, rows_per_page)
+
+
+def iter_deviation_statement_documents(data, template_dir, rows_per_page=DEVIATION_ROWS_PER_PAGE,
+                                       pages_per_batch=DEVIATION_PAGES_PER_BATCH):
+    """
+    Group deviation statement pages into standalone HTML documents
+
+    Only one batch of pages is held in memory at a time, so the size of each
+    document stays bounded no matter how many rows the bill has.
+
+    Args:
+        data (dict): Deviation statement data
+        template_dir (str): Directory containing templates
+        rows_per_page (int): Item rows per page
+        pages_per_batch (int): Pages per document
+
+    Yields:
+        str: Complete HTML document for one batch of pages
+    """
+    parts = _deviation_statement_parts(template_dir)
+    pages = _iter_deviation_pages(parts, data, rows_per_page)
+    while True:
+        batch = list(islice(pages, pages_per_batch))
+        if not batch:
+            return
+        yield str(parts.document_open()) + str(parts.page_break()).join(batch) + str(parts.document_close())
+
+
+def _write_deviation_statement_html(data, template_dir, html_path):
+    parts = _deviation_statement_parts(template_dir)
+    with open(html_path, "w", encoding="utf-8") as f:
+        f.write(str(parts.document_open()))
+        for index, page in enumerate(_iter_deviation_pages(parts, data, DEVIATION_ROWS_PER_PAGE)):
+            if index:
+                f.write(str(parts.page_break()))
+            f.write(page)
+        f.write(str(parts.document_close()))
+
+
+def _generate_paginated_pdf(generator, documents, pdf_path):
+    """Convert HTML documents one at a time and merge the parts into pdf_path."""
+    part_paths = []
     try:
-        payload = json.dumps(data, sort_keys=True, ensure_ascii=False).encode("utf-8")
-    except Exception:
-        payload = repr(data).encode("utf-8")
-    return hashlib.sha256(payload).hexdigest()
+        for index, html_content in enumerate(documents):
+            part_path = f"{pdf_path}.part{index}.pdf"
+            part_paths.append(part_path)
+            try:
+                generator.generate_with_fallback(html_content, part_path)
+            except Exception:
+                return False
+            if not os.path.exists(part_path):
+                return False
+        merge_pdfs(part_paths, pdf_path)
+        return True
+    finally:
+        for part_path in part_paths:
+            try:
+                os.remove(part_path)
+            except OSError:
+                pass
+
+
+def _is_large_deviation_statement(sheet_name, data):
+    return sheet_name == "Deviation Statement" and len(data.get("items", [])) > DEVIATION_STREAMING_THRESHOLD
 
 
 def generate_html(sheet_name, data, template_dir, temp_dir):
@@ -59,10 +211,12 @@ def generate_html(sheet_name, data, template_dir, temp_dir):
     Returns:
         str: Path to generated HTML file
     """
-    env = setup_jinja_environment(template_dir)
-    template = env.get_template(f"{sheet_name.lower().replace(' ', '_')}.html")
-    html_content = template.render(data=data)
     html_path = os.path.join(temp_dir, f"{sheet_name.lower().replace(' ', '_')}.html")
+    if _is_large_deviation_statement(sheet_name, data):
+        _write_deviation_statement_html(data, template_dir, html_path)
+        return html_path
+
+    html_content = _render_html(sheet_name, data, template_dir)
 
     with open(html_path, "w", encoding="utf-8") as f:
         f.write(html_content)
@@ -70,6 +224,45 @@ def generate_html(sheet_name, data, template_dir, temp_dir):
     return html_path
 
 
+def _data_fingerprint(data):
+    # process_bill returns SheetData with a structural fingerprint; hash only ad-hoc data
+    return getattr(data, "fingerprint", None) or _hash_dict_stable(data)
+
+
+def _templates_stamp(template_dir):
+    """Identify a template directory and its latest edit, so persisted renders expire with the templates"""
+    template_dir = os.path.abspath(template_dir)
+    try:
+        latest = max((entry.stat().st_mtime_ns for entry in os.scandir(template_dir) if entry.is_file()), default=0)
+    except OSError:
+        latest = 0
+    return stable_hash([template_dir, latest])[:16]
+
+
+def _render_html(sheet_name, data, template_dir):
+    """Render a sheet template, reusing cached HTML for the same bill data"""
+    cache = _shared_cache()
+    cache_key = None
+    if cache is not None:
+        cache_key = f"html:{sheet_name}:{_templates_stamp(template_dir)}:{_data_fingerprint(data)}"
+        cached_html = cache.get(cache_key)
+        if isinstance(cached_html, str):
+            return cached_html
+
+    from exports.view_models import build_view_model
+
+    env = setup_jinja_environment(template_dir)
+    template = env.get_template(f"{sheet_name.lower().replace(' ', '_')}.html")
+    html_content = template.render(data=data, view=build_view_model(sheet_name, data))
+
+    if cache_key:
+        try:
+            cache.set(cache_key, html_content, ttl=1800)  # 30 minutes
+        except Exception:
+            pass
+    return html_content
+
+
 def generate_pdf(sheet_name, data, orientation, template_dir, temp_dir, config=None):
     """
     Generate PDF via unified engine with robust fallbacks (no hard dependency on wkhtmltopdf).
@@ -85,20 +278,59 @@ def generate_pdf(sheet_name, data, orientation, template_dir, temp_dir, config=N
     Returns:
         str: Path to generated PDF file
     """
-    env = setup_jinja_environment(template_dir)
-    template = env.get_template(f"{sheet_name.lower().replace(' ', '_')}.html")
-    html_content = template.render(data=data)
-
     os.makedirs(temp_dir, exist_ok=True)
     pdf_path = os.path.join(temp_dir, f"{sheet_name.replace(' ', '_')}.pdf")
 
+    cache = _shared_cache()
+    if cache is None:
+        _render_pdf(sheet_name, data, orientation, template_dir, pdf_path)
+        return pdf_path
+
     # Cache key for memoizing generated PDFs
-    cache_key = None
-    if _CACHE is not None:
-        cache_key = f"pdf:{sheet_name}:{orientation}:{_hash_dict_stable(data)}"
-        cached_path = _CACHE.get(cache_key)
-        if isinstance(cached_path, str) and os.path.exists(cached_path):
-            return cached_path
+    cache_key = f"pdf:{sheet_name}:{orientation}:{_templates_stamp(template_dir)}:{_data_fingerprint(data)}"
+    cached = cache.get(cache_key)
+    if isinstance(cached, str) and os.path.exists(cached):
+        return cached
+
+    def lookup():
+        cached = cache.get(cache_key)
+        return cached if isinstance(cached, bytes) else None
+
+    rendered = []
+
+    def render():
+        _render_pdf(sheet_name, data, orientation, template_dir, pdf_path)
+        rendered.append(pdf_path)
+        with open(pdf_path, "rb") as f:
+            pdf_bytes = f.read()
+        try:
+            cache.set(cache_key, pdf_bytes, ttl=1800)  # 30 minutes
+        except Exception:
+            pass
+        return pdf_bytes
+
+    # Concurrent requests for the same sheet and bill share one conversion
+    pdf_bytes = cached if isinstance(cached, bytes) else None
+    if pdf_bytes is None:
+        pdf_bytes = _SINGLE_FLIGHT.do(cache_key, render, lookup) if _SINGLE_FLIGHT is not None else render()
+    if not rendered:
+        # The cache holds the PDF itself, so it outlives temp directories
+        with open(pdf_path, "wb") as f:
+            f.write(pdf_bytes)
+    return pdf_path
+
+
+def _render_pdf(sheet_name, data, orientation, template_dir, pdf_path):
+    """Convert a sheet to PDF with the unified engine, raising when every engine fails"""
+    from exports.pdf_stamps import has_stamp, stamp_certificate
+
+    if has_stamp(sheet_name) and get_setting("pdf.stamp_certificates", False):
+        from exports.view_models import build_view_model
+        try:
+            stamp_certificate(sheet_name, build_view_model(sheet_name, data), pdf_path)
+            return
+        except ValueError:
+            pass  # Values the standard PDF fonts cannot show; lay out the HTML instead
 
     # Note Sheet has special margins in the legacy flow; approximate in mm
     custom_margins = None
@@ -110,17 +342,19 @@ def generate_pdf(sheet_name, data, orientation, template_dir, temp_dir, config=N
         custom_margins=custom_margins,
     )
 
-    success = generator.generate_pdf(html_content, pdf_path)
-    if not success or not os.path.exists(pdf_path):
-        raise RuntimeError("Failed to generate PDF with available engines")
-
-    if _CACHE is not None and cache_key:
+    if _is_large_deviation_statement(sheet_name, data):
+        documents = iter_deviation_statement_documents(data, template_dir)
+        success = _generate_paginated_pdf(generator, documents, pdf_path)
+    else:
+        # Each engine gets a deadline; a slow one is hedged with the next
         try:
-            _CACHE.set(cache_key, pdf_path, ttl=1800)  # 30 minutes
+            generator.generate_with_fallback(_render_html(sheet_name, data, template_dir), pdf_path)
+            success = True
         except Exception:
-            pass
+            success = False
 
-    return pdf_path
+    if not success or not os.path.exists(pdf_path):
+        raise RuntimeError("Failed to generate PDF with available engines")
 
 
 def create_word_doc(sheet_name, data, doc_path):
@@ -132,262 +366,72 @@ def create_word_doc(sheet_name, data, doc_path):
         data (dict): Data to include in the document
         doc_path (str): Path where to save the document
     """
+    from docx import Document
+    from exports.docx_skeletons import fill_skeleton, has_skeleton
+    from exports.docx_tables import add_table
+    from exports.view_models import build_view_model
+
+    view = build_view_model(sheet_name, data)
+    if has_skeleton(sheet_name):
+        fill_skeleton(sheet_name, view, doc_path)
+        return
+
     doc = Document()
     if sheet_name == "First Page":
-        table = doc.add_table(rows=len(data["items"]) + 3, cols=9)
-        table.style = "Table Grid"
-        for i, item in enumerate(data["items"]):
-            row = table.rows[i]
-            row.cells[0].text = str(item.get("unit", ""))
-            row.cells[2].text = str(item.get("quantity", ""))
-            row.cells[3].text = str(item.get("serial_no", ""))
-            row.cells[4].text = str(item.get("description", ""))
-            row.cells[5].text = str(item.get("rate", ""))
-            row.cells[6].text = str(item.get("amount", ""))
-            row.cells[8].text = str(item.get("remark", ""))
-        row = table.rows[-3]
-        row.cells[4].text = "Grand Total"
-        row.cells[6].text = str(data["totals"].get("grand_total", ""))
-        row = table.rows[-2]
-        premium_percent_value = data['totals']['premium'].get('percent', 0)
-        if isinstance(premium_percent_value, str):
-            try:
-                premium_percent_value = float(premium_percent_value)
-            except (ValueError, TypeError):
-                premium_percent_value = 0
-        row.cells[4].text = f"Tender Premium @ {premium_percent_value:.2%}"
-        row.cells[6].text = str(data["totals"]["premium"].get("amount", ""))
-        row = table.rows[-1]
-        row.cells[4].text = "Payable Amount"
-        row.cells[6].text = str(data["totals"].get("payable", ""))
+        rows = [
+            [
+                item.get("unit", ""), None, item.get("quantity", ""), item.get("serial_no", ""),
+                item.get("description", ""), item.get("rate", ""), item.get("amount", ""), None,
+                item.get("remark", ""),
+            ]
+            for item in data["items"]
+        ]
+        rows.append([None, None, None, None, "Grand Total", None, data["totals"].get("grand_total", "")])
+        rows.append([None, None, None, None, f"Tender Premium @ {view['premium_percent']}", None,
+                     data["totals"]["premium"].get("amount", "")])
+        rows.append([None, None, None, None, "Payable Amount", None, data["totals"].get("payable", "")])
+        add_table(doc, rows, cols=9)
     elif sheet_name == "Last Page":
         doc.add_paragraph(f"Payable Amount: {data.get('payable_amount', '')}")
         doc.add_paragraph(f"Total in Words: {data.get('amount_words', '')}")
     elif sheet_name == "Extra Items":
-        table = doc.add_table(rows=len(data["items"]) + 1, cols=7)
-        table.style = "Table Grid"
-        headers = ["Serial No.", "Remark", "Description", "Quantity", "Unit", "Rate", "Amount"]
-        for j, header in enumerate(headers):
-            table.rows[0].cells[j].text = header
-        for i, item in enumerate(data["items"]):
-            row = table.rows[i + 1]
-            row.cells[0].text = str(item.get("serial_no", ""))
-            row.cells[1].text = str(item.get("remark", ""))
-            row.cells[2].text = str(item.get("description", ""))
-            row.cells[3].text = str(item.get("quantity", ""))
-            row.cells[4].text = str(item.get("unit", ""))
-            row.cells[5].text = str(item.get("rate", ""))
-            row.cells[6].text = str(item.get("amount", ""))
+        rows = [["Serial No.", "Remark", "Description", "Quantity", "Unit", "Rate", "Amount"]]
+        rows.extend(
+            [
+                item.get("serial_no", ""), item.get("remark", ""), item.get("description", ""),
+                item.get("quantity", ""), item.get("unit", ""), item.get("rate", ""), item.get("amount", ""),
+            ]
+            for item in data["items"]
+        )
+        add_table(doc, rows, cols=7)
     elif sheet_name == "Deviation Statement":
-        table = doc.add_table(rows=len(data["items"]) + 5, cols=12)
-        table.style = "Table Grid"
-        headers = ["Serial No.", "Description", "Unit", "Qty WO", "Rate", "Amt WO", "Qty Bill", "Amt Bill", "Excess Qty", "Excess Amt", "Saving Qty", "Saving Amt"]
-        for j, header in enumerate(headers):
-            table.rows[0].cells[j].text = header
-        for i, item in enumerate(data["items"]):
-            row = table.rows[i + 1]
-            row.cells[0].text = str(item.get("serial_no", ""))
-            row.cells[1].text = str(item.get("description", ""))
-            row.cells[2].text = str(item.get("unit", ""))
-            row.cells[3].text = str(item.get("qty_wo", ""))
-            row.cells[4].text = str(item.get("rate", ""))
-            row.cells[5].text = str(item.get("amt_wo", ""))
-            row.cells[6].text = str(item.get("qty_bill", ""))
-            row.cells[7].text = str(item.get("amt_bill", ""))
-            row.cells[8].text = str(item.get("excess_qty", ""))
-            row.cells[9].text = str(item.get("excess_amt", ""))
-            row.cells[10].text = str(item.get("saving_qty", ""))
-            row.cells[11].text = str(item.get("saving_amt", ""))
-        row = table.rows[-4]
-        row.cells[1].text = "Grand Total"
-        row.cells[5].text = str(data["summary"].get("work_order_total", ""))
-        row.cells[7].text = str(data["summary"].get("executed_total", ""))
-        row.cells[9].text = str(data["summary"].get("overall_excess", ""))
-        row.cells[11].text = str(data["summary"].get("overall_saving", ""))
-        row = table.rows[-3]
-        premium_percent_value = data['summary']['premium'].get('percent', 0)
-        if isinstance(premium_percent_value, str):
-            try:
-                premium_percent_value = float(premium_percent_value)
-            except (ValueError, TypeError):
-                premium_percent_value = 0
-        row.cells[1].text = f"Add Tender Premium ({premium_percent_value:.2%})"
-        row.cells[5].text = str(data["summary"].get("tender_premium_f", ""))
-        row.cells[7].text = str(data["summary"].get("tender_premium_h", ""))
-        row.cells[9].text = str(data["summary"].get("tender_premium_j", ""))
-        row.cells[11].text = str(data["summary"].get("tender_premium_l", ""))
-        row = table.rows[-2]
-        row.cells[1].text = "Grand Total including Tender Premium"
-        row.cells[5].text = str(data["summary"].get("grand_total_f", ""))
-        row.cells[7].text = str(data["summary"].get("grand_total_h", ""))
-        row.cells[9].text = str(data["summary"].get("grand_total_j", ""))
-        row.cells[11].text = str(data["summary"].get("grand_total_l", ""))
-        row = table.rows[-1]
-        net_difference = data["summary"].get("net_difference", 0)
-        row.cells[1].text = "Overall Excess" if net_difference > 0 else "Overall Saving"
-        row.cells[7].text = str(abs(round(net_difference)))
+        summary = data["summary"]
+        rows = [["Serial No.", "Description", "Unit", "Qty WO", "Rate", "Amt WO", "Qty Bill", "Amt Bill", "Excess Qty", "Excess Amt", "Saving Qty", "Saving Amt"]]
+        rows.extend(
+            [
+                item.get("serial_no", ""), item.get("description", ""), item.get("unit", ""),
+                item.get("qty_wo", ""), item.get("rate", ""), item.get("amt_wo", ""),
+                item.get("qty_bill", ""), item.get("amt_bill", ""), item.get("excess_qty", ""),
+                item.get("excess_amt", ""), item.get("saving_qty", ""), item.get("saving_amt", ""),
+            ]
+            for item in data["items"]
+        )
+        rows.append([None, "Grand Total", None, None, None, summary.get("work_order_total", ""), None,
+                     summary.get("executed_total", ""), None, summary.get("overall_excess", ""), None,
+                     summary.get("overall_saving", "")])
+        rows.append([None, f"Add Tender Premium ({view['premium_percent']})", None, None, None,
+                     summary.get("tender_premium_f", ""), None, summary.get("tender_premium_h", ""), None,
+                     summary.get("tender_premium_j", ""), None, summary.get("tender_premium_l", "")])
+        rows.append([None, "Grand Total including Tender Premium", None, None, None,
+                     summary.get("grand_total_f", ""), None, summary.get("grand_total_h", ""), None,
+                     summary.get("grand_total_j", ""), None, summary.get("grand_total_l", "")])
+        net_difference = summary.get("net_difference", 0)
+        rows.append([None, "Overall Excess" if net_difference > 0 else "Overall Saving", None, None, None,
+                     None, None, abs(round(net_difference))])
+        add_table(doc, rows, cols=12)
     elif sheet_name == "Note Sheet":
         for note in data.get("notes", []):
             doc.add_paragraph(str(note))
-    elif sheet_name == "Certificate II":
-        # Add certificate II content
-        doc.add_heading("II. CERTIFICATE AND SIGNATURES", level=1)
-
-        # Certificate text
-        certificate_text = f"""The measurements on which are based the entries in columns 1 to 6 of Account I, were made by {data.get('measurement_officer', 'Junior Engineer')} on {data.get('measurement_date', '01/03/2025')}, and are recorded at page {data.get('measurement_book_page', '04-20')} of Measurement Book No. {data.get('measurement_book_no', '887')}."""
-        doc.add_paragraph(certificate_text)
-
-        doc.add_paragraph("*Certified that in addition to and quite apart from the quantities of work actually executed, as shown in column 4 of Account I, some work has actually been done in connection with several items and the value of such work (after deduction therefrom the proportionate amount of secured advances, if any, ultimately recoverable on account of the quantities of materials used therein) is in no case, less than the advance payments as per item 2 of the Memorandum, if payment is made.")
-
-        doc.add_paragraph("+Certified that the contractor has made satisfactory progress with the work, and that the quantities and amounts claimed are correct and the work has been executed in accordance with the specifications and the terms of the contract.")
-
-        doc.add_paragraph("I also certify that the amount claimed is not more than the amount admissible under the contract.")
-
-        # Signature blocks
-        doc.add_paragraph("\nDated signature of officer preparing the bill")
-        doc.add_paragraph(f"Name: {data.get('officer_name', 'Name of Officer')}")
-        doc.add_paragraph(f"Designation: {data.get('officer_designation', 'Assistant Engineer')}")
-        doc.add_paragraph(f"Date: {data.get('bill_date', '__/__/____')}")
-
-        doc.add_paragraph("\n+Dated signature of officer authorising payment")
-        doc.add_paragraph(f"Name: {data.get('authorising_officer_name', 'Name of Authorising Officer')}")
-        doc.add_paragraph(f"Designation: {data.get('authorising_officer_designation', 'Executive Engineer')}")
-        doc.add_paragraph(f"Date: {data.get('authorisation_date', '__/__/____')}")
-
-    elif sheet_name == "Certificate III":
-        # Add certificate III content
-        doc.add_heading("III. MEMORANDUM OF PAYMENTS", level=1)
-
-        # Create table for payment details
-        table = doc.add_table(rows=25, cols=4)
-        table.style = "Table Grid"
-
-        # Header row
-        hdr_cells = table.rows[0].cells
-        hdr_cells[0].text = "S.No."
-        hdr_cells[1].text = "Description"
-        hdr_cells[2].text = "Entry No."
-        hdr_cells[3].text = "Amount Rs."
-
-        # Data rows
-        table.rows[1].cells[0].text = "1."
-        table.rows[1].cells[1].text = "Total value of work actually measured, as per Account I, Col. 5, Entry [A]"
-        table.rows[1].cells[2].text = "[A]"
-        table.rows[1].cells[3].text = str(data["totals"].get("grand_total", "0"))
-
-        table.rows[2].cells[0].text = "2."
-        table.rows[2].cells[1].text = "Total up-to-date advance payments for work not yet measured as per details given below:"
-        table.rows[2].cells[2].text = ""
-        table.rows[2].cells[3].text = ""
-
-        table.rows[3].cells[0].text = ""
-        table.rows[3].cells[1].text = "(a) Total as per previous bill"
-        table.rows[3].cells[2].text = "[B]"
-        table.rows[3].cells[3].text = "Nil"
-
-        table.rows[4].cells[0].text = ""
-        table.rows[4].cells[1].text = "(b) Since previous bill"
-        table.rows[4].cells[2].text = "[D]"
-        table.rows[4].cells[3].text = "Nil"
-
-        table.rows[5].cells[0].text = "3."
-        table.rows[5].cells[1].text = "Total up-to-date secured advances on security of materials"
-        table.rows[5].cells[2].text = "[C]"
-        table.rows[5].cells[3].text = "Nil"
-
-        table.rows[6].cells[0].text = "4."
-        table.rows[6].cells[1].text = "Total (Items 1 + 2 + 3) A+B+C"
-        table.rows[6].cells[2].text = ""
-        table.rows[6].cells[3].text = str(data["totals"].get("grand_total", "0"))
-
-        table.rows[7].cells[0].text = "5."
-        table.rows[7].cells[1].text = "Deduct: Amount withheld"
-        table.rows[7].cells[2].text = ""
-        table.rows[7].cells[3].text = ""
-
-        table.rows[8].cells[0].text = ""
-        table.rows[8].cells[1].text = "(a) From previous bill as per last Running Account Bill"
-        table.rows[8].cells[2].text = "[5]"
-        table.rows[8].cells[3].text = "Nil"
-
-        table.rows[9].cells[0].text = ""
-        table.rows[9].cells[1].text = "(b) From this bill"
-        table.rows[9].cells[2].text = ""
-        table.rows[9].cells[3].text = "Nil"
-
-        table.rows[10].cells[0].text = "6."
-        table.rows[10].cells[1].text = 'Balance i.e. "up-to-date" payments (Item 4-5)'
-        table.rows[10].cells[2].text = ""
-        table.rows[10].cells[3].text = str(data["totals"].get("grand_total", "0"))
-
-        table.rows[11].cells[0].text = "7."
-        table.rows[11].cells[1].text = "Total amount of payments already made as per Entry (K)"
-        table.rows[11].cells[2].text = "[K]"
-        table.rows[11].cells[3].text = "0"
-
-        table.rows[12].cells[0].text = "8."
-        table.rows[12].cells[1].text = "Payments now to be made, as detailed below:"
-        table.rows[12].cells[2].text = ""
-        table.rows[12].cells[3].text = str(data["totals"].get("payable", "0"))
-
-        table.rows[13].cells[0].text = ""
-        table.rows[13].cells[1].text = "(a) By recovery of amounts creditable to this work"
-        table.rows[13].cells[2].text = "[a]"
-        table.rows[13].cells[3].text = ""
-
-        # Calculate deductions
-        payable_amount = float(data["totals"].get("payable", 0))
-        sd_amount = payable_amount * 0.10
-        it_amount = payable_amount * 0.02
-        gst_amount = payable_amount * 0.02
-        lc_amount = payable_amount * 0.01
-
-        table.rows[14].cells[0].text = ""
-        table.rows[14].cells[1].text = "SD @ 10%"
-        table.rows[14].cells[2].text = ""
-        table.rows[14].cells[3].text = f"{sd_amount:.0f}"
-
-        table.rows[15].cells[0].text = ""
-        table.rows[15].cells[1].text = "IT @ 2%"
-        table.rows[15].cells[2].text = ""
-        table.rows[15].cells[3].text = f"{it_amount:.0f}"
-
-        table.rows[16].cells[0].text = ""
-        table.rows[16].cells[1].text = "GST @ 2%"
-        table.rows[16].cells[2].text = ""
-        table.rows[16].cells[3].text = f"{gst_amount:.0f}"
-
-        table.rows[17].cells[0].text = ""
-        table.rows[17].cells[1].text = "LC @ 1%"
-        table.rows[17].cells[2].text = ""
-        table.rows[17].cells[3].text = f"{lc_amount:.0f}"
-
-        total_deductions = sd_amount + it_amount + gst_amount + lc_amount
-        table.rows[18].cells[0].text = ""
-        table.rows[18].cells[1].text = "Total recovery"
-        table.rows[18].cells[2].text = ""
-        table.rows[18].cells[3].text = f"{total_deductions:.0f}"
-
-        table.rows[19].cells[0].text = ""
-        table.rows[19].cells[1].text = "(b) By recovery of amount creditable to other works"
-        table.rows[19].cells[2].text = "[b]"
-        table.rows[19].cells[3].text = "Nil"
-
-        cheque_amount = payable_amount - total_deductions
-        table.rows[20].cells[0].text = ""
-        table.rows[20].cells[1].text = "(c) By cheque"
-        table.rows[20].cells[2].text = "[c]"
-        table.rows[20].cells[3].text = f"{cheque_amount:.0f}"
-
-        # Payment details
-        doc.add_paragraph(f"\nPay Rs. {cheque_amount:.0f}")
-        doc.add_paragraph(f"Pay Rupees {data.get('payable_words', 'Zero')} (by cheque)")
-        doc.add_paragraph("Dated the ____ / ____ / ________")
-        doc.add_paragraph("Dated initials of Disbursing Officer: _______________")
-        doc.add_paragraph(f"\nReceived Rupees {data.get('payable_words', 'Zero')} (by cheque) as per above memorandum, on account of this bill")
-        doc.add_paragraph("Signature of Contractor: _______________")
-        doc.add_paragraph("\nPaid by me, vide cheque No. _______ dated ____ / ____ / ________")
-        doc.add_paragraph("Dated initials of person actually making the payment: _______________")
 
     doc.save(doc_path)
 
@@ -400,6 +444,8 @@ def merge_pdfs(pdf_files, output_path):
         pdf_files (list): List of paths to PDF files to merge
         output_path (str): Path where to save the merged PDF
     """
+    from pypdf import PdfReader, PdfWriter
+
     writer = PdfWriter()
 
     for pdf in pdf_files:
@@ -424,3 +470,153 @@ def create_zip_archive(files, zip_path):
         for file_path in files:
             if os.path.exists(file_path):
                 zipf.write(file_path, os.path.basename(file_path))
+
+
+# Serial builds (PDF rendering) run one at a time in this process
+_SERIAL_BUILD_LOCK = threading.RLock()
+
+
+class LazyArtifact:
+    """
+    A generated output file that is only built the first time it is needed
+
+    The build thunk is called on the first ``path()``/``read_bytes()`` call and
+    its result is memoized, so repeated downloads and dependent artifacts
+    (merged PDF, ZIP) reuse the same file. Safe to share across threads.
+    """
+
+    def __init__(self, file_name, build, mime="application/octet-stream", inputs=(), serial=False):
+        """
+        Args:
+            file_name (str): Download name of the artifact
+            build (callable): Zero-argument callable returning the built file path
+                (or None when the artifact could not be produced)
+            mime (str): MIME type used when offering the file for download
+            inputs (iterable): Artifacts that must be built before this one
+            serial (bool): Never build alongside another serial artifact in this
+                process (the PDF engines are not known to be thread-safe)
+        """
+        self.file_name = file_name
+        self.mime = mime
+        self.inputs = tuple(inputs)
+        self.serial = serial
+        self._build = build
+        self._path = None
+        self._built = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_built(self):
+        """Whether the artifact has already been generated"""
+        return self._built
+
+    def path(self):
+        """Build the artifact if needed and return its file path"""
+        if not self._built:
+            with self._lock:
+                if not self._built:
+                    if self.serial:
+                        with _SERIAL_BUILD_LOCK:
+                            self._path = self._build()
+                    else:
+                        self._path = self._build()
+                    self._built = True
+        return self._path
+
+    def read_bytes(self):
+        """Build the artifact if needed and return its contents"""
+        with open(self.path(), "rb") as f:
+            return f.read()
+
+
+def build_artifacts(artifacts, max_workers=4):
+    """
+    Build artifacts and everything they depend on, in parallel where possible
+
+    The artifacts and their ``inputs`` form a DAG. Every artifact starts on the
+    thread pool as soon as all of its inputs are built, so a merge or archive
+    starts as soon as its own inputs are ready. Serial artifacts (sheet PDFs)
+    start one at a time and the Word, data export, merge and archive stages run
+    alongside them. The first build error is re-raised.
+
+    Args:
+        artifacts (iterable): LazyArtifact objects to build
+        max_workers (int): Maximum number of concurrent builds
+
+    Returns:
+        list: Built file paths, in the order of ``artifacts``
+    """
+    artifacts = list(artifacts)
+    ordered, seen = [], set()
+
+    def visit(artifact):
+        if id(artifact) in seen:
+            return
+        seen.add(id(artifact))
+        for dependency in artifact.inputs:
+            visit(dependency)
+        ordered.append(artifact)
+
+    for artifact in artifacts:
+        visit(artifact)
+
+    waiting = [artifact for artifact in ordered if not artifact.is_built]
+    running = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while waiting or running:
+            ready = [a for a in waiting if all(dependency.is_built for dependency in a.inputs)]
+            serial_running = any(artifact.serial for artifact in running.values())
+            for artifact in ready:
+                if artifact.serial:
+                    if serial_running:
+                        continue
+                    serial_running = True
+                waiting.remove(artifact)
+                running[executor.submit(artifact.path)] = artifact
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                del running[future]
+                future.result()
+
+    return [artifact.path() for artifact in artifacts]
+
+
+def lazy_pdf(sheet_name, data, orientation, template_dir, temp_dir, file_name=None):
+    """Describe a sheet PDF as a LazyArtifact built with generate_pdf"""
+    return LazyArtifact(
+        file_name or f"{sheet_name.replace(' ', '_')}.pdf",
+        lambda: generate_pdf(sheet_name, data, orientation, template_dir, temp_dir),
+        mime="application/pdf",
+        serial=True,
+    )
+
+
+def lazy_word_doc(sheet_name, data, doc_path):
+    """Describe a sheet Word document as a LazyArtifact built with create_word_doc"""
+    def build():
+        create_word_doc(sheet_name, data, doc_path)
+        return doc_path
+
+    return LazyArtifact(
+        os.path.basename(doc_path),
+        build,
+        mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    )
+
+
+def lazy_merged_pdf(pdf_artifacts, output_path):
+    """Describe the merged PDF of several lazy PDFs; inputs are built on demand"""
+    def build():
+        merge_pdfs(build_artifacts(pdf_artifacts), output_path)
+        return output_path
+
+    return LazyArtifact(os.path.basename(output_path), build, mime="application/pdf", inputs=pdf_artifacts)
+
+
+def lazy_zip_archive(artifacts, zip_path):
+    """Describe a ZIP of several lazy artifacts; inputs are built concurrently on demand"""
+    def build():
+        create_zip_archive([path for path in build_artifacts(artifacts) if path], zip_path)
+        return zip_path
+
+    return LazyArtifact(os.path.basename(zip_path), build, mime="application/zip", inputs=artifacts)
@@ -0,0 +1,248 @@
+"""
+View-model builders for the bill templates
+
+Every derived display value (deductions, cheque amount, percentages, trimmed
+cells) is computed once here in Python, so the Jinja templates only
+interpolate and the PDF and Word renderers print identical figures.
+"""
+
+import math
+
+from core.computations.bill_processor import safe_float
+
+
+def _as_int(value):
+    """Integer conversion with the semantics of Jinja's ``|int`` filter."""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        try:
+            return int(float(value))
+        except (TypeError, ValueError, OverflowError):
+            return 0
+
+
+def _trimmed(item, key):
+    """Return item[key] when it is present and not blank, otherwise ''."""
+    if key not in item:
+        return ""
+    value = item[key]
+    return value if str(value).strip() else ""
+
+
+def _percent(value):
+    """Format a fractional rate as a percentage string ('' when missing)."""
+    if value is None:
+        return ""
+    return "%.2f%%" % (safe_float(value) * 100)
+
+
+def _grouped(value):
+    """Round to whole rupees and format with thousands separators."""
+    return "{:,}".format(int(round(safe_float(value))))
+
+
+def compute_deductions(payable):
+    """
+    Compute statutory deductions on the payable amount
+
+    Args:
+        payable: Payable amount of the bill
+
+    Returns:
+        dict: sd, it, gst, lc, total and cheque amounts
+    """
+    base = _as_int(payable)
+    sd = float(round(base * 0.10))
+    it = float(round(base * 0.02))
+    gst = math.ceil(base * 0.02) // 2 * 2
+    lc = float(round(base * 0.01))
+    total = sd + it + gst + lc
+    return {
+        "sd": sd,
+        "it": it,
+        "gst": gst,
+        "lc": lc,
+        "total": total,
+        "cheque": base - total,
+    }
+
+
+def build_first_page_view(data):
+    """Build display values for the First Page template."""
+    totals = data.get("totals") or {}
+    premium = totals.get("premium") or {}
+    extra_items_sum = totals.get("extra_items_sum")
+
+    rows = []
+    for item in data.get("items", []):
+        rows.append({
+            "unit": item.get("unit", ""),
+            "quantity_since_last": _trimmed(item, "quantity_since_last"),
+            "quantity_upto_date": _trimmed(item, "quantity_upto_date") or _trimmed(item, "quantity"),
+            "serial_no": item.get("serial_no", ""),
+            "description": item.get("description", ""),
+            "css_class": ("bold" if item.get("bold") else "") + " " + ("underline" if item.get("underline") else ""),
+            "rate": _trimmed(item, "rate"),
+            "amount": item.get("amount", ""),
+            "amount_previous": item.get("amount_previous", ""),
+            "remark": item.get("remark", ""),
+        })
+
+    return {
+        "rows": rows,
+        "grand_total": totals.get("grand_total", ""),
+        "premium_percent": _percent(premium.get("percent")),
+        "premium_amount": premium.get("amount", ""),
+        "extra_items_sum": extra_items_sum if extra_items_sum is not None and extra_items_sum > 0 else "NIL",
+        "payable": totals.get("payable", ""),
+    }
+
+
+def build_last_page_view(data):
+    """Build display values for the Last Page template."""
+    header = data.get("header")
+    premium = (data.get("totals") or {}).get("premium") or {}
+    return {
+        "agreement_no": header[0][1] if header else "N/A",
+        "premium_percent": _percent(premium.get("percent", 0)),
+    }
+
+
+def build_deviation_statement_view(data):
+    """Build display values for the Deviation Statement summary rows."""
+    summary = data.get("summary") or {}
+    premium = summary.get("premium") or {}
+    work_order_total = summary.get("work_order_total")
+    net_difference = summary.get("net_difference", 0)
+
+    if work_order_total:
+        deviation = safe_float(summary.get("overall_excess", 0)) / safe_float(work_order_total) * 100
+    else:
+        deviation = 0
+
+    return {
+        "premium_percent": _percent(premium.get("percent")),
+        "net_difference_label": (
+            "Overall Excess With Respect to the Work Order Amount Rs."
+            if net_difference > 0
+            else "Overall Saving With Respect to the Work Order Amount Rs."
+        ),
+        "deviation_percent": "%0.2f%%" % deviation,
+    }
+
+
+def build_note_sheet_view(data):
+    """Build display values for the Note Sheet template."""
+    totals = data.get("totals")
+    work_order_amount = data.get("work_order_amount")
+    extra_item_amount = data.get("extra_item_amount", 0)
+    notes = data.get("notes")
+
+    view = {
+        "payable": "",
+        "balance": "NIL",
+        "progress": "%.2f" % 0,
+        "extra_item": "Yes" if extra_item_amount > 0 else "No",
+        "extra_item_amount": extra_item_amount if extra_item_amount > 0 else "",
+        "sd": "",
+        "it": "",
+        "gst": "",
+        "lc": "",
+        "cheque": "",
+        "notes": "\n".join(notes) if notes else "Note not available",
+    }
+    if not totals:
+        return view
+
+    payable = totals.get("payable", "")
+    payable_int = _as_int(payable)
+    work_order_int = _as_int(work_order_amount)
+    deductions = compute_deductions(payable)
+
+    view.update({
+        "payable": payable,
+        "sd": deductions["sd"],
+        "it": deductions["it"],
+        "gst": deductions["gst"],
+        "lc": deductions["lc"],
+        "cheque": deductions["cheque"],
+    })
+    if payable_int < work_order_int:
+        view["balance"] = work_order_int - payable_int
+    if work_order_amount and safe_float(work_order_amount) > 0:
+        view["progress"] = "%.2f" % (safe_float(payable) / safe_float(work_order_amount) * 100)
+    return view
+
+
+def build_certificate_ii_view(data):
+    """Build display values for the Certificate II signatures block."""
+    return {
+        "measurement_officer": data.get("measurement_officer", "Junior Engineer"),
+        "measurement_date": data.get("measurement_date", "01/03/2025"),
+        "measurement_book_page": data.get("measurement_book_page", "04-20"),
+        "measurement_book_no": data.get("measurement_book_no", "887"),
+        "officer_name": data.get("officer_name", "Name of Officer"),
+        "officer_designation": data.get("officer_designation", "Assistant Engineer"),
+        "bill_date": data.get("bill_date", "__/__/____"),
+        "authorising_officer_name": data.get("authorising_officer_name", "Name of Authorising Officer"),
+        "authorising_officer_designation": data.get("authorising_officer_designation", "Executive Engineer"),
+        "authorisation_date": data.get("authorisation_date", "__/__/____"),
+    }
+
+
+def build_certificate_iii_view(data):
+    """Build display values for the Certificate III memorandum of payments."""
+    totals = data.get("totals") or {}
+    grand_total = totals.get("grand_total")
+    payable = totals.get("payable")
+    view = {
+        "grand_total": _grouped(grand_total) if grand_total else "0",
+        "payable": _grouped(payable) if payable else "0",
+        "sd": "0",
+        "it": "0",
+        "gst": "0",
+        "lc": "0",
+        "total_recovery": "0",
+        "cheque": "0",
+        "payable_words": data.get("payable_words", "Zero"),
+    }
+    if payable:
+        deductions = compute_deductions(payable)
+        view.update({
+            "sd": _grouped(deductions["sd"]),
+            "it": _grouped(deductions["it"]),
+            "gst": _grouped(deductions["gst"]),
+            "lc": _grouped(deductions["lc"]),
+            "total_recovery": _grouped(deductions["total"]),
+            "cheque": _grouped(deductions["cheque"]),
+        })
+    return view
+
+
+_VIEW_BUILDERS = {
+    "first_page": build_first_page_view,
+    "last_page": build_last_page_view,
+    "deviation_statement": build_deviation_statement_view,
+    "note_sheet": build_note_sheet_view,
+    "certificate_ii": build_certificate_ii_view,
+    "certificate_iii": build_certificate_iii_view,
+}
+
+
+def build_view_model(template_name, data):
+    """
+    Build the precomputed display context for a template
+
+    Args:
+        template_name (str): Template name ("first_page", "First Page" or "first_page.html")
+        data (dict): Bill data for the sheet
+
+    Returns:
+        dict: Display values for the template (empty when it needs none)
+    """
+    key = template_name.lower().replace(" ", "_")
+    if key.endswith(".html"):
+        key = key[:-5]
+    builder = _VIEW_BUILDERS.get(key)
+    return builder(data) if builder else {}
@@ -5,20 +5,29 @@ This script provides improved batch processing capabilities.
 import os
 import pandas as pd
 import time
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 
 # Import our modular components
 from core.computations.bill_processor import process_bill
-from exports.renderers import generate_pdf, create_word_doc, merge_pdfs, create_zip_archive
-from exports.advanced_formats import export_bill_data
+from exports.renderers import (
+    build_artifacts, lazy_pdf, lazy_word_doc, lazy_merged_pdf, lazy_zip_archive
+)
+from exports.advanced_formats import (
+    lazy_bill_data_exports, share_item_tables, write_item_tables, write_parquet_dataset
+)
+from data.shared_tables import attach_tables
 from scripts.monitoring import log_performance, log_event
+from core.prefork import FORK_AVAILABLE, PreforkPool
 
 def process_single_file(file_path: str, 
                        output_dir: str,
                        premium_percent: float = 5.0,
-                       premium_type: str = "above") -> Dict[str, Any]:
+                       premium_type: str = "above",
+                       max_workers: int = 4,
+                       dataset_dir: Optional[str] = None,
+                       share_tables: bool = False) -> Dict[str, Any]:
     """
     Process a single Excel file
     
@@ -27,6 +36,10 @@ def process_single_file(file_path: str,
         output_dir (str): Directory for output files
         premium_percent (float): Tender premium percentage
         premium_type (str): Premium type ("above" or "below")
+        max_workers (int): Maximum number of documents generated concurrently
+        dataset_dir (Optional[str]): Parquet dataset to append the line items to
+        share_tables (bool): Publish the typed item tables in shared memory and
+            return their handle as result["tables"] (the caller unlinks it)
         
     Returns:
         Dict[str, Any]: Processing results
@@ -67,98 +80,51 @@ def process_single_file(file_path: str,
         file_output_dir = os.path.join(output_dir, file_name)
         os.makedirs(file_output_dir, exist_ok=True)
         
-        # Generate PDFs
+        # Describe every output as a stage; independent stages build concurrently,
+        # except the sheet PDFs, which render one at a time
         template_dir = os.path.join(os.path.dirname(__file__), "..", "templates")
         
-        pdf_files = []
-        
-        # Generate First Page
-        first_page_pdf = generate_pdf(
-            "First Page", 
-            first_page_data, 
-            "landscape", 
-            template_dir, 
-            file_output_dir
-        )
-        pdf_files.append(first_page_pdf)
-        
-        # Generate Last Page
-        last_page_pdf = generate_pdf(
-            "Last Page", 
-            last_page_data, 
-            "portrait", 
-            template_dir, 
-            file_output_dir
-        )
-        pdf_files.append(last_page_pdf)
-        
-        # Generate Deviation Statement
-        deviation_pdf = generate_pdf(
-            "Deviation Statement", 
-            deviation_data, 
-            "landscape", 
-            template_dir, 
-            file_output_dir
-        )
-        pdf_files.append(deviation_pdf)
-        
-        # Generate Extra Items
-        extra_items_pdf = generate_pdf(
-            "Extra Items", 
-            extra_items_data, 
-            "landscape", 
-            template_dir, 
-            file_output_dir
-        )
-        pdf_files.append(extra_items_pdf)
-        
-        # Generate Note Sheet
-        note_sheet_pdf = generate_pdf(
-            "Note Sheet", 
-            note_sheet_data, 
-            "portrait", 
-            template_dir, 
-            file_output_dir
-        )
-        pdf_files.append(note_sheet_pdf)
-        
-        # Create Word documents
-        word_files = []
-        
-        first_page_doc = os.path.join(file_output_dir, "first_page.docx")
-        create_word_doc("First Page", first_page_data, first_page_doc)
-        word_files.append(first_page_doc)
-        
-        last_page_doc = os.path.join(file_output_dir, "last_page.docx")
-        create_word_doc("Last Page", last_page_data, last_page_doc)
-        word_files.append(last_page_doc)
-        
-        deviation_doc = os.path.join(file_output_dir, "deviation_statement.docx")
-        create_word_doc("Deviation Statement", deviation_data, deviation_doc)
-        word_files.append(deviation_doc)
-        
-        extra_items_doc = os.path.join(file_output_dir, "extra_items.docx")
-        create_word_doc("Extra Items", extra_items_data, extra_items_doc)
-        word_files.append(extra_items_doc)
-        
-        note_sheet_doc = os.path.join(file_output_dir, "note_sheet.docx")
-        create_word_doc("Note Sheet", note_sheet_data, note_sheet_doc)
-        word_files.append(note_sheet_doc)
-        
-        # Generate advanced formats
-        advanced_files = export_bill_data(
+        pdf_artifacts = [
+            lazy_pdf(sheet_name, sheet_data, orientation, template_dir, file_output_dir)
+            for sheet_name, sheet_data, orientation in [
+                ("First Page", first_page_data, "landscape"),
+                ("Last Page", last_page_data, "portrait"),
+                ("Deviation Statement", deviation_data, "landscape"),
+                ("Extra Items", extra_items_data, "landscape"),
+                ("Note Sheet", note_sheet_data, "portrait")
+            ]
+        ]
+        word_artifacts = [
+            lazy_word_doc(sheet_name, sheet_data, os.path.join(file_output_dir, doc_name))
+            for sheet_name, sheet_data, doc_name in [
+                ("First Page", first_page_data, "first_page.docx"),
+                ("Last Page", last_page_data, "last_page.docx"),
+                ("Deviation Statement", deviation_data, "deviation_statement.docx"),
+                ("Extra Items", extra_items_data, "extra_items.docx"),
+                ("Note Sheet", note_sheet_data, "note_sheet.docx")
+            ]
+        ]
+        advanced_artifacts = lazy_bill_data_exports(
             first_page_data, last_page_data, deviation_data, 
             extra_items_data, note_sheet_data, file_output_dir
         )
+        merged_artifact = lazy_merged_pdf(pdf_artifacts, os.path.join(file_output_dir, "complete_bill.pdf"))
+        all_artifacts = pdf_artifacts + word_artifacts + advanced_artifacts + [merged_artifact]
+        zip_artifact = lazy_zip_archive(all_artifacts, os.path.join(file_output_dir, f"{file_name}_documents.zip"))
         
-        # Merge all PDFs
-        merged_pdf = os.path.join(file_output_dir, "complete_bill.pdf")
-        merge_pdfs(pdf_files, merged_pdf)
+        # Merge starts as soon as the PDFs are done; the ZIP waits for everything
+        paths = build_artifacts(all_artifacts + [zip_artifact], max_workers=max_workers)
+        all_files = [path for path in paths[:-1] if path]
+        zip_path = paths[-1]
         
-        # Create ZIP archive
-        all_files = pdf_files + word_files + advanced_files + [merged_pdf]
-        zip_path = os.path.join(file_output_dir, f"{file_name}_documents.zip")
-        create_zip_archive(all_files, zip_path)
+        # Append line items to the shared columnar dataset
+        if share_tables:
+            try:
+                result["tables"] = share_item_tables(first_page_data, deviation_data, extra_items_data).release()
+            except Exception as e:
+                print(f"Error sharing item tables: {e}")
+        elif dataset_dir:
+            write_parquet_dataset(first_page_data, deviation_data, extra_items_data, dataset_dir)
         
         result["status"] = "success"
         result["output_files"] = all_files + [zip_path]
@@ -189,11 +155,21 @@ def process_single_file(file_path: str,
         
     return result
 
+def _append_shared_tables(handle: Any, dataset_dir: str) -> None:
+    """Write a worker's shared item tables to the dataset and unlink the segment"""
+    try:
+        with attach_tables(handle, unlink=True) as tables:
+            write_item_tables(tables, handle.metadata["bill_id"], dataset_dir)
+    except Exception as e:
+        print(f"Error writing Parquet dataset: {e}")
+
 def process_batch(input_dir: str, 
                  output_dir: str,
                  premium_percent: float = 5.0,
                  premium_type: str = "above",
-                 max_workers: int = 4) -> List[Dict[str, Any]]:
+                 max_workers: int = 4,
+                 dataset_dir: Optional[str] = None,
+                 processes: int = 0) -> List[Dict[str, Any]]:
     """
     Process multiple Excel files in batch
     
@@ -203,6 +179,9 @@ def process_batch(input_dir: str,
         premium_percent (float): Tender premium percentage
         premium_type (str): Premium type ("above" or "below")
         max_workers (int): Maximum number of concurrent workers
+        dataset_dir (Optional[str]): Parquet dataset to append every bill's line items to
+        processes (int): Number of pre-forked worker processes; 0 processes
+            files on threads in this process
         
     Returns:
         List[Dict[str, Any]]: List of processing results
@@ -223,7 +202,16 @@ def process_batch(input_dir: str,
     # Process files concurrently
     results = []
     
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+    # Pre-forked workers share the warmed renderers and render in parallel;
+    # they hand their item tables back through shared memory so this process
+    # is the only writer of the dataset
+    use_processes = processes > 0 and FORK_AVAILABLE
+    if use_processes:
+        executor_context = PreforkPool(workers=processes)
+    else:
+        executor_context = ThreadPoolExecutor(max_workers=max_workers)
+    
+    with executor_context as executor:
         # Submit all tasks
         future_to_file = {
             executor.submit(
@@ -231,7 +219,9 @@ def process_batch(input_dir: str,
                 file_path, 
                 output_dir, 
                 premium_percent, 
-                premium_type
+                premium_type,
+                dataset_dir=None if use_processes else dataset_dir,
+                share_tables=use_processes and bool(dataset_dir)
             ): file_path for file_path in excel_files
         }
         
@@ -240,6 +230,9 @@ def process_batch(input_dir: str,
             file_path = future_to_file[future]
             try:
                 result = future.result()
+                handle = result.pop("tables", None)
+                if handle is not None:
+                    _append_shared_tables(handle, dataset_dir)
                 results.append(result)
                 if result["status"] == "success":
                     print(f"✓ Processed {file_path}")
@@ -0,0 +1,65 @@
+"""
+DOCX table benchmark for the Stream Bill Generator
+Compares the bulk table writer used by create_word_doc with filling the same
+table cell by cell through python-docx.
+
+Usage:
+    python scripts/benchmark_docx.py [rows]
+"""
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from docx import Document
+
+from exports.docx_tables import add_table
+from scripts.monitoring import benchmark_function
+
+COLUMNS = 12
+
+
+def sample_rows(count):
+    """Build deviation-statement-like rows of string values"""
+    return [
+        [str(i), f"Item of work number {i}", "Nos", "10", "125.50", "1255", "12", "1506", "2", "251", "", ""]
+        for i in range(count)
+    ]
+
+
+def build_per_cell(rows, path):
+    """Reference path: assign every cell through python-docx"""
+    doc = Document()
+    table = doc.add_table(rows=len(rows), cols=COLUMNS)
+    table.style = "Table Grid"
+    for i, values in enumerate(rows):
+        row = table.rows[i]
+        for j, value in enumerate(values):
+            row.cells[j].text = value
+    doc.save(path)
+
+
+def build_bulk(rows, path):
+    """Bulk path used by exports.renderers.create_word_doc"""
+    doc = Document()
+    add_table(doc, rows, cols=COLUMNS)
+    doc.save(path)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 3000
+    rows = sample_rows(count)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        _, bulk_time = benchmark_function(build_bulk, rows, os.path.join(temp_dir, "bulk.docx"))
+        _, cell_time = benchmark_function(build_per_cell, rows, os.path.join(temp_dir, "cells.docx"))
+
+    print(f"Rows: {count}")
+    print(f"Per-cell python-docx: {cell_time:.2f}s")
+    print(f"Bulk table writer:    {bulk_time:.2f}s")
+    print(f"Speedup:              {cell_time / bulk_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
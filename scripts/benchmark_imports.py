@@ -0,0 +1,78 @@
+"""
+Cold-start benchmark for the Stream Bill Generator
+Imports each entry-point module in a fresh interpreter with
+``python -X importtime`` and reports its cumulative import time, the heaviest
+dependencies and which heavy libraries were loaded eagerly.
+
+Usage:
+    python scripts/benchmark_imports.py [module ...]
+"""
+import os
+import subprocess
+import sys
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+DEFAULT_MODULES = [
+    "app.main",
+    "exports.renderers",
+    "core.pdf_generator_optimized",
+    "data.cache_utils",
+    "data.redis_cache",
+]
+
+# Libraries that should load on first use, not at import
+HEAVY_LIBRARIES = ["pandas", "numpy", "docx", "pypdf", "jinja2", "reportlab", "xhtml2pdf", "weasyprint", "pyarrow"]
+
+
+def import_profile(module):
+    """
+    Import a module in a fresh interpreter and parse ``-X importtime``
+
+    Args:
+        module (str): Dotted module name
+
+    Returns:
+        dict: Cumulative import time in microseconds by module name; the
+        entry for ``module`` itself is its total cold import time
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT_DIR, capture_output=True, text=True, timeout=120,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+
+    # Lines are printed after each import finishes, so a top-level import is
+    # preceded by everything it pulled in; interpreter startup comes earlier
+    cumulative = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative_us, name = line[len("import time:"):].split("|")
+        if not cumulative_us.strip().isdigit():
+            continue
+        cumulative[name.strip()] = int(cumulative_us)
+        if name[1:2] != " ":  # top level
+            if name.strip() == module:
+                return cumulative
+            cumulative = {}
+    return cumulative
+
+
+def main():
+    modules = sys.argv[1:] or DEFAULT_MODULES
+    for module in modules:
+        profile = import_profile(module)
+        eager = [lib for lib in HEAVY_LIBRARIES if lib in profile]
+        heaviest = sorted(
+            ((us, name) for name, us in profile.items() if name != module and "." not in name),
+            reverse=True,
+        )[:3]
+        print(f"{module:32s} {profile.get(module, 0) / 1000:8.1f} ms  eager: {', '.join(eager) or '-'}")
+        for us, name in heaviest:
+            print(f"    {name:28s} {us / 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+JSON serialization benchmark for the Stream Bill Generator
+Compares the previous pretty-printed json.dump export and json.dumps cache-key
+hashing with the shared backend in data.json_backend on a large bill.
+
+Usage:
+    python scripts/benchmark_json.py [items]
+"""
+import hashlib
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from data import json_backend
+from scripts.monitoring import benchmark_function
+
+
+def sample_bill(count):
+    """Build bill data with `count` first page and deviation items"""
+    items = [
+        {
+            "serial_no": str(i), "description": f"Item of work number {i}", "unit": "Nos",
+            "quantity": 10.0, "rate": 125.5, "amount": 1255, "remark": "", "is_divider": False,
+        }
+        for i in range(count)
+    ]
+    deviation = [
+        {
+            "serial_no": str(i), "description": f"Item of work number {i}", "unit": "Nos",
+            "qty_wo": 10.0, "rate": 125.5, "amt_wo": 1255, "qty_bill": 12.0, "amt_bill": 1506,
+            "excess_qty": 2.0, "excess_amt": 251, "saving_qty": 0, "saving_amt": 0, "remark": "",
+        }
+        for i in range(count)
+    ]
+    return {
+        "first_page": {"header": [["Agreement No.", "48/2024-25"]], "items": items,
+                       "totals": {"grand_total": 1255 * count, "payable": 1318 * count}},
+        "deviation_statement": {"items": deviation, "summary": {"work_order_total": 1255 * count}},
+    }
+
+
+def legacy_export(data):
+    return json.dumps(data, indent=2, ensure_ascii=False, default=str).encode("utf-8")
+
+
+def legacy_hash(data):
+    payload = json.dumps(data, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    return hashlib.sha256(payload).hexdigest()
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    data = sample_bill(count)
+
+    legacy_bytes, legacy_export_time = benchmark_function(legacy_export, data)
+    backend_bytes, backend_export_time = benchmark_function(json_backend.dumps, data)
+    _, legacy_hash_time = benchmark_function(legacy_hash, data)
+    _, backend_hash_time = benchmark_function(json_backend.stable_hash, data)
+
+    backend = "orjson" if json_backend.ORJSON_AVAILABLE else "json (compact)"
+    print(f"Items: {count} first page + {count} deviation, backend: {backend}")
+    print(f"Export  json.dump indent=2: {legacy_export_time * 1000:8.1f} ms  {len(legacy_bytes) / 1e6:6.2f} MB")
+    print(f"Export  json_backend:       {backend_export_time * 1000:8.1f} ms  {len(backend_bytes) / 1e6:6.2f} MB")
+    print(f"Hash    json.dumps sorted:  {legacy_hash_time * 1000:8.1f} ms")
+    print(f"Hash    stable_hash:        {backend_hash_time * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
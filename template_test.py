@@ -1,6 +1,8 @@
 import os
 from jinja2 import Environment, FileSystemLoader
 
+from exports.view_models import build_view_model
+
 # Set up Jinja2 environment with absolute path to templates directory
 template_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates")
 print(f"Template directory: {template_dir}")
@@ -12,7 +14,8 @@ try:
     print("✓ Successfully loaded first_page.html template")
     
     # Try to render it with minimal data
-    html_content = template.render(data={"header": [], "items": [], "totals": {}})
+    data = {"header": [], "items": [], "totals": {}}
+    html_content = template.render(data=data, view=build_view_model("first_page", data))
     print("✓ Successfully rendered first_page.html template")
     
 except Exception as e:
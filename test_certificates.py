@@ -5,6 +5,8 @@ Test script to verify certificate templates are properly linked with data
 import os
 from jinja2 import Environment, FileSystemLoader
 
+from exports.view_models import build_view_model
+
 def test_certificate_templates():
     """Test that certificate templates render correctly with sample data"""
     
@@ -59,7 +61,7 @@ def test_certificate_templates():
     print("\n=== Testing Certificate III Template ===")
     try:
         template = env.get_template("certificate_iii.html")
-        html_content = template.render(data=certificate_iii_data)
+        html_content = template.render(data=certificate_iii_data, view=build_view_model("certificate_iii", certificate_iii_data))
         print(f"✅ Certificate III template rendered successfully")
         print(f"HTML length: {len(html_content)} characters")
         
@@ -4,6 +4,8 @@ Test script to verify that the updated templates work correctly
 import os
 from jinja2 import Environment, FileSystemLoader
 
+from exports.view_models import build_view_model
+
 def test_template_rendering():
     """Test rendering of all templates with sample data"""
     # Set up Jinja2 environment
@@ -171,7 +173,7 @@ def test_template_rendering():
     for template_name, data in templates:
         try:
             template = env.get_template(template_name)
-            rendered = template.render(data=data)
+            rendered = template.render(data=data, view=build_view_model(template_name, data))
             print(f"✅ {template_name} rendered successfully ({len(rendered)} characters)")
         except Exception as e:
             print(f"❌ {template_name} rendering failed: {e}")
@@ -55,6 +55,78 @@ class TestModularization(unittest.TestCase):
         self.assertEqual(safe_float("abc"), 0.0)
         self.assertEqual(safe_float("12,345.67"), 12345.67)
 
+    def test_coerce_numeric_function(self):
+        """Test that coerce_numeric matches safe_float cell by cell"""
+        import numpy as np
+        import pandas as pd
+        from core.computations.bill_processor import coerce_numeric, safe_float
+
+        values = [None, float("nan"), "", "   ", "abc", "12,345.67", " 1 000 ", 5, 2.5, True, "1_000",
+                  pd.Timestamp("2024-01-01"), "nan", " NaN ", "inf", b"12", 3 + 4j, np.int64(7), np.float32(1.5),
+                  np.float64(2.5), np.complex128(2), pd.NA]
+        expected = [safe_float(v) for v in values]
+        # The scalar semantics stay as they always were
+        self.assertEqual(expected[15:20], [0.0, 0.0, 0.0, 0.0, 2.5])
+        self.assertTrue(all(np.isnan(expected[i]) for i in (1, 12, 13)))
+
+        def same(actual):
+            np.testing.assert_array_equal(np.asarray(actual, dtype=float), np.asarray(expected, dtype=float))
+
+        same(coerce_numeric(pd.Series(values, dtype=object)))
+        same(coerce_numeric(values))
+
+        # Numeric columns convert as numbers; other dtypes are judged by the values they hold
+        self.assertEqual(coerce_numeric(pd.Series([1.5, 3])).tolist(), [1.5, 3.0])
+        self.assertEqual(coerce_numeric(pd.Series([1, None], dtype="Int64"), default=9).tolist(), [1.0, 9.0])
+        self.assertEqual(coerce_numeric([], default=1.0).tolist(), [])
+        self.assertEqual(coerce_numeric(pd.Series([1 + 2j, 3j])).tolist(), [0.0, 0.0])
+
+    def test_normalize_header_function(self):
+        """Test that header cells arrive as render-ready strings"""
+        import pandas as pd
+        from core.computations.bill_processor import normalize_header
+
+        block = pd.DataFrame([
+            ["Agreement No.", " 48/2024-25 ", None],
+            [pd.Timestamp("2024-03-05"), "2024-01-31 00:00:00", 12.5],
+        ], dtype=object)
+        self.assertEqual(normalize_header(block), [
+            ["Agreement No.", "48/2024-25", ""],
+            ["05-03-2024", "31/01/2024", "12.5"],
+        ])
+
+    def test_process_bill_fingerprint(self):
+        """Test that process_bill tags its output with a structural fingerprint"""
+        import pickle
+        import tempfile
+        import pandas as pd
+        from core.computations.bill_processor import process_bill
+        from exports.advanced_formats import export_bill_data
+
+        def sheets(rate):
+            wo = pd.DataFrame([[None] * 7] * 21 + [["1", "Earthwork", "cum", 10, rate, None, ""]], dtype=object)
+            bq = pd.DataFrame([[None] * 7] * 21 + [["1", "Earthwork", "cum", 12, rate, None, ""]], dtype=object)
+            extra = pd.DataFrame([[None] * 6] * 6, dtype=object)
+            return wo, bq, extra
+
+        first = process_bill(*sheets(100), 5, "above")
+        again = process_bill(*sheets(100), 5, "above")
+        fingerprints = [part.fingerprint for part in first]
+        self.assertEqual(len(set(fingerprints)), 5)
+        self.assertEqual(fingerprints, [part.fingerprint for part in again])
+        self.assertEqual(pickle.loads(pickle.dumps(first[0])).fingerprint, fingerprints[0])
+
+        self.assertNotEqual(process_bill(*sheets(101), 5, "above")[0].fingerprint, fingerprints[0])
+        self.assertNotEqual(process_bill(*sheets(100), 5, "below")[0].fingerprint, fingerprints[0])
+
+        # The fingerprint is not bill data and must stay out of the exports
+        with tempfile.TemporaryDirectory() as temp_dir:
+            for path in export_bill_data(*first, temp_dir):
+                with open(path, encoding="utf-8") as f:
+                    content = f.read()
+                self.assertNotIn("fingerprint", content, path)
+                self.assertNotIn(fingerprints[0].split(":")[0], content, path)
+
     def test_number_to_words_function(self):
         """Test the number_to_words function from core module"""
         from core.computations.bill_processor import number_to_words
@@ -10,6 +10,28 @@ import json
 # Add the parent directory to the path so we can import the modules
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
 
+def _loaded_modules(names):
+    """Pre-fork pool task: which of names the worker has already imported"""
+    return [name for name in names if name in sys.modules]
+
+def _allocate(size):
+    """Pre-fork pool task: allocate size bytes"""
+    return len(bytearray(size))
+
+def _burn_cpu(seconds):
+    """Pre-fork pool task: spin for seconds of CPU time"""
+    import time
+    start = time.process_time()
+    while time.process_time() - start < seconds:
+        pass
+
+def _publish_item_tables(rows):
+    """Pre-fork pool task: share a bill's item tables and hand the segment to the caller"""
+    from exports.advanced_formats import share_item_tables
+    first_page = {"header": [["Agreement No.", "48/2024-25"]],
+                  "items": [{"serial_no": str(i), "quantity": i, "rate": 2.5} for i in range(rows)]}
+    return share_item_tables(first_page, {"items": []}, {"items": []}).release()
+
 class TestOptimizations(unittest.TestCase):
     
     def test_redis_cache_import(self):
@@ -21,7 +43,562 @@ class TestOptimizations(unittest.TestCase):
         except ImportError as e:
             # This is expected if Redis is not installed
             print(f"Redis cache module import test skipped: {e}")
-    
+
+    def test_in_memory_cache_bounds(self):
+        """Test LRU eviction, the byte budget, expiry and counters of InMemoryCache"""
+        from data.cache_utils import InMemoryCache, get_cache
+        from config.settings import get_setting
+
+        memory = getattr(get_cache(), "memory", get_cache())
+        self.assertEqual(memory.max_entries, get_setting("performance.max_cache_size"))
+
+        cache = InMemoryCache(max_entries=2, max_bytes=10_000, sweep_interval=0)
+        cache.set("a", "x")
+        cache.set("b", "y")
+        self.assertEqual(cache.get("a"), "x")  # "b" becomes least recently used
+        cache.set("c", "z")
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), "x")
+
+        cache.set("big", b"0" * 8_000)
+        cache.set("bigger", b"0" * 8_000)
+        self.assertIsNone(cache.get("big"))
+        self.assertLessEqual(cache.stats()["bytes"], 10_000)
+        cache.set("huge", b"0" * 20_000)
+        self.assertIsNone(cache.get("huge"))
+
+        cache.set("old", 1, ttl=-1)
+        self.assertEqual(cache.sweep(), 1)
+
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (2, 3))
+        self.assertEqual(stats["evictions"], 4)
+        self.assertEqual(stats["expirations"], 1)
+
+    def test_disk_cache_persists_and_evicts(self):
+        """Test that the disk tier survives a restart and stays under its size cap"""
+        import time
+        from data.cache_utils import InMemoryCache, TieredCache, cache_namespace
+        from data.disk_cache import DiskCache
+
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache = TieredCache(InMemoryCache(sweep_interval=0), DiskCache(cache_dir, max_bytes=10_000))
+            cache.set("bill", ({"items": [1, 2]}, {"payable_amount": 85000}))
+            cache.set("pdf", b"%PDF-1.4" + b"0" * 4_000)
+            cache.set("gone", "html", ttl=-1)
+
+            # A fresh process sees the same entries through the index
+            restarted = DiskCache(cache_dir, max_bytes=10_000)
+            self.assertEqual(restarted.get("bill"), ({"items": [1, 2]}, {"payable_amount": 85000}))
+            self.assertTrue(restarted.get("pdf").startswith(b"%PDF"))
+            self.assertIsNone(restarted.get("gone"))
+
+            # "bill" was read last, so the PDF is the least recently used entry
+            time.sleep(0.01)
+            restarted.get("bill")
+            restarted.set("other", b"1" * 7_000)
+            self.assertIsNone(restarted.get("pdf"))
+            self.assertEqual(restarted.get("bill")[1]["payable_amount"], 85000)
+            self.assertLessEqual(restarted.stats()["bytes"], 10_000)
+            self.assertEqual(len(os.listdir(os.path.join(cache_dir, "blobs"))), restarted.stats()["entries"])
+
+            # Old orphaned blobs and temporary files are swept; fresh ones may be a write in progress
+            blobs = os.path.join(cache_dir, "blobs")
+            for name in ("orphan-1234abcd", "tmp1234.tmp", "fresh-5678abcd"):
+                with open(os.path.join(blobs, name), "wb") as f:
+                    f.write(b"0" * 100)
+            for name in ("orphan-1234abcd", "tmp1234.tmp"):
+                os.utime(os.path.join(blobs, name), (time.time() - 3600, time.time() - 3600))
+            self.assertEqual(restarted.sweep(), 2)
+            self.assertEqual(len(os.listdir(blobs)), restarted.stats()["entries"] + 1)
+            os.remove(os.path.join(blobs, "fresh-5678abcd"))
+
+            # Disk hits are promoted with their remaining lifetime
+            restarted.set("short", "html", ttl=1)
+            promoted = TieredCache(InMemoryCache(sweep_interval=0), restarted)
+            self.assertEqual(promoted.get("short"), "html")
+            self.assertLessEqual(promoted.memory._entries["short"][1], time.time() + 1)
+
+            # Another code version reads and writes its own namespace
+            upgraded = TieredCache(InMemoryCache(sweep_interval=0), restarted, namespace=cache_namespace())
+            self.assertIsNone(upgraded.get("bill"))
+            upgraded.set("bill", "new")
+            self.assertEqual(restarted.get("bill")[1]["payable_amount"], 85000)
+            self.assertEqual(cache_namespace(), cache_namespace())
+
+            restarted.clear()
+            self.assertEqual(os.listdir(os.path.join(cache_dir, "blobs")), [])
+            cache.disk.close()
+            restarted.close()
+
+    def test_single_flight_shares_one_computation(self):
+        """Test that concurrent identical requests run the computation once"""
+        import threading
+        import time
+        from concurrent.futures import ThreadPoolExecutor
+        from data.single_flight import SingleFlight
+
+        with tempfile.TemporaryDirectory() as lock_dir:
+            group = SingleFlight(lock_dir)
+            calls = []
+            started = threading.Event()
+
+            def render():
+                calls.append(1)
+                started.set()
+                time.sleep(0.2)
+                return b"%PDF"
+
+            with ThreadPoolExecutor(max_workers=4) as pool:
+                leader = pool.submit(group.do, "pdf:First Page", render)
+                started.wait()
+                followers = [pool.submit(group.do, "pdf:First Page", render) for _ in range(3)]
+                results = [leader.result()] + [f.result() for f in followers]
+            self.assertEqual(results, [b"%PDF"] * 4)
+            self.assertEqual(len(calls), 1)
+            self.assertEqual(group.in_flight("pdf:First Page"), 0)
+
+            # Errors reach every waiter, and the next call computes again
+            with self.assertRaises(ValueError):
+                group.do("bad", lambda: (_ for _ in ()).throw(ValueError("boom")))
+            self.assertEqual(group.do("bad", lambda: 1), 1)
+
+            # A result stored by another process is picked up after the lock
+            self.assertEqual(group.do("stored", lambda: self.fail("recomputed"), lookup=lambda: "cached"), "cached")
+
+            # Separate groups contend like separate processes; lock files are removed afterwards
+            other = SingleFlight(lock_dir)
+            store = {}
+            holding = threading.Event()
+
+            def slow_render():
+                holding.set()
+                time.sleep(0.2)
+                store["pdf"] = b"%PDF"
+                return store["pdf"]
+
+            with ThreadPoolExecutor(max_workers=2) as pool:
+                first = pool.submit(group.do, "pdf:Last Page", slow_render)
+                holding.wait()
+                second = pool.submit(other.do, "pdf:Last Page", lambda: self.fail("recomputed"),
+                                     lambda: store.get("pdf"))
+                self.assertEqual([first.result(), second.result()], [b"%PDF", b"%PDF"])
+            self.assertEqual(os.listdir(lock_dir), [])
+
+    def test_hybrid_cache_tiers(self):
+        """Test L1/L2 read-through, namespacing and the circuit breaker of HybridCache"""
+        import fnmatch
+        import pickle
+        import time
+        from data.cache_utils import InMemoryCache
+        from data.redis_cache import HybridCache, RedisCache
+
+        class LocalRedis:
+            """Minimal in-process stand-in for the redis-py client"""
+            def __init__(self):
+                self.store = {}
+            def pipeline(self, transaction=True):
+                return LocalPipeline(self)
+            def set(self, key, value):
+                self.store[key] = value
+                return True
+            def setex(self, key, ttl, value):
+                return self.set(key, value)
+            def get(self, key):
+                return self.store.get(key)
+            def mget(self, keys):
+                return [self.store.get(key) for key in keys]
+            def delete(self, *keys):
+                return sum(self.store.pop(key, None) is not None for key in keys)
+            def scan_iter(self, match="*", count=None):
+                return [key for key in list(self.store) if fnmatch.fnmatch(key, match)]
+
+        class LocalPipeline:
+            def __init__(self, client):
+                self.client, self.calls = client, []
+            def setex(self, *args):
+                self.calls.append(args)
+            def execute(self):
+                return [self.client.setex(*args) for args in self.calls]
+
+        try:
+            import fakeredis
+            client = fakeredis.FakeRedis()
+        except ImportError:
+            client = LocalRedis()
+        client.set("foreign", b"keep")
+
+        l2 = RedisCache(client=client, namespace="test")
+        cache = HybridCache(redis_cache=l2, memory_cache=InMemoryCache(sweep_interval=0))
+        cache.set_many({"pdf": b"%PDF-1.4", "bill": {"payable": 85000}})
+        self.assertEqual(pickle.loads(client.get("test:pdf")), b"%PDF-1.4")
+
+        # A second process reads the values through Redis and fills its own L1
+        other = HybridCache(redis_cache=l2, memory_cache=InMemoryCache(sweep_interval=0))
+        self.assertEqual(other.mget(["pdf", "bill", "missing"]), [b"%PDF-1.4", {"payable": 85000}, None])
+        self.assertEqual(other.memory_cache.get("pdf"), b"%PDF-1.4")
+
+        # Writes fill L1 for at most l1_ttl too, so another process's delete shows up
+        short = HybridCache(redis_cache=l2, memory_cache=InMemoryCache(sweep_interval=0), l1_ttl=0)
+        short.set("stale", "old")
+        other.delete("stale")
+        time.sleep(0.01)
+        self.assertIsNone(short.get("stale"))
+
+        cache.clear()
+        self.assertIsNone(other.redis_cache.get("bill"))
+        self.assertIn("foreign", [key.decode() if isinstance(key, bytes) else key for key in client.scan_iter()])
+
+        class DownRedis:
+            def __getattr__(self, name):
+                raise ConnectionError("redis down")
+
+        broken = RedisCache(client=DownRedis(), retry_after=60)
+        fallback = HybridCache(redis_cache=broken, memory_cache=InMemoryCache(sweep_interval=0))
+        fallback.set("key", "value")
+        self.assertFalse(broken.available)
+        self.assertEqual(fallback.get("key"), "value")
+
+    def test_redis_connection_is_lazy(self):
+        """Test that Redis connects in the background with backoff, never at import"""
+        import subprocess
+        import time
+        from data.redis_cache import RedisCache
+
+        probe = ("import sys, data.redis_cache as m; "
+                 "print(m._hybrid_cache is None, 'redis.client' in sys.modules)")
+        output = subprocess.run([sys.executable, "-c", probe], capture_output=True, text=True,
+                                cwd=os.path.join(os.path.dirname(__file__), ".."), timeout=60).stdout
+        self.assertEqual(output.split(), ["True", "False"])
+
+        class Client:
+            def ping(self):
+                return True
+
+        attempts = []
+
+        def factory():
+            attempts.append(time.monotonic())
+            if len(attempts) < 3:
+                raise ConnectionError("refused")
+            return Client()
+
+        cache = RedisCache(client_factory=factory, backoff=0.02, health_interval=0.05)
+        try:
+            self.assertFalse(cache.available)  # Returns at once while connecting
+            deadline = time.monotonic() + 5
+            while not cache.available and time.monotonic() < deadline:
+                time.sleep(0.01)
+            self.assertTrue(cache.available)
+            self.assertEqual(len(attempts), 3)
+            self.assertGreaterEqual(attempts[2] - attempts[1], 0.02)  # second delay doubled, less jitter
+        finally:
+            cache.close()
+
+    def test_import_time_budget(self):
+        """Test that entry points import without heavy libraries, within a time budget"""
+        from scripts.benchmark_imports import HEAVY_LIBRARIES, import_profile
+
+        budgets_ms = {"exports.renderers": 250, "core.pdf_generator_optimized": 100, "data.redis_cache": 150}
+        for module, budget_ms in budgets_ms.items():
+            profile = import_profile(module)
+            self.assertEqual([lib for lib in HEAVY_LIBRARIES if lib in profile], [], module)
+            self.assertLess(profile[module] / 1000, budget_ms, module)
+
+        # The app only pays for Streamlit until a bill is processed
+        profile = import_profile("app.main")
+        self.assertNotIn("pandas", profile)
+        self.assertNotIn("exports.renderers", profile)
+
+    def test_prefork_pool_workers_start_warm(self):
+        """Test that forked workers inherit the warmed renderers and are replaced when they die"""
+        from core.prefork import FORK_AVAILABLE, PreforkPool, WorkerCrashed
+        if not FORK_AVAILABLE:
+            self.skipTest("fork not available")
+
+        with PreforkPool(workers=2) as pool:
+            self.assertIn("templates", pool.warm_up_timings)
+            modules = ["exports.renderers", "jinja2", "docx", "core.pdf_generator_optimized"]
+            self.assertEqual(pool.submit(_loaded_modules, modules).result(timeout=30), modules)
+            self.assertEqual(list(pool.map(abs, [-1, -2, 3])), [1, 2, 3])
+
+            with self.assertRaises(ValueError):
+                pool.submit(int, "not a number").result(timeout=30)
+
+            crashed = pool.submit(os._exit, 3)
+            with self.assertRaises(WorkerCrashed):
+                crashed.result(timeout=30)
+            self.assertEqual(pool.submit(abs, -4).result(timeout=30), 4)
+            self.assertEqual(len(pool.worker_pids()), 2)
+
+    def test_prefork_workers_are_recycled_and_contained(self):
+        """Test worker recycling, per-job memory and CPU limits, and per-worker memory metrics"""
+        from core.prefork import FORK_AVAILABLE, RESOURCE_AVAILABLE, PreforkPool, WorkerCrashed
+        if not (FORK_AVAILABLE and RESOURCE_AVAILABLE and os.path.exists("/proc/self/statm")):
+            self.skipTest("fork, resource limits or /proc not available")
+
+        with PreforkPool(workers=1, warm=None, max_tasks_per_worker=2, max_rss_bytes=0,
+                         job_memory_limit=256 * 1024 ** 2, job_cpu_limit=1) as pool:
+            pids = [pool.submit(os.getpid).result(timeout=30) for _ in range(5)]
+            self.assertEqual(len(set(pids)), 3)
+            self.assertEqual(pool.stats()["recycled"], 2)
+
+            # Over the address-space limit: MemoryError for this job, then a fresh worker
+            with self.assertRaises(MemoryError):
+                pool.submit(_allocate, 1024 ** 3).result(timeout=30)
+            self.assertEqual(pool.submit(_allocate, 64 * 1024 ** 2).result(timeout=30), 64 * 1024 ** 2)
+
+            # Over the CPU limit: SIGXCPU kills only the worker
+            with self.assertRaises(WorkerCrashed):
+                pool.submit(_burn_cpu, 10).result(timeout=30)
+            self.assertEqual(pool.submit(abs, -1).result(timeout=30), 1)
+
+            stats = pool.stats()
+            self.assertEqual((stats["recycled"], stats["crashed"]), (3, 1))
+            self.assertEqual(len(stats["workers"]), 1)
+            self.assertGreater(stats["workers"][0]["rss_bytes"], 0)
+
+    def test_shared_tables_transport(self):
+        """Test that worker tables arrive through shared memory and every segment is unlinked"""
+        from core.prefork import FORK_AVAILABLE, PreforkPool
+        from data.shared_tables import PYARROW_AVAILABLE, SHM_DIR, SharedTables, attach_tables
+        if not (FORK_AVAILABLE and PYARROW_AVAILABLE and os.path.isdir(SHM_DIR)):
+            self.skipTest("fork, pyarrow or /dev/shm not available")
+        import pyarrow as pa
+
+        def segment_exists(name):
+            return os.path.exists(os.path.join(SHM_DIR, name.lstrip("/")))
+
+        with PreforkPool(workers=1, warm=None) as pool:
+            handle = pool.submit(_publish_item_tables, 1000).result(timeout=30)
+        self.assertTrue(segment_exists(handle.name))
+
+        allocated = pa.total_allocated_bytes()
+        with attach_tables(handle, unlink=True) as tables:
+            work_order = tables["work_order"]
+            self.assertEqual(work_order.num_rows, 1000)
+            self.assertEqual(work_order.column("bill_id")[0].as_py(), handle.metadata["bill_id"])
+            self.assertEqual(pa.total_allocated_bytes(), allocated)  # mapped, not copied
+        self.assertFalse(segment_exists(handle.name))
+        self.assertEqual(work_order.column("quantity")[999].as_py(), 999.0)  # still mapped
+
+        table = pa.table({"x": [1.5, 2.5]})
+        with SharedTables({"t": table}) as shared:
+            with attach_tables(shared.handle) as tables:
+                self.assertTrue(tables["t"].equals(table))
+        self.assertFalse(segment_exists(shared.name))
+
+        shared = SharedTables({"t": table})
+        name = shared.name
+        del shared
+        self.assertFalse(segment_exists(name))
+
+    def test_hedged_rendering_deadlines(self):
+        """Test that a hung engine is hedged with the next one and killed at its deadline"""
+        import time
+        from core.pdf_generator_optimized import ISOLATION_AVAILABLE, PDFGenerator, get_render_metrics
+        if not ISOLATION_AVAILABLE:
+            self.skipTest("fork not available")
+
+        class FakeEngines(PDFGenerator):
+            def generate_pdf(self, html_content, output_path, engine=None):
+                if engine == "hang":
+                    time.sleep(60)
+                with open(output_path, "wb") as f:
+                    f.write(b"%PDF-1.4\n%%EOF\n" if engine == "ok" else b"<html>not a pdf</html>")
+                return True
+
+        from core.engine_health import EngineHealth
+
+        generator = FakeEngines()
+        metrics = get_render_metrics()
+        metrics.reset()
+        with tempfile.TemporaryDirectory() as temp_dir, tempfile.TemporaryDirectory() as health_dir:
+            generator.health = EngineHealth(os.path.join(health_dir, "health.sqlite3"), failure_threshold=5)
+            pdf_path = os.path.join(temp_dir, "sheet.pdf")
+
+            # The backup starts after hedge_after and wins; the hung engine is killed
+            generator.available_engines = ["hang", "ok"]
+            start = time.monotonic()
+            self.assertEqual(generator.generate_with_fallback("<p/>", pdf_path, engine_timeout=30, hedge_after=0.1), "ok")
+            self.assertLess(time.monotonic() - start, 10)
+            with open(pdf_path, "rb") as f:
+                self.assertTrue(f.read().startswith(b"%PDF-"))
+
+            # Invalid output counts as a failure; the deadline bounds the whole call
+            generator.available_engines = ["hang", "broken"]
+            start = time.monotonic()
+            with self.assertRaises(Exception):
+                generator.generate_with_fallback("<p/>", pdf_path, engine_timeout=0.3, hedge_after=30)
+            self.assertLess(time.monotonic() - start, 10)
+            self.assertEqual(os.listdir(temp_dir), ["sheet.pdf"])
+
+        stats = metrics.stats()
+        self.assertEqual((stats["renders"], stats["hedged"], stats["failed"]), (2, 1, 1))
+        self.assertEqual(stats["engines"]["hang"]["cancelled"], 1)
+        self.assertEqual(stats["engines"]["hang"]["timeouts"], 1)
+        self.assertEqual(stats["engines"]["ok"]["wins"], 1)
+        self.assertEqual(stats["engines"]["broken"]["failures"], 1)
+
+    def test_hedged_rendering_from_thread_pool(self):
+        """Test that engine children forked from a thread pool worker report success"""
+        import threading
+        from concurrent.futures import ThreadPoolExecutor
+        from core.engine_health import EngineHealth
+        from core.font_registry import get_font_registry
+        from core.pdf_generator_optimized import ISOLATION_AVAILABLE, PDFGenerator, detect_engines, is_valid_pdf
+        if not ISOLATION_AVAILABLE:
+            self.skipTest("fork not available")
+
+        # Engine modules are loaded before any attempt is forked
+        if "reportlab" in detect_engines():
+            self.assertIn("reportlab.platypus", sys.modules)
+
+        class FakeEngines(PDFGenerator):
+            def generate_pdf(self, html_content, output_path, engine=None):
+                with get_font_registry()._lock:
+                    with open(output_path, "wb") as f:
+                        f.write(b"%PDF-1.4\n%%EOF\n")
+                return True
+
+        # Another thread holds the font registry lock while the children fork
+        held, done = threading.Event(), threading.Event()
+
+        def hold_registry_lock():
+            with get_font_registry()._lock:
+                held.set()
+                done.wait(30)
+
+        holder = threading.Thread(target=hold_registry_lock)
+        holder.start()
+        held.wait()
+
+        generator = FakeEngines()
+        generator.available_engines = ["ok"]
+        try:
+            with tempfile.TemporaryDirectory() as temp_dir:
+                generator.health = EngineHealth(os.path.join(temp_dir, "health.sqlite3"))
+                paths = [os.path.join(temp_dir, f"sheet{i}.pdf") for i in range(4)]
+                with ThreadPoolExecutor(max_workers=2) as pool:
+                    engines = list(pool.map(
+                        lambda path: generator.generate_with_fallback("<p/>", path, engine_timeout=10), paths))
+                self.assertEqual(engines, ["ok"] * 4)
+                self.assertTrue(all(map(is_valid_pdf, paths)))
+        finally:
+            done.set()
+            holder.join()
+
+    def test_engine_circuit_breaker(self):
+        """Test that a failing engine is skipped once its breaker opens, and probed after the cool-down"""
+        import signal
+        import time
+        from core.engine_health import EngineHealth
+        from core.pdf_generator_optimized import ISOLATION_AVAILABLE, PDFGenerator, get_render_metrics
+
+        class FakeEngines(PDFGenerator):
+            def generate_pdf(self, html_content, output_path, engine=None):
+                if engine == "crash":
+                    os.kill(os.getpid(), signal.SIGKILL)
+                if engine == "hang":
+                    time.sleep(60)
+                with open(output_path, "wb") as f:
+                    f.write(b"%PDF-1.4\n%%EOF\n")
+                return engine == "ok"
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            health_path = os.path.join(temp_dir, "health.sqlite3")
+            generator = FakeEngines()
+            generator.available_engines = ["broken", "ok"]
+            generator.health = EngineHealth(health_path, failure_threshold=2, reset_timeout=0.3)
+            metrics = get_render_metrics()
+            metrics.reset()
+
+            pdf_path = os.path.join(temp_dir, "sheet.pdf")
+            for _ in range(4):
+                self.assertEqual(generator.generate_with_fallback("<p/>", pdf_path), "ok")
+            self.assertEqual(metrics.stats()["engines"]["broken"]["attempts"], 2)
+            self.assertEqual(metrics.stats()["engines"]["broken"]["skipped"], 2)
+
+            # Other processes share the state through the database
+            other = EngineHealth(health_path, failure_threshold=2, reset_timeout=0.3)
+            self.assertEqual(other.state("broken"), "open")
+            self.assertFalse(other.allow("broken"))
+            self.assertTrue(other.allow("ok"))
+
+            # After the cool-down exactly one caller probes; a failed probe reopens the breaker
+            time.sleep(0.35)
+            self.assertEqual(other.state("broken"), "half_open")
+            self.assertTrue(other.allow("broken"))
+            self.assertFalse(generator.health.allow("broken"))
+            other.record_failure("broken")
+            self.assertEqual(other.state("broken"), "open")
+
+            time.sleep(0.35)
+            self.assertTrue(generator.health.allow("broken"))
+            generator.health.record_success("broken")
+            self.assertEqual(other.state("broken"), "closed")
+
+            # With every breaker open the call fails without trying an engine
+            generator.available_engines = ["broken"]
+            for _ in range(2):
+                other.record_failure("broken")
+            metrics.reset()
+            with self.assertRaises(Exception):
+                generator.generate_with_fallback("<p/>", pdf_path)
+            broken = metrics.stats()["engines"]["broken"]
+            self.assertEqual((broken["attempts"], broken["skipped"]), (0, 1))
+
+            # An engine that never runs leaves its half-open probe to others
+            time.sleep(0.35)
+            generator.available_engines = ["ok", "broken"]
+            self.assertEqual(generator.generate_with_fallback("<p/>", pdf_path), "ok")
+            stale = other.allow("broken")
+            self.assertIsNotNone(stale)
+
+            # A claim that expired and was taken over can no longer be released by its first owner
+            time.sleep(0.35)
+            claim = generator.health.allow("broken")
+            self.assertIsNotNone(claim)
+            other.release("broken", stale)
+            self.assertIsNone(other.allow("broken"))
+            generator.health.release("broken", claim)
+            self.assertIsNotNone(other.allow("broken"))
+
+            # Crashed children and timeouts do not count against an engine
+            if ISOLATION_AVAILABLE:
+                generator.available_engines = ["crash", "hang", "ok"]
+                metrics.reset()
+                for _ in range(3):
+                    self.assertEqual(generator.generate_with_fallback("<p/>", pdf_path, engine_timeout=0.2), "ok")
+                self.assertEqual(set(other.snapshot()), {"broken"})
+                stats = metrics.stats()["engines"]
+                self.assertEqual((stats["crash"]["errors"], stats["hang"]["timeouts"]), (3, 3))
+
+    def test_font_registry_warms_template_fonts(self):
+        """Test template font discovery and that page stylesheets are compiled once, before forking"""
+        import glob
+        from core.font_registry import WEASYPRINT_AVAILABLE, FontRegistry, font_families
+        from core.pdf_generator_optimized import PDFGenerator
+
+        template_dir = os.path.join(os.path.dirname(__file__), "..", "templates")
+        sources = [PDFGenerator().get_base_css()]
+        for path in glob.glob(os.path.join(template_dir, "*.html")):
+            with open(path, encoding="utf-8") as f:
+                sources.append(f.read())
+        families = font_families(sources)
+        for family in ["Arial", "Calibri", "Times New Roman", "sans-serif"]:
+            self.assertIn(family, families)
+        self.assertEqual(len(families), len(set(families)))
+
+        page_css = [PDFGenerator(orientation).get_page_css() for orientation in ("portrait", "landscape")]
+        self.assertIn("size: A4 landscape", page_css[1])
+        self.assertEqual(page_css[0], PDFGenerator().get_page_css())
+        if WEASYPRINT_AVAILABLE:
+            registry = FontRegistry()
+            registry.preload(template_dir, page_css=page_css)
+            self.assertEqual(registry.stats()["stylesheets"], 2)
+            self.assertIs(registry.stylesheet(page_css[0]), registry.stylesheet(page_css[0]))
+
     def test_advanced_formats_import(self):
         """Test that the advanced formats module can be imported"""
         try:
@@ -83,6 +660,36 @@ class TestOptimizations(unittest.TestCase):
             if os.path.exists(tmp_path):
                 os.unlink(tmp_path)
     
+    def test_json_backend_is_deterministic(self):
+        """Test that the shared JSON backend sorts keys and stays compact"""
+        import datetime
+        from data import json_backend
+
+        first = {"b": [1, 2.5, None], "a": {"y": "ü", "x": datetime.date(2025, 3, 1)}}
+        second = {"a": {"x": datetime.date(2025, 3, 1), "y": "ü"}, "b": [1, 2.5, None]}
+
+        self.assertEqual(json_backend.dumps(first), json_backend.dumps(second))
+        self.assertEqual(json_backend.stable_hash(first), json_backend.stable_hash(second))
+        self.assertEqual(json_backend.dumps(first), '{"a":{"x":"2025-03-01","y":"ü"},"b":[1,2.5,null]}'.encode("utf-8"))
+        self.assertEqual(json_backend._stdlib_dumps(first, indent=False), json_backend.dumps(first))
+        self.assertEqual(json.loads(json_backend.dumps(first, indent=True)), json.loads(json_backend.dumps(first)))
+
+        # NaN, numpy scalars and non-string keys encode the same with or without orjson
+        import numpy as np
+        bill = {"qty": np.int64(7), "rate": np.float64("nan"), "inf": float("inf"), 2: np.array([1.5, 2]),
+                "when": datetime.datetime(2025, 3, 1, 9, 30), "tiny": 1e-7, "text": "a\x01b"}
+        expected = ('{"2":[1.5,2.0],"inf":null,"qty":7,"rate":null,"text":"a\\u0001b",'
+                    '"tiny":1e-07,"when":"2025-03-01 09:30:00"}').encode("utf-8")
+        self.assertEqual(json_backend.dumps(bill), expected)
+        plain, portable = json_backend._to_plain(bill)
+        self.assertFalse(portable)  # orjson writes exponents differently, so these stay with the stdlib
+        del bill["tiny"]
+        plain, portable = json_backend._to_plain(bill)
+        self.assertTrue(portable)
+        if json_backend.ORJSON_AVAILABLE:
+            for indent in (False, True):
+                self.assertEqual(json_backend._orjson_dumps(plain, indent), json_backend._stdlib_dumps(plain, indent))
+
     def test_xml_generation(self):
         """Test XML generation functionality"""
         from exports.advanced_formats import generate_xml
@@ -117,7 +724,259 @@ class TestOptimizations(unittest.TestCase):
             # Clean up
             if os.path.exists(tmp_path):
                 os.unlink(tmp_path)
-    
+
+    def test_streaming_xml_matches_element_tree(self):
+        """Test that the streaming XML writer keeps the dict_to_xml layout"""
+        import io
+        import xml.etree.ElementTree as ET
+        from exports.advanced_formats import dict_to_xml, write_xml_stream
+
+        items = [{"serial_no": str(i), "amount": i * 1.5} for i in range(3)]
+        data = {"totals": {"payable": 85000, "empty": ""}, "notes": ["a < b", None], "items": items}
+        expected = ET.tostring(dict_to_xml("bill", data), encoding="unicode")
+
+        # Items may be produced lazily by a generator
+        buffer = io.BytesIO()
+        write_xml_stream("bill", dict(data, items=(item for item in items)), buffer)
+        actual = buffer.getvalue().decode("utf-8")
+
+        self.assertTrue(actual.startswith("<?xml"))
+        self.assertEqual(ET.canonicalize(actual.split("?>", 1)[1]), ET.canonicalize(expected))
+
+    def test_parquet_dataset_export(self):
+        """Test typed Parquet export and partitioned dataset appends"""
+        from exports.advanced_formats import PYARROW_AVAILABLE, create_item_tables, write_parquet_dataset
+        if not PYARROW_AVAILABLE:
+            self.skipTest("pyarrow not installed")
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+
+        first_page = {
+            "header": [["Agreement No.", "48/2024-25"], ["Name of Contractor or supplier :"], ["M/s Test Firm"]],
+            "items": [{"serial_no": "1", "quantity": "2", "rate": 10.5, "amount": ""},
+                      {"description": "Divider", "is_divider": True}],
+        }
+        deviation = {"items": [{"serial_no": "1", "qty_wo": 1, "saving_amt": "1,250"}]}
+        extra = {"items": []}
+
+        tables = create_item_tables(first_page, deviation, extra)
+        work_order = tables["work_order"].to_pylist()
+        self.assertEqual(len(work_order), 1)
+        self.assertEqual(work_order[0]["agreement_no"], "48/2024-25")
+        self.assertEqual(work_order[0]["contractor"], "M/s Test Firm")
+        self.assertEqual(work_order[0]["quantity"], 2.0)
+        self.assertIsNone(work_order[0]["amount"])
+        self.assertEqual(tables["deviation"].schema.field("saving_amt").type, pa.float64())
+        self.assertEqual(tables["deviation"].column("saving_amt").to_pylist(), [1250.0])
+
+        with tempfile.TemporaryDirectory() as dataset_dir:
+            for _ in range(2):
+                self.assertTrue(write_parquet_dataset(first_page, deviation, extra, dataset_dir))
+            dataset = ds.dataset(os.path.join(dataset_dir, "deviation"), partitioning="hive")
+            self.assertEqual(dataset.to_table().num_rows, 2)
+
+    def test_lazy_artifacts(self):
+        """Test that lazy artifacts build on first use only and feed the ZIP"""
+        import zipfile
+        from exports.renderers import LazyArtifact, lazy_zip_archive
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            calls = []
+
+            def build():
+                calls.append(1)
+                path = os.path.join(temp_dir, "sheet.txt")
+                with open(path, "w") as f:
+                    f.write("sheet")
+                return path
+
+            sheet = LazyArtifact("sheet.txt", build)
+            archive = lazy_zip_archive([sheet], os.path.join(temp_dir, "bill.zip"))
+            self.assertFalse(sheet.is_built)
+            self.assertFalse(archive.is_built)
+
+            # Building the ZIP pulls in its inputs exactly once
+            archive.path()
+            self.assertEqual(sheet.read_bytes(), b"sheet")
+            self.assertEqual(len(calls), 1)
+            with zipfile.ZipFile(archive.path()) as zf:
+                self.assertEqual(zf.namelist(), ["sheet.txt"])
+
+    def test_build_artifacts_runs_stages_concurrently(self):
+        """Test that independent artifacts build in parallel and dependents wait for inputs"""
+        import threading
+        import time
+        from exports.renderers import LazyArtifact, build_artifacts
+
+        started = threading.Barrier(2, timeout=5)
+        order = []
+
+        def sheet(name):
+            def build():
+                started.wait()  # both sheets must be running at the same time
+                time.sleep(0.01)
+                order.append(name)
+                return name
+            return LazyArtifact(name, build)
+
+        first, second = sheet("first"), sheet("second")
+
+        def merge():
+            order.append("merged")
+            return "merged"
+
+        merged = LazyArtifact("merged", merge, inputs=[first, second])
+        self.assertEqual(build_artifacts([merged, first]), ["merged", "first"])
+        self.assertEqual(order[-1], "merged")
+        self.assertEqual(sorted(order[:2]), ["first", "second"])
+
+        def fail():
+            raise RuntimeError("engine failed")
+
+        with self.assertRaises(RuntimeError):
+            build_artifacts([LazyArtifact("zip", lambda: "zip", inputs=[LazyArtifact("bad", fail)])])
+
+        # Serial stages (sheet PDFs) never overlap, while other stages run beside them
+        active, overlaps = [], []
+        word_running = threading.Event()
+
+        def pdf(name):
+            def build():
+                active.append(name)
+                overlaps.append(len(active))
+                word_running.wait(5)
+                time.sleep(0.01)
+                active.remove(name)
+                return name
+            return LazyArtifact(name, build, serial=True)
+
+        def word():
+            word_running.set()
+            return "doc"
+
+        pdfs = [pdf(f"sheet{i}.pdf") for i in range(3)]
+        merged = LazyArtifact("merged", lambda: "merged", inputs=pdfs)
+        self.assertEqual(build_artifacts([merged, LazyArtifact("doc", word)] + pdfs)[:2], ["merged", "doc"])
+        self.assertEqual(overlaps, [1, 1, 1])
+
+    def test_view_models_match_across_formats(self):
+        """Test that the HTML and Word certificates print the same deductions"""
+        from docx import Document
+        from exports.renderers import create_word_doc, setup_jinja_environment
+        from exports.view_models import build_view_model, compute_deductions
+
+        deductions = compute_deductions(85000.6)
+        self.assertEqual(deductions["sd"], 8500)
+        self.assertEqual(deductions["gst"], 1700)
+        self.assertEqual(deductions["cheque"], 72250)
+
+        data = {"totals": {"grand_total": 100000, "payable": 85000}, "payable_words": "Eighty Five Thousand"}
+        view = build_view_model("Certificate III", data)
+        self.assertEqual(view["cheque"], "72,250")
+
+        template_dir = os.path.join(os.path.dirname(__file__), "..", "templates")
+        env = setup_jinja_environment(template_dir)
+        html = env.get_template("certificate_iii.html").render(data=data, view=view)
+        self.assertIn("Pay Rs. 72,250", html)
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            doc_path = os.path.join(temp_dir, "certificate_iii.docx")
+            create_word_doc("Certificate III", data, doc_path)
+            paragraphs = [p.text for p in Document(doc_path).paragraphs]
+            self.assertIn("Pay Rs. 72,250", "\n".join(paragraphs))
+
+    def test_deviation_statement_pagination(self):
+        """Test that large deviation statements render in page-sized blocks"""
+        from exports.renderers import iter_deviation_statement_pages, iter_deviation_statement_documents
+
+        template_dir = os.path.join(os.path.dirname(__file__), "..", "templates")
+        data = {
+            "items": [{"serial_no": str(i), "description": f"Item {i}"} for i in range(25)],
+            "summary": {"work_order_total": 100, "overall_excess": 10, "net_difference": 10,
+                        "premium": {"percent": 0.05}},
+        }
+
+        pages = list(iter_deviation_statement_pages(data, template_dir, rows_per_page=10))
+        self.assertEqual(len(pages), 3)
+        self.assertTrue(all("<thead>" in page for page in pages))
+        self.assertEqual([page.count("<td>Item ") for page in pages], [10, 10, 5])
+        self.assertNotIn("Grand Total Rs.", pages[0])
+        self.assertIn("Grand Total Rs.", pages[-1])
+
+        documents = list(iter_deviation_statement_documents(data, template_dir, rows_per_page=10, pages_per_batch=2))
+        self.assertEqual(len(documents), 2)
+        self.assertTrue(all(doc.lstrip().startswith("<!DOCTYPE html>") for doc in documents))
+        self.assertIn("10.00%", documents[-1])
+
+    def test_bulk_docx_table_matches_cell_writes(self):
+        """Test that the bulk table writer emits the same XML as cell.text"""
+        from docx import Document
+        from exports.docx_tables import add_table
+
+        rows = [["1", "Tab\there", None], ["", "Line\nbreak ", "3.5"]]
+
+        expected = Document()
+        table = expected.add_table(rows=len(rows), cols=3)
+        table.style = "Table Grid"
+        for i, values in enumerate(rows):
+            for j, value in enumerate(values):
+                if value is not None:
+                    table.rows[i].cells[j].text = value
+
+        actual = Document()
+        add_table(actual, rows, cols=3)
+
+        self.assertEqual(actual.element.body.xml, expected.element.body.xml)
+
+    def test_certificate_skeletons(self):
+        """Test that certificate documents are patched from cached skeletons"""
+        from docx import Document
+        from exports.docx_skeletons import get_skeleton_bytes
+        from exports.renderers import create_word_doc
+
+        self.assertIs(get_skeleton_bytes("Certificate II"), get_skeleton_bytes("Certificate II"))
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            doc_path = os.path.join(temp_dir, "certificate_ii.docx")
+            create_word_doc("Certificate II", {"officer_name": "Test Officer"}, doc_path)
+            text = "\n".join(p.text for p in Document(doc_path).paragraphs)
+
+        self.assertIn("Name: Test Officer", text)
+        self.assertIn("Designation: Assistant Engineer", text)
+        self.assertNotIn("{", text)
+
+    def test_certificate_stamping(self):
+        """Test that certificate PDFs are stamped onto a cached static page when enabled"""
+        from pypdf import PdfReader
+        from config.settings import get_setting, set_setting
+        from exports.pdf_stamps import get_static_layer, stamp_certificate
+        from exports.renderers import _render_pdf
+        from exports.view_models import build_view_model
+
+        self.assertIs(get_static_layer("Certificate III"), get_static_layer("Certificate III"))
+        self.assertFalse(get_setting("pdf.stamp_certificates"))
+
+        template_dir = os.path.join(os.path.dirname(__file__), "..", "templates")
+        data = {"totals": {"grand_total": 100000, "payable": 85000}, "payable_words": "Eighty Five Thousand"}
+        with tempfile.TemporaryDirectory() as temp_dir:
+            pdf_path = os.path.join(temp_dir, "Certificate_III.pdf")
+            set_setting("pdf.stamp_certificates", True)
+            try:
+                _render_pdf("Certificate III", data, "portrait", template_dir, pdf_path)
+            finally:
+                set_setting("pdf.stamp_certificates", False)
+            reader = PdfReader(pdf_path)
+            self.assertEqual(len(reader.pages), 1)
+            text = reader.pages[0].extract_text()
+
+            with self.assertRaises(ValueError):
+                stamp_certificate("Certificate II", build_view_model("Certificate II", {"officer_name": "\u0930\u093e\u092e"}),
+                                  os.path.join(temp_dir, "Certificate_II.pdf"))
+
+        self.assertIn("MEMORANDUM OF PAYMENTS", text)
+        self.assertIn("Pay Rs. 72,250", text)
+        self.assertIn("Eighty Five Thousand", text)
+
     def test_css_minification(self):
         """Test CSS minification functionality"""
         from scripts.frontend_optimizer import minify_css